@@ -0,0 +1,316 @@
+"""Benchmarks of the hot paths of the logger.
+
+Run with CPython, on the shims of the simulator, or with the unix port of MicroPython, where the timings and the
+allocations are representative of the board:
+
+    python benchmarks/benchmark.py [results.json]
+    micropython benchmarks/benchmark.py [results.json]
+
+The results are written as JSON (benchmark.json by default). The allocations per frame are exact on MicroPython, and
+the growth of the peak of the memory allocated per frame on CPython.
+"""
+import gc
+import sys
+import time
+
+IS_MICROPYTHON = sys.implementation.name == "micropython"
+
+FRAME_COUNT = 200  # Frames of the synthetic capture
+PARSE_ROUNDS = 5  # Passes over the capture
+CHUNK_LENGTH = 256  # Bytes per read, as Reader.buffer
+TASKS = 8
+SWITCHES = 500  # Per task
+TIMERS = 64
+BAUDRATE = 9600  # Standard mode, the fastest one
+BITS_PER_BYTE = 10  # Start bit, 7 data bits, parity bit, stop bit
+
+if hasattr(time, "ticks_us"):
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+else:
+    def ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def ticks_diff(end, start):
+        return end - start
+
+
+def setup_path():
+    """Make the modules of the logger importable, with the shims of the simulator on CPython."""
+    directory = __file__.rsplit("/", 1)[0] if "/" in __file__ else "."
+    root = directory + "/.."
+    if IS_MICROPYTHON:
+        sys.path.insert(0, root + "/embsw/lib")  # Before the frozen modules
+        sys.path.insert(0, root + "/embsw")
+        try:
+            import pyb
+        except ImportError:  # Unix port: only the clock of pyb is used by the benchmarked code
+            sys.modules["pyb"] = Pyb
+    else:
+        sys.path.insert(0, root + "/simulator/port")
+        sys.path.insert(1, root + "/simulator")
+        sys.path.insert(2, root + "/embsw")
+        sys.path.append(root + "/embsw/lib")  # After the standard library, which it would shadow
+        import compat
+        compat.install()
+
+
+class Pyb:
+    """Clock of pyb, on the unix port of MicroPython."""
+    @staticmethod
+    def millis():
+        return time.ticks_ms()
+
+    @staticmethod
+    def micros():
+        return time.ticks_us()
+
+    @staticmethod
+    def elapsed_millis(start):
+        return time.ticks_diff(time.ticks_ms(), start)
+
+    @staticmethod
+    def elapsed_micros(start):
+        return time.ticks_diff(time.ticks_us(), start)
+
+
+def group(label, value):
+    """Return a group of a historic frame, with its checksum."""
+    payload = label + b" " + value
+    return b"\n" + payload + b" " + bytes(((checksum(payload) & 0x3F) + 0x20,)) + b"\r"
+
+
+def standard_group(label, value, date=None):
+    """Return a group of a standard frame, with its date if any and its checksum, which covers the last HT."""
+    payload = label + b"\t" + (date + b"\t" if date is not None else b"") + value + b"\t"
+    return b"\n" + payload + bytes(((checksum(payload) & 0x3F) + 0x20,)) + b"\r"
+
+
+def checksum(payload):
+    total = 0
+    for byte in payload:
+        total += byte
+    return total
+
+
+def create_frames(count):
+    """Return synthetic historic frames, with the values changing as in a capture."""
+    frames = []
+    for i in range(count):
+        papp = ("%05d" % (1200 + (i * 37) % 900)).encode()
+        frames.append(b"\x02" + group(b"ADCO", b"031428097115") + group(b"OPTARIF", b"BASE")
+                      + group(b"ISOUSC", b"30") + group(b"BASE", ("%09d" % (6350000 + i // 10)).encode())
+                      + group(b"PTEC", b"TH..") + group(b"IINST", ("%03d" % (int(papp) // 230)).encode())
+                      + group(b"IMAX", b"042") + group(b"PAPP", papp) + group(b"HHPHC", b"A")
+                      + group(b"MOTDETAT", b"000000") + b"\x03")
+    return frames
+
+
+def create_standard_frames(count):
+    """Return synthetic standard frames of a single-phase meter, with the values changing as in a capture."""
+    frames = []
+    for i in range(count):
+        seconds = i * 2  # A frame every 2 s at 9600 baud
+        date = ("E230615%02d%02d%02d" % (seconds // 3600 % 24, seconds // 60 % 60, seconds % 60)).encode()
+        sinsts = ("%05d" % (1200 + (i * 37) % 900)).encode()
+        east = ("%09d" % (6350000 + i // 10)).encode()
+        groups = [standard_group(b"ADSC", b"031428097115"), standard_group(b"VTIC", b"02"),
+                  standard_group(b"DATE", b"", date), standard_group(b"NGTF", b"      BASE      "),
+                  standard_group(b"LTARF", b"      BASE      "), standard_group(b"EAST", east),
+                  standard_group(b"EASF01", east)]
+        groups += [standard_group(("EASF%02d" % k).encode(), b"000000000") for k in range(2, 11)]
+        groups += [standard_group(b"EASD01", east)]
+        groups += [standard_group(("EASD%02d" % k).encode(), b"000000000") for k in range(2, 5)]
+        groups += [standard_group(b"IRMS1", ("%03d" % (int(sinsts) // 230)).encode()),
+                   standard_group(b"URMS1", b"231"), standard_group(b"PREF", b"06"), standard_group(b"PCOUP", b"06"),
+                   standard_group(b"SINSTS", sinsts), standard_group(b"SMAXSN", b"05120", b"E230615081532"),
+                   standard_group(b"SMAXSN-1", b"04870", b"E230614193010"),
+                   standard_group(b"CCASN", b"01250", b"E230615120000"),
+                   standard_group(b"CCASN-1", b"01180", b"E230615113000"),
+                   standard_group(b"UMOY1", b"230", b"E230615120000"), standard_group(b"STGE", b"003A0001"),
+                   standard_group(b"MSG1", b"PAS DE          MESSAGE         "),
+                   standard_group(b"PRM", b"01234567890123"), standard_group(b"RELAIS", b"000"),
+                   standard_group(b"NTARF", b"01"), standard_group(b"NJOURF", b"00"),
+                   standard_group(b"NJOURF+1", b"00"),
+                   standard_group(b"PJOURF+1", b"00008001 NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE NONUTILE "
+                                               b"NONUTILE NONUTILE NONUTILE NONUTILE")]
+        frames.append(b"\x02" + b"".join(groups) + b"\x03")
+    return frames
+
+
+def bench_parser(logger, capture):
+    """Return the bytes per second through the parser."""
+    chunks = [bytearray(capture[i:i + CHUNK_LENGTH]) for i in range(0, len(capture), CHUNK_LENGTH)]
+    parser = logger.Parser()
+    parser.init()
+    frames = 0
+    start = ticks_us()
+    for _ in range(PARSE_ROUNDS):
+        for chunk in chunks:
+            parser.feed(chunk, len(chunk))
+            while parser.next_frame():
+                frames += 1
+    duration = ticks_diff(ticks_us(), start)
+    assert frames == PARSE_ROUNDS * capture.count(b"\x03"), "{} frames parsed".format(frames)
+    return PARSE_ROUNDS * len(capture) * 1000000 / duration
+
+
+def bench_writer(logger, frames, output_format):
+    """Return the frames per second through a writer, flushes included."""
+    writer = logger.create_writer(output_format, "bench_data", "bench_time")
+    buffers = [bytearray(frame) for frame in frames]
+    writer.init()
+    start = ticks_us()
+    for i in range(len(buffers)):
+        writer.write(buffers[i], len(buffers[i]), 1000 * i)
+    writer.deinit()
+    duration = ticks_diff(ticks_us(), start)
+    remove("bench_data")
+    remove("bench_time")
+    return len(buffers) * 1000000 / duration
+
+
+def bench_task_switch(asyncio):
+    """Return the time of a task switch in the event loop (us)."""
+    async def task(n):
+        for _ in range(n):
+            await asyncio.sleep_ms(0)
+
+    loop = asyncio.get_event_loop()
+    for _ in range(TASKS - 1):
+        loop.create_task(task(SWITCHES))
+    start = ticks_us()
+    loop.run_until_complete(task(SWITCHES))  # Scheduled last, so it ends last
+    duration = ticks_diff(ticks_us(), start)
+    return duration / (TASKS * SWITCHES)
+
+
+def bench_waitq():
+    """Return the time of a push and a pop of the timer queue (us)."""
+    import utimeq
+    queue = utimeq.utimeq(TIMERS)
+    entry = [0, 0, 0]
+    now = time.ticks_ms() if IS_MICROPYTHON else 0
+    start = ticks_us()
+    for _ in range(10):
+        for i in range(TIMERS):
+            queue.push((now + i * 7919) % TIMERS, bench_waitq, ())
+        for i in range(TIMERS):
+            queue.pop(entry)
+    duration = ticks_diff(ticks_us(), start)
+    return duration / (10 * TIMERS)
+
+
+def bench_call_later(asyncio):
+    """Return the time of a call_later_ms of the event loop, and the pop of its timer (us)."""
+    loop = asyncio.EventLoop(16, TIMERS)
+    entry = [0, 0, 0]
+    start = ticks_us()
+    for _ in range(10):
+        for i in range(TIMERS):
+            loop.call_later_ms(1 + i, bench_call_later)
+        for i in range(TIMERS):
+            loop.waitq.pop(entry)
+    duration = ticks_diff(ticks_us(), start)
+    return duration / (10 * TIMERS)
+
+
+def bench_allocations(logger, capture):
+    """Return the bytes allocated per frame from the reception to the write.
+
+    MicroPython counts every allocation. CPython allocates its integers and the frames of the calls, and tracemalloc
+    only sees the memory allocated at the same time: the growth of its peak from one pass over the capture to
+    PARSE_ROUNDS passes, per frame added, is returned instead. It catches the memory allocated per frame and kept.
+    """
+    chunks = [bytearray(capture[i:i + CHUNK_LENGTH]) for i in range(0, len(capture), CHUNK_LENGTH)]
+    parser = logger.Parser()
+    parser.init()
+    queue = logger.FrameQueue()
+    writer = logger.create_writer("text", "bench_data", "bench_time")
+    writer.init()
+    process_frames(chunks, parser, queue, writer)  # Buffers of the files allocated
+    gc.collect()
+    if IS_MICROPYTHON:
+        gc.disable()
+        allocated = gc.mem_alloc()
+        frames = process_frames(chunks, parser, queue, writer)
+        allocated = gc.mem_alloc() - allocated
+        gc.enable()
+    else:
+        import tracemalloc
+        peaks = []
+        for rounds in (1, PARSE_ROUNDS):
+            tracemalloc.start()
+            start = tracemalloc.get_traced_memory()[0]
+            frames = sum(process_frames(chunks, parser, queue, writer) for _ in range(rounds))
+            peaks.append(tracemalloc.get_traced_memory()[1] - start)
+            tracemalloc.stop()
+        allocated = peaks[1] - peaks[0]
+        frames -= frames // PARSE_ROUNDS  # Frames of the passes added
+    writer.deinit()
+    remove("bench_data")
+    remove("bench_time")
+    return allocated / frames
+
+
+def process_frames(chunks, parser, queue, writer):
+    """Parse the received chunks, queue and write their frames. Return the number of frames."""
+    frames = 0
+    for chunk in chunks:
+        parser.feed(chunk, len(chunk))
+        while parser.next_frame():
+            queue.push_frame(parser.buffer, parser.length, frames)
+            writer.write(queue.frames[queue.head], queue.lengths[queue.head], queue.timestamps[queue.head])
+            queue.pop()
+            frames += 1
+    return frames
+
+
+def remove(filename):
+    import os
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def main():
+    setup_path()
+    import logger
+    import uasyncio as asyncio
+
+    frames = create_frames(FRAME_COUNT)
+    capture = b"".join(frames)
+    results = {
+        "implementation": sys.implementation.name,
+        "parser_bytes_per_s": bench_parser(logger, capture),
+        "writer_frames_per_s": {output_format: bench_writer(logger, frames, output_format)
+                                for output_format in ("text", "binary", "delta")},
+        "task_switch_us": bench_task_switch(asyncio),
+        "waitq_push_pop_us": bench_waitq(),
+        "call_later_ms_us": bench_call_later(asyncio),
+        "alloc_bytes_per_frame": bench_allocations(logger, capture),
+    }
+    # Time to parse and write the standard frames received in one second at 9600 baud, relative to one second
+    standard_frames = create_standard_frames(FRAME_COUNT)
+    standard_capture = b"".join(standard_frames)
+    results["standard_parser_bytes_per_s"] = bench_parser(logger, standard_capture)
+    results["standard_writer_frames_per_s"] = bench_writer(logger, standard_frames, "text")
+    frame_length = len(standard_capture) / len(standard_frames)
+    line_rate = BAUDRATE / BITS_PER_BYTE  # (bytes/s)
+    load = line_rate / results["standard_parser_bytes_per_s"] + \
+        line_rate / frame_length / results["standard_writer_frames_per_s"]
+    results["standard_frame_length"] = frame_length
+    results["load_at_9600_baud"] = load
+    results["headroom_at_9600_baud"] = 1 / load
+
+    import json
+    filename = sys.argv[1] if len(sys.argv) > 1 else "benchmark.json"
+    with open(filename, "w") as f:
+        json.dump(results, f)
+    for name, value in results.items():
+        print("{}: {}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
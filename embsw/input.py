@@ -1,28 +1,74 @@
-import pyb
+import machine
 import uasyncio as asyncio
-import manager
-
-# Switch states
-SWITCH_PRESSED = True
-SWITCH_RELEASED = False
 
 BUTTON_DEBOUNCE = 20  # Switch debounce duration (ms)
 BUTTON_LONGPRESS = 1000  # Long press duration (ms)
+BUTTON_DOUBLE_CLICK = 400  # Maximum duration between the clicks of a double click (ms)
+
+
+class Button:
+    """Button handled through the interrupts of its pin, which is low while pressed.
+
+    A click calls on_press when the button is released before BUTTON_LONGPRESS ms, or after BUTTON_DOUBLE_CLICK ms
+    without a second click if on_double_click is set. A long press calls on_long_press when it reaches
+    BUTTON_LONGPRESS ms. The callbacks are not called from the interrupt handler.
+    """
+    def __init__(self, pin, on_press=None, on_long_press=None, on_double_click=None):
+        self.pin = pin
+        self.on_press = on_press
+        self.on_long_press = on_long_press
+        self.on_double_click = on_double_click
+        self.edge = asyncio.IRQFlag()  # Set on each edge of the pin
+        self.pressed = False  # Debounced state
+        self.presses = 0  # Number of presses, identifying the press of a timer
+        self.long_press = False  # Whether the current press is long
+        self.click_pending = False  # Click waiting for a second one
+        self.pin.init(machine.Pin.IN, machine.Pin.PULL_UP)
+        self.pin.irq(self.on_edge, machine.Pin.IRQ_FALLING | machine.Pin.IRQ_RISING, hard=True)
+
+    def on_edge(self, pin):
+        """Interrupt handler of the pin."""
+        self.edge.set()
 
+    async def run(self):
+        """Debounce the edges of the pin and detect the clicks and long presses."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await self.edge  # Until an edge
+            await asyncio.sleep_ms(BUTTON_DEBOUNCE)  # Until the level is settled
+            pressed = not self.pin.value()
+            if pressed == self.pressed:  # Bounce
+                continue
+            self.pressed = pressed
+            if pressed:
+                self.presses += 1
+                self.long_press = False
+                if self.on_long_press is not None:
+                    loop.call_later_ms(BUTTON_LONGPRESS - BUTTON_DEBOUNCE, self.check_long_press, self.presses)
+            elif not self.long_press:
+                self.click()
 
-def callback_long_press(mgr):
-    """Callback on detection of long press of the button."""
-    mgr.notify(manager.Event.EVENT2)
+    def check_long_press(self, press):
+        """Detect a long press when its timer expires."""
+        if self.pressed and press == self.presses:
+            self.long_press = True
+            self.click_pending = False
+            self.on_long_press()
 
+    def click(self):
+        if self.on_double_click is None:
+            if self.on_press is not None:
+                self.on_press()
+        elif self.click_pending:
+            self.click_pending = False
+            self.on_double_click()
+        else:
+            self.click_pending = True
+            asyncio.get_event_loop().call_later_ms(BUTTON_DOUBLE_CLICK, self.check_click, self.presses)
 
-async def detect_button_press(mgr):
-    """Detect a press on the USR button."""
-    button = pyb.Switch()
-    previous_state = button.value()
-    current_state = previous_state
-    while True:
-        if current_state != previous_state and current_state == SWITCH_PRESSED:
-            mgr.notify(manager.Event.EVENT1)
-        previous_state = current_state
-        current_state = button.value()
-        await asyncio.sleep_ms(BUTTON_DEBOUNCE)
+    def check_click(self, press):
+        """Detect a single click when the timer of its second click expires."""
+        if self.click_pending and press == self.presses:
+            self.click_pending = False
+            if self.on_press is not None:
+                self.on_press()
@@ -46,6 +46,10 @@ def launch(func, tup_args):
         loop.create_task(res)
 
 
+# The delay is run by one long-lived task, parked on a flag while stopped and
+# woken at the deadline, or when triggered to end earlier than the deadline it
+# awaits. trigger() and stop() do not allocate. can_alloc is kept for
+# compatibility: no task is created per trigger any more.
 class Delay_ms(object):
     def __init__(self, func=None, args=(), can_alloc=True, duration=1000):
         self.func = func
@@ -53,45 +57,43 @@ class Delay_ms(object):
         self.can_alloc = can_alloc
         self.duration = duration  # Default duration
         self.tstop = None  # Not running
+        self.twake = None  # Deadline awaited by the task, None if parked
+        self.changed = asyncio.Flag()  # Set to wake the task
+        self.wait = asyncio.TimedWait(self.changed)
         self.loop = asyncio.get_event_loop()
-        if not can_alloc:
-            self.loop.create_task(self._run())
+        self.loop.create_task(self._run())
 
     async def _run(self):
         while True:
-            if self.tstop is None:  # Not running
-                await asyncio.sleep_ms(0)
-            else:
-                await self.killer()
+            self.changed.clear()
+            if self.tstop is None:  # Not running: parked until triggered
+                self.twake = None
+                await self.changed
+                continue
+            twait = time.ticks_diff(self.tstop, self.loop.time())
+            if twait > 0:  # Retriggered or started: wait for the deadline
+                self.twake = self.tstop
+                await self.wait(twait)
+                continue
+            self.tstop = None  # Not running, unless retriggered by the callback
+            if self.func is not None:
+                launch(self.func, self.args)  # Timed out: execute callback
 
     def stop(self):
-        self.tstop = None
+        self.tstop = None  # The task parks at its next wake-up
 
     def trigger(self, duration=0):  # Update end time
         if duration <= 0:
             duration = self.duration
-        if self.can_alloc and self.tstop is None:  # No killer task is running
-            self.tstop = time.ticks_add(time.ticks_ms(), duration)
-            # Start a task which stops the delay after its period has elapsed
-            self.loop.create_task(self.killer())
-        self.tstop = time.ticks_add(time.ticks_ms(), duration)
+        self.tstop = time.ticks_add(self.loop.time(), duration)
+        if self.twake is None or time.ticks_diff(self.tstop, self.twake) < 0:
+            self.changed.set()  # Parked, or awaiting a later deadline
 
     def running(self):
         return self.tstop is not None
 
     __call__ = running
 
-    async def killer(self):
-        twait = time.ticks_diff(self.tstop, time.ticks_ms())
-        while twait > 0:  # Must loop here: might be retriggered
-            await asyncio.sleep_ms(twait)
-            if self.tstop is None:
-                break  # Return if stop() called during wait
-            twait = time.ticks_diff(self.tstop, time.ticks_ms())
-        if self.tstop is not None and self.func is not None:
-            launch(self.func, self.args)  # Timed out: execute callback
-        self.tstop = None  # Not running
-
 class Switch(object):
     debounce_ms = 50
     def __init__(self, pin):
@@ -1,37 +1,106 @@
 class deque:
+    """Double-ended queue in a ring buffer, with O(1) operations at both ends.
 
-    def __init__(self, iterable=None):
-        if iterable is None:
-            self.q = []
-        else:
-            self.q = list(iterable)
+    With maxlen, the storage is preallocated and adding to a full deque discards an item from the other end, as in
+    CPython, or raises IndexError with flags 1, as ucollections.deque. Without maxlen, the storage doubles when full.
+    """
+    MIN_CAPACITY = 8
 
-    def popleft(self):
-        return self.q.pop(0)
+    def __init__(self, iterable=(), maxlen=None, flags=0):
+        if maxlen is not None and maxlen < 0:
+            raise ValueError("maxlen must be non-negative")
+        self.maxlen = maxlen
+        self.flags = flags
+        self.items = [None] * (maxlen if maxlen is not None else deque.MIN_CAPACITY)
+        self.head = 0  # Index of the first item
+        self.length = 0
+        self.extend(iterable)
 
-    def popright(self):
-        return self.q.pop()
+    def is_full(self):
+        """Return whether an added item has to replace another one, raising IndexError if it is not allowed."""
+        if self.length < len(self.items):
+            return False
+        if self.maxlen is None:
+            self.grow()
+            return False
+        if self.flags & 1:
+            raise IndexError("full")
+        return True
 
-    def pop(self):
-        return self.q.pop()
+    def grow(self):
+        """Double the storage, with the items at its start."""
+        items = [None] * (2 * len(self.items))
+        for i in range(self.length):
+            items[i] = self.items[(self.head + i) % len(self.items)]
+        self.items = items
+        self.head = 0
 
     def append(self, a):
-        self.q.append(a)
+        if self.is_full():
+            if not self.maxlen:  # Nothing can be kept
+                return
+            self.popleft()
+        self.items[(self.head + self.length) % len(self.items)] = a
+        self.length += 1
 
     def appendleft(self, a):
-        self.q.insert(0, a)
+        if self.is_full():
+            if not self.maxlen:
+                return
+            self.pop()
+        self.head = (self.head - 1) % len(self.items)
+        self.items[self.head] = a
+        self.length += 1
+
+    def pop(self):
+        if not self.length:
+            raise IndexError("pop from an empty deque")
+        self.length -= 1
+        i = (self.head + self.length) % len(self.items)
+        a = self.items[i]
+        self.items[i] = None  # Not kept alive by the deque
+        return a
+
+    popright = pop
+
+    def popleft(self):
+        if not self.length:
+            raise IndexError("pop from an empty deque")
+        a = self.items[self.head]
+        self.items[self.head] = None
+        self.head = (self.head + 1) % len(self.items)
+        self.length -= 1
+        return a
 
     def extend(self, a):
-        self.q.extend(a)
+        for x in a:
+            self.append(x)
+
+    def extendleft(self, a):
+        for x in a:
+            self.appendleft(x)
+
+    def clear(self):
+        while self.length:
+            self.pop()
+        self.head = 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("deque index out of range")
+        return self.items[(self.head + index) % len(self.items)]
 
     def __len__(self):
-        return len(self.q)
+        return self.length
 
     def __bool__(self):
-        return bool(self.q)
+        return self.length > 0
 
     def __iter__(self):
-        yield from self.q
+        for i in range(self.length):
+            yield self.items[(self.head + i) % len(self.items)]
 
     def __str__(self):
-        return 'deque({})'.format(self.q)
+        return 'deque({})'.format(list(self))
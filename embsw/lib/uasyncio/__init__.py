@@ -1,5 +1,7 @@
 import uerrno
+import uio
 import uselect as select
+import utime as time
 import usocket as _socket
 from uasyncio.core import *
 
@@ -66,12 +68,30 @@ class PollEventLoop(EventLoop):
         if DEBUG and __debug__:
             log.debug("poll.wait(%d)", delay)
         # We need one-shot behavior (second arg of 1 to .poll())
-        res = self.poller.ipoll(delay, 1)
+        if delay and self.idle_hook is not None:
+            # Tickless idle: if no I/O is ready, the hook may sleep deeper than the poller, until the deadline (-1 for
+            # none) or an interrupt. It returns None to let the poller wait, or the time slept without the system
+            # ticks counting it (ms). Only the time slept by the hook is idle time.
+            if self.dispatch(self.poller.ipoll(0, 1)):
+                return
+            start = time.ticks_ms()
+            skipped = self.idle_hook(delay)
+            if skipped is not None:
+                self.skip_time(skipped)
+                self.idle_time += time.ticks_diff(time.ticks_ms(), start) + skipped
+                self.dispatch(self.poller.ipoll(0, 1))
+                return
+        self.dispatch(self.poller.ipoll(delay, 1))
+
+    def dispatch(self, res):
+        # Schedule the callbacks of the I/O events, and return whether there were any
+        dispatched = False
         #log.debug("poll result: %s", res)
         # Remove "if res" workaround after
         # https://github.com/micropython/micropython/issues/2716 fixed.
         if res:
             for sock, ev in res:
+                dispatched = True
                 cb = self.objmap[id(sock)]
                 if ev & (select.POLLHUP | select.POLLERR):
                     # These events are returned even if not requested, and
@@ -87,6 +107,134 @@ class PollEventLoop(EventLoop):
                 else:
                     cb.pend_throw(None)
                     self.call_soon(cb)
+        return dispatched
+
+_stop_iter = StopIteration()
+
+
+# Awaitable waiting for a stream to be readable, with zero heap memory usage
+class ReadableWait:
+
+    def __init__(self, polls):
+        self.ioread = IORead(polls)
+        self.waiting = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.waiting:
+            self.waiting = True
+            return self.ioread
+        self.waiting = False
+        _stop_iter.__traceback__ = None
+        raise _stop_iter
+
+
+# Flag awaited by up to waiters tasks, with zero heap memory usage: awaiting it blocks the task until the flag is set
+class Flag:
+
+    def __init__(self, waiters=1):
+        self.state = False
+        self.waiting = [None] * waiters
+
+    def set(self):
+        self.state = True
+        waiting = self.waiting
+        for i in range(len(waiting)):
+            if waiting[i] is not None:
+                get_event_loop().call_soon(waiting[i])
+                waiting[i] = None
+
+    def clear(self):
+        self.state = False
+
+    def is_set(self):
+        return self.state
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.state:
+            waiting = self.waiting
+            for i in range(len(waiting)):
+                if waiting[i] is None:
+                    waiting[i] = get_event_loop().cur_task
+                    return False  # Not rescheduled until set
+            raise RuntimeError("too many tasks awaiting the flag")
+        _stop_iter.__traceback__ = None
+        raise _stop_iter
+
+
+# Awaitable waiting for a flag to be set or for a delay (ms), by a single task, with zero heap memory usage: create
+# wait = TimedWait(flag) once, then await wait(delay). The timer of a wait ended by the flag expires unused.
+class TimedWait:
+
+    def __init__(self, flag):
+        self.flag = flag
+        self.delay = 0
+        self.deadline = 0
+        self.task = None
+        self.waiting = False
+        self.on_timeout = self.timeout  # Bound once, to be scheduled without allocating
+
+    def __call__(self, delay):
+        self.delay = delay
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.waiting and not self.flag.state and self.delay > 0:
+            self.waiting = True
+            loop = get_event_loop()
+            self.task = loop.cur_task
+            self.deadline = time.ticks_add(loop.time(), self.delay)
+            loop.call_later_ms(self.delay, self.on_timeout)
+            return next(self.flag)  # Parks the task in the flag
+        self.waiting = False
+        _stop_iter.__traceback__ = None
+        raise _stop_iter
+
+    def timeout(self):
+        loop = get_event_loop()
+        if not self.waiting or time.ticks_diff(self.deadline, loop.time()) > 0:
+            return  # Timer of a previous wait
+        waiting = self.flag.waiting
+        for i in range(len(waiting)):
+            if waiting[i] is self.task:
+                waiting[i] = None
+                loop.call_soon(self.task)
+
+
+# Flag set by an interrupt handler and awaited by a single task, with zero heap memory usage. The flag is polled
+# as a stream, so that setting it wakes the event loop from its wait for I/O.
+class IRQFlag(uio.IOBase):
+
+    def __init__(self):
+        self.state = False
+        self.ioread = IORead(self)
+
+    def ioctl(self, req, arg):
+        if req == 3:  # MP_STREAM_POLL
+            return arg & select.POLLIN if self.state else 0
+        return -1
+
+    def set(self):
+        # Can be called from an interrupt handler
+        self.state = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.state:
+            return self.ioread
+        self.state = False
+        _stop_iter.__traceback__ = None
+        raise _stop_iter
 
 
 class StreamReader:
@@ -24,30 +24,64 @@ class TimeoutError(CancelledError):
     pass
 
 
+class QueueFull(IndexError):
+    pass
+
+
 class EventLoop:
+    # The queues are created with the given lengths (entries: two per callback and one per task in the runq, one per
+    # timer in the waitq) and doubled when full, up to queue_limit entries. Beyond, creating a task or scheduling a
+    # callback raises QueueFull to the code adding the work, while the tasks already created (rescheduled, resumed or
+    # sleeping) and the expired timers always get their entries, the queues growing beyond the limit if needed.
+    queue_limit = 256
 
     def __init__(self, runq_len=16, waitq_len=16):
+        self.runq_len = runq_len
+        self.waitq_len = waitq_len
         self.runq = ucollections.deque((), runq_len, True)
         self.waitq = utimeq.utimeq(waitq_len)
         # Current task being run. Task is a top-level coroutine scheduled
         # in the event loop (sub-coroutines executed transparently by
         # yield from/await, event loop "doesn't see" them).
         self.cur_task = None
+        # Maximum delay between the expiry of a timer and its processing (ms)
+        self.lag_max = 0
+        # Hook called to sleep when there is nothing to run, see PollEventLoop.wait()
+        self.idle_hook = None
+        # Time slept by the idle hook (ms), and time slept with the system ticks stopped (ms), which is added to
+        # the time of the event loop (modulo the period of the ticks). The waits in the poller are not idle time:
+        # the board stays awake, ready to receive.
+        self.idle_time = 0
+        self.time_skipped = 0
+        self.ticks_skipped = 0
+        # Scheduling statistics, recorded if set to a Profile
+        self.profile = None
 
     def time(self):
-        return time.ticks_ms()
+        return time.ticks_add(time.ticks_ms(), self.ticks_skipped)
 
     def create_task(self, coro):
         # CPython 3.4.2
+        if len(self.runq) >= self.queue_limit:  # New task, refused like a callback
+            raise QueueFull("runq full ({} entries)".format(self.runq_len))
         self.call_later_ms(0, coro)
         # CPython asyncio incompatibility: we don't return Task object
 
     def call_soon(self, callback, *args):
         if __debug__ and DEBUG:
             log.debug("Scheduling in runq: %s", (callback, args))
+        self.push_runq(callback, args, isinstance(callback, type_gen))
+
+    def push_runq(self, callback, args, forced):
+        is_task = isinstance(callback, type_gen)
+        needed = len(self.runq) + (1 if is_task else 2)
+        if needed > self.runq_len:
+            self.resize_runq(self.grown_length("runq", self.runq_len, needed, forced))
         self.runq.append(callback)
-        if not isinstance(callback, type_gen):
+        if not is_task:
             self.runq.append(args)
+        if self.profile is not None:
+            self.profile.count_queues(len(self.runq), len(self.waitq))
 
     def call_later(self, delay, callback, *args):
         self.call_at_(time.ticks_add(self.time(), int(delay * 1000)), callback, args)
@@ -60,7 +94,44 @@ class EventLoop:
     def call_at_(self, time, callback, args=()):
         if __debug__ and DEBUG:
             log.debug("Scheduling in waitq: %s", (time, callback, args))
+        needed = len(self.waitq) + 1
+        if needed > self.waitq_len:
+            self.resize_waitq(self.grown_length("waitq", self.waitq_len, needed, isinstance(callback, type_gen)))
         self.waitq.push(time, callback, args)
+        if self.profile is not None:
+            self.profile.count_queues(len(self.runq), len(self.waitq))
+
+    def grown_length(self, name, length, needed, forced):
+        # Length of a full queue grown to hold needed entries: doubled, up to queue_limit unless forced
+        if needed > self.queue_limit:
+            if not forced:
+                raise QueueFull("{} full ({} entries)".format(name, length))
+            return max(2 * length, needed)
+        return max(min(2 * length, self.queue_limit), needed)
+
+    def resize_runq(self, runq_len):
+        runq = ucollections.deque((), runq_len, True)
+        while self.runq:  # Order kept, for the entries of the current pass of the loop
+            runq.append(self.runq.popleft())
+        self.runq = runq
+        self.runq_len = runq_len
+
+    def resize_waitq(self, waitq_len):
+        waitq = utimeq.utimeq(waitq_len)
+        entry = [0, 0, 0]
+        while self.waitq:
+            self.waitq.pop(entry)
+            waitq.push(entry[0], entry[1], entry[2])
+        self.waitq = waitq
+        self.waitq_len = waitq_len
+
+    def reserve(self, runq_len, waitq_len):
+        # Grow the queues to at least the given lengths, see queue_lengths()
+        if runq_len > self.runq_len:
+            self.resize_runq(runq_len)
+        if waitq_len > self.waitq_len:
+            self.resize_waitq(waitq_len)
+        self.queue_limit = max(self.queue_limit, runq_len, waitq_len)
 
     def wait(self, delay):
         # Default wait implementation, to be overriden in subclasses
@@ -71,7 +142,9 @@ class EventLoop:
 
     def run_forever(self):
         cur_task = [0, 0, 0]
+        start = 0
         while True:
+            profile = self.profile
             # Expire entries in waitq and move them to runq
             tnow = self.time()
             while self.waitq:
@@ -79,10 +152,14 @@ class EventLoop:
                 delay = time.ticks_diff(t, tnow)
                 if delay > 0:
                     break
+                if -delay > self.lag_max:
+                    self.lag_max = -delay
                 self.waitq.pop(cur_task)
+                if profile is not None:
+                    profile.count_lateness(cur_task[1], -delay)
                 if __debug__ and DEBUG:
                     log.debug("Moving from waitq to runq: %s", cur_task[1])
-                self.call_soon(cur_task[1], *cur_task[2])
+                self.push_runq(cur_task[1], cur_task[2], True)  # Already scheduled
 
             # Process runq
             l = len(self.runq)
@@ -97,13 +174,21 @@ class EventLoop:
                     l -= 1
                     if __debug__ and DEBUG:
                         log.info("Next callback to run: %s", (cb, args))
-                    cb(*args)
+                    if profile is not None:
+                        start = time.ticks_us()
+                        cb(*args)
+                        profile.count_step(cb, time.ticks_diff(time.ticks_us(), start))
+                    else:
+                        cb(*args)
                     continue
 
                 if __debug__ and DEBUG:
                     log.info("Next coroutine to run: %s", (cb, args))
                 self.cur_task = cb
                 delay = 0
+                finished = False
+                if profile is not None:
+                    start = time.ticks_us()
                 try:
                     if args is ():
                         ret = next(cb)
@@ -133,25 +218,32 @@ class EventLoop:
                             assert False, "Unknown syscall yielded: %r (of type %r)" % (ret, type(ret))
                     elif isinstance(ret, type_gen):
                         self.call_soon(ret)
+                    elif ret is False:
+                        # Don't reschedule (checked before int, False being an int)
+                        continue
                     elif isinstance(ret, int):
                         # Delay
                         delay = ret
                     elif ret is None:
                         # Just reschedule
                         pass
-                    elif ret is False:
-                        # Don't reschedule
-                        continue
                     else:
                         assert False, "Unsupported coroutine yield value: %r (of type %r)" % (ret, type(ret))
                 except StopIteration as e:
                     if __debug__ and DEBUG:
                         log.debug("Coroutine finished: %s", cb)
+                    finished = True
                     continue
                 except CancelledError as e:
                     if __debug__ and DEBUG:
                         log.debug("Coroutine cancelled: %s", cb)
+                    finished = True
                     continue
+                finally:
+                    if profile is not None:
+                        profile.count_step(cb, time.ticks_diff(time.ticks_us(), start))
+                        if finished:
+                            profile.finish(cb)
                 # Currently all syscalls don't return anything, so we don't
                 # need to feed anything to the next invocation of coroutine.
                 # If that changes, need to pass that value below.
@@ -172,6 +264,11 @@ class EventLoop:
                         delay = 0
             self.wait(delay)
 
+    def skip_time(self, duration):
+        # Duration in ms elapsed with the system ticks stopped
+        self.time_skipped += duration
+        self.ticks_skipped = time.ticks_add(self.ticks_skipped, duration)
+
     def run_until_complete(self, coro):
         def _run_and_stop():
             yield from coro
@@ -186,6 +283,106 @@ class EventLoop:
         pass
 
 
+class Profile:
+    # Scheduling statistics of the event loop, light enough to be recorded in the field. For each task (the
+    # callbacks together): the number of steps, their total time, the longest one and the largest lateness of a timer
+    # (resumption after its deadline). For the loop: the high-water marks of the queues (entries) and the longest step.
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Task -> [steps, time (ms), remainder of the time (us), longest step (us), largest lateness (ms)]
+        self.tasks = {}
+        # Name of the function -> same, summed over its finished tasks, which the profile does not keep alive
+        self.finished = {}
+        self.callbacks = [0, 0, 0, 0, 0]
+        self.runq_max = 0
+        self.waitq_max = 0
+        self.step_max = 0  # (us)
+        self.step_max_task = None
+
+    def stats(self, cb):
+        if not isinstance(cb, type_gen):
+            return self.callbacks
+        stats = self.tasks.get(cb)
+        if stats is None:  # Allocated once per task
+            stats = self.tasks[cb] = [0, 0, 0, 0, 0]
+        return stats
+
+    def count_step(self, cb, duration):
+        stats = self.stats(cb)
+        stats[0] += 1
+        duration_us = stats[2] + duration
+        stats[1] += duration_us // 1000
+        stats[2] = duration_us % 1000
+        if duration > stats[3]:
+            stats[3] = duration
+        if duration > self.step_max:
+            self.step_max = duration
+            self.step_max_task = cb
+
+    def finish(self, cb):
+        # Fold the statistics of a finished task into those of its function
+        stats = self.tasks.pop(cb, None)
+        if stats is None:
+            return
+        name = task_name(cb)
+        if self.step_max_task is cb:
+            self.step_max_task = name
+        total = self.finished.get(name)
+        if total is None:
+            self.finished[name] = stats
+            return
+        total[0] += stats[0]
+        duration_us = total[2] + stats[2]
+        total[1] += stats[1] + duration_us // 1000
+        total[2] = duration_us % 1000
+        if stats[3] > total[3]:
+            total[3] = stats[3]
+        if stats[4] > total[4]:
+            total[4] = stats[4]
+
+    def count_lateness(self, cb, lateness):
+        stats = self.stats(cb)
+        if lateness > stats[4]:
+            stats[4] = lateness
+
+    def count_queues(self, runq_len, waitq_len):
+        if runq_len > self.runq_max:
+            self.runq_max = runq_len
+        if waitq_len > self.waitq_max:
+            self.waitq_max = waitq_len
+
+    def report(self):
+        # List of (name, steps, time (ms), longest step (us), largest lateness (ms)) by decreasing time
+        rows = [(task_name(task), s[0], s[1], s[3], s[4]) for task, s in self.tasks.items()]
+        rows.extend((name, s[0], s[1], s[3], s[4]) for name, s in self.finished.items())
+        s = self.callbacks
+        rows.append(("callbacks", s[0], s[1], s[3], s[4]))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def show(self):
+        print("runq_max: {}, waitq_max: {}, step_max: {} us ({})".format(
+            self.runq_max, self.waitq_max, self.step_max, task_name(self.step_max_task)))
+        for row in self.report():
+            print("{}: {} steps, {} ms, step_max {} us, lateness_max {} ms".format(*row))
+
+
+def task_name(task):
+    # Name of the function of a task, from its representation: <generator object 'name' at ...>
+    if task is None or isinstance(task, str):  # Name of a finished task
+        return task
+    r = repr(task)
+    begin = r.find("object ")
+    if begin == -1:
+        return r
+    begin += 7
+    end = r.find(" ", begin)
+    return r[begin:end].strip("'")
+
+
 class SysCall:
 
     def __init__(self, *args):
@@ -224,6 +421,11 @@ def get_event_loop(runq_len=16, waitq_len=16):
         _event_loop = _event_loop_class(runq_len, waitq_len)
     return _event_loop
 
+def queue_lengths(tasks, callbacks=0, timers=0):
+    # Lengths of the queues for a budget: long-lived tasks, callbacks ready at once, and timers pending at once
+    # besides the sleeps of the tasks (such as the timeouts of the waits)
+    return tasks + 2 * callbacks, tasks + timers
+
 def sleep(secs):
     yield int(secs * 1000)
 
@@ -1,5 +1,68 @@
+import os
 import pyb
+import micropython
 import uasyncio as asyncio
+import policy
+import metrics
+from micropython import const
+
+# Special symbols of the frames
+STX = const(0x02)
+ETX = const(0x03)
+EOT = const(0x04)
+CR = const(0x0D)  # End of a group
+SP = const(0x20)  # Separator of the fields of a group
+
+# Buffer sizes (bytes)
+UART_BUFFER_LENGTH = 512  # Bytes received while the tasks are busy
+READ_BUFFER_LENGTH = 256
+MAX_FRAME_LENGTH = 1024
+WRITE_BUFFER_LENGTH = 4096
+TIMESTAMP_LENGTH = 16  # Maximum length of a formatted timestamp
+
+# Maximum time a received frame is kept in the write buffers (ms)
+WRITE_MAX_AGE = 5000
+
+# Queue between the reception and the storage of the frames
+QUEUE_LENGTH = 8  # Number of frames and commands
+QUEUE_RESERVED_SLOTS = 2  # Slots kept for the commands
+COMMAND_START = -1
+COMMAND_STOP = -2
+COMMAND_FLUSH = -3
+
+# Binary format: the file starts with BINARY_MAGIC, followed by records made of a marker byte (RECORD_MARKER, with
+# RECORD_ABSOLUTE if the time is absolute, RECORD_TRUNCATED if the frame ends with EOT and RECORD_DELTA if only the
+# groups changed since the previous frame are stored), the length of the content (2 bytes), the time (4 bytes if
+# absolute, otherwise 2 bytes, relative to the previous record), the content of the frame between STX and ETX or EOT,
+# and the CRC-16/CCITT-FALSE of all of the previous bytes (2 bytes). Integers are little endian, times are in ms.
+# The absolute times wrap around every 2**32 ms (about 49.7 days): the reader of the viewer takes an absolute time
+# falling back by more than half of that as a wraparound, and a smaller fall as a restart of the logger.
+BINARY_MAGIC = b"PYTICBIN"
+RECORD_MARKER = 0xA0
+RECORD_ABSOLUTE = 0x01
+RECORD_TRUNCATED = 0x02
+RECORD_DELTA = 0x04
+RECORD_OVERHEAD = 9  # Maximum number of bytes of a record besides the content of the frame
+RECORD_SYNC_PERIOD = 64  # Number of records between absolute times, bounding the loss after a corruption
+
+# Segmentation of the output files: a segment ends when its data file would exceed SEGMENT_MAX_LENGTH bytes or its
+# frames would span more than SEGMENT_MAX_DURATION ms, and is listed in an index file starting with INDEX_MAGIC
+SEGMENT_MAX_LENGTH = 1048576
+SEGMENT_MAX_DURATION = 86400000
+INDEX_MAGIC = "PYTICIDX"
+
+
+def create_writer(output_format, filename_data, filename_time, filename_index=None):
+    segments = Segments(filename_index) if filename_index is not None else None
+    if output_format == "text":
+        return Writer(filename_data, filename_time, segments=segments)
+    elif output_format == "binary":
+        return BinaryWriter(filename_data, segments=segments)
+    elif output_format == "delta":
+        return BinaryWriter(filename_data, delta=True, segments=segments)
+    else:
+        raise ValueError("output_format is '{}' but is expected to be 'text', 'binary' or 'delta'."
+                         .format(output_format))
 
 
 def create_reader(cfg, channel):
@@ -18,11 +81,20 @@ class Reader:
         self.parity = parity
         self.stop = stop
         self.uart = pyb.UART(channel, baudrate)
-        self.stream_reader = asyncio.StreamReader(self.uart)
-        self.read = self.stream_reader.read
+        self.buffer = bytearray(READ_BUFFER_LENGTH)
+        self.readable = asyncio.ReadableWait(self.uart)  # Await it to wait for received bytes
+
+    def read(self):
+        """Read the received bytes into the buffer. Return their number."""
+        nbytes = self.uart.readinto(self.buffer)
+        if nbytes is None:
+            return 0
+        metrics.add(metrics.BYTES_READ, nbytes)
+        return nbytes
 
     def init(self):
-        self.uart.init(self.baudrate, bits=self.bits, parity=self.parity, stop=self.stop)
+        self.uart.init(self.baudrate, bits=self.bits, parity=self.parity, stop=self.stop,
+                       read_buf_len=UART_BUFFER_LENGTH)
 
     def deinit(self):
         self.uart.deinit()
@@ -39,85 +111,517 @@ class StandardReader(Reader):
 
 
 class Parser:
-    # Special symbols
-    SYM_STX = 0x02
-    SYM_ETX = 0x03
-    SYM_EOT = 0x04
-
-    # States of the stream parser
-    SP_WAITING = 0
-    SP_RECEIVING = 1
+    """Assemble the frames from the received bytes, in a preallocated buffer.
 
+    The received bytes are given with feed, then next_frame is called until it returns False. Each time it returns
+    True, a frame is available in buffer[:length] until the next call.
+    """
     def __init__(self):
-        self.generator = None
+        self.buffer = bytearray(MAX_FRAME_LENGTH)
+        self.length = 0  # Length of the frame in the buffer
+        self.receiving = False
+        self.is_frame_complete = False
+        self.data = None  # Received bytes being parsed
+        self.position = 0
+        self.end = 0
 
     def init(self):
-        self.generator = self.frame_generator()
-        next(self.generator)
+        self.length = 0
+        self.receiving = False
+        self.data = None
+        self.position = 0
+        self.end = 0
 
     def deinit(self):
-        self.generator = None
-
-    def parse(self, data_bytes):
-        for byte in data_bytes:
-            frame_data, is_frame_complete = self.generator.send(byte)
-            if frame_data is not None:
-                return frame_data, is_frame_complete
-        return None, None
-
-    @staticmethod
-    def frame_generator():
-        """Generate frames (list of bytes) from received bytes."""
-        state = Parser.SP_WAITING
-        frame_data, is_frame_complete = None, None
-        buffer = []
-        while True:
-            c = yield frame_data, is_frame_complete
-            frame_data, is_frame_complete = None, None
-            if state == Parser.SP_WAITING:
-                if c == Parser.SYM_STX:
-                    buffer = bytearray()
-                    buffer.append(c)
-                    state = Parser.SP_RECEIVING
-            elif state == Parser.SP_RECEIVING:
-                if c == Parser.SYM_ETX or c == Parser.SYM_EOT:
-                    buffer.append(c)
-                    frame_data, is_frame_complete = buffer, c == Parser.SYM_ETX
-                    state = Parser.SP_WAITING
-                else:
-                    buffer.append(c)
+        self.data = None
+
+    def feed(self, data_bytes, nbytes):
+        """Set the received bytes to parse, the nbytes first ones of data_bytes."""
+        self.data = data_bytes
+        self.position = 0
+        self.end = nbytes
+
+    def next_frame(self):
+        """Parse the received bytes up to the end of the next frame. Return whether a frame was ended."""
+        data = self.data
+        start = self.position
+        end = self.end
+        while start < end:
+            if not self.receiving:
+                start = find(data, STX, start, end)
+                if start == -1:  # Bytes outside of a frame
+                    break
+                self.length = 0
+                self.receiving = True
+            stop = find_end(data, start, end)
+            if stop == -1:  # Frame continued in the next bytes
+                if not self.append(data, start, end):
+                    self.drop()
+                break
+            self.receiving = False
+            self.position = stop + 1
+            if self.append(data, start, stop + 1):
+                self.is_frame_complete = data[stop] == ETX
+                return True
+            metrics.add(metrics.FRAMES_OVERSIZE)
+            start = stop + 1
+        self.position = end
+        return False
+
+    def drop(self):
+        """Drop a frame too long for the buffer. The next bytes are ignored up to the next STX."""
+        self.receiving = False
+        self.length = 0
+        metrics.add(metrics.FRAMES_OVERSIZE)
+
+    @micropython.viper
+    def append(self, data, begin: int, end: int) -> bool:
+        """Append data[begin:end] to the frame in the buffer, without allocating. Return False if it does not fit."""
+        length = int(self.length)
+        if length + end - begin > int(len(self.buffer)):
+            return False
+        buffer = ptr8(self.buffer)
+        source = ptr8(data)
+        for i in range(begin, end):
+            buffer[length] = source[i]
+            length += 1
+        self.length = length
+        return True
+
+
+class FrameQueue:
+    """Bounded queue of frames and commands, in preallocated slots.
+
+    A slot holds a frame with its length and timestamp, or a command (negative length) with its timestamp. The frames
+    are dropped when the queue is full, except for the slots reserved for the commands.
+    """
+    def __init__(self, capacity=QUEUE_LENGTH, frame_length=MAX_FRAME_LENGTH):
+        self.frames = [bytearray(frame_length) for _ in range(capacity)]
+        self.lengths = [0] * capacity
+        self.timestamps = [0] * capacity
+        self.head = 0  # Slot of the oldest item
+        self.count = 0
+        self.not_empty = asyncio.Flag()
+
+    def push_frame(self, data, length, timestamp):
+        """Push a copy of the length first bytes of data. Return False if the frame is dropped."""
+        if self.count >= len(self.frames) - QUEUE_RESERVED_SLOTS:
+            metrics.add(metrics.FRAMES_DROPPED)
+            return False
+        copy(self.frames[self.tail()], data, length)
+        self.push(length, timestamp)
+        return True
+
+    def push_command(self, command, timestamp):
+        """Push a command. Return False if the queue is full."""
+        if self.count >= len(self.frames):
+            return False
+        self.push(command, timestamp)
+        return True
+
+    def tail(self):
+        return (self.head + self.count) % len(self.frames)
+
+    def push(self, length, timestamp):
+        slot = self.tail()
+        self.lengths[slot] = length
+        self.timestamps[slot] = timestamp
+        self.count += 1
+        metrics.update_max(metrics.QUEUE_HIGH_WATER_MARK, self.count)
+        self.not_empty.set()
+
+    def pop(self):
+        """Remove the oldest item."""
+        self.head = (self.head + 1) % len(self.frames)
+        self.count -= 1
+        if not self.count:
+            self.not_empty.clear()
+
+
+class Segments:
+    """Numbered segments of the output files, listed in an index file.
+
+    A segment is started at each start of the logger and when the current one is full. The files of segment n of
+    "data.txt" and "time.txt" are "data_000n.txt" and "time_000n.txt". When a segment is closed, a line with the names
+    of its files ("-" for none), its first and last timestamps and its number of frames is appended to the index.
+    """
+    def __init__(self, filename_index, max_length=SEGMENT_MAX_LENGTH, max_duration=SEGMENT_MAX_DURATION):
+        self.filename_index = filename_index
+        self.max_length = max_length  # (bytes)
+        self.max_duration = max_duration  # (ms)
+        self.number = 0
+        self.length = 0  # Bytes written to the data file of the segment
+        self.frames = 0
+        self.first_timestamp = 0
+        self.last_timestamp = 0
+
+    def name(self, filename):
+        """Return the name of a file of the current segment, from the name of the output file."""
+        dot = filename.rfind(".")
+        if dot == -1:
+            dot = len(filename)
+        return "{}_{:04d}{}".format(filename[:dot], self.number, filename[dot:])
+
+    def start(self, filename_data):
+        """Start a new segment, numbered after the existing ones."""
+        files = os.listdir()
+        self.number += 1
+        while self.name(filename_data) in files:  # Segments of the previous runs
+            self.number += 1
+        self.length = 0
+        self.frames = 0
+
+    def is_full(self, length, timestamp):
+        """Return whether a new segment has to be started for length bytes at timestamp."""
+        return self.frames > 0 and (self.length + length > self.max_length
+                                    or timestamp - self.first_timestamp >= self.max_duration)
+
+    def count(self, length, timestamp):
+        """Count length bytes of a frame at timestamp in the segment."""
+        if not self.frames:
+            self.first_timestamp = timestamp
+        self.frames += 1
+        self.length += length
+        self.last_timestamp = timestamp
+
+    def close(self, filename_data, filename_time):
+        """Append the segment to the index, or delete its files if it has no frames."""
+        names = [self.name(f) for f in (filename_data, filename_time) if f is not None]
+        if not self.frames:
+            for name in names:
+                os.remove(name)
+            return
+        with open(self.filename_index, "a") as f:
+            if f.tell() == 0:  # New index
+                f.write(INDEX_MAGIC + "\n")
+            f.write("{} {} {} {} {}\n".format(names[0], names[1] if len(names) > 1 else "-", self.first_timestamp,
+                                              self.last_timestamp, self.frames))
 
 
 class Writer:
-    def __init__(self, filename_data, filename_time):
+    """Write the frames and their timestamps to the files, through buffers.
+
+    The buffers are written to the files when they are full, when the oldest buffered frame is max_age ms old, and
+    when the writer is deinitialized. At most the frames received in the last max_age ms are lost on a power cut.
+    With segments, the files are those of the current segment.
+    """
+    def __init__(self, filename_data, filename_time, buffer_length=WRITE_BUFFER_LENGTH, max_age=WRITE_MAX_AGE,
+                 segments=None):
         self.filename_data = filename_data
         self.filename_time = filename_time
+        self.segments = segments
         self.file_data = None
         self.file_time = None
         self.initialized = False
+        self.max_age = max_age  # (ms)
+        self.data_buffer = bytearray(buffer_length)
+        self.data_length = 0
+        self.time_buffer = bytearray(buffer_length // 8)  # Decimal timestamps, each followed by a newline
+        self.time_length = 0
+        self.frames = 0  # Number of buffered frames
+        self.first_frame_time = 0  # Reception time of the oldest buffered frame (ms)
 
     def init(self):
         """Initialize the writer."""
-        self.file_data = open(self.filename_data, "ab")
-        self.file_time = open(self.filename_time, "a")
+        if self.segments is not None:
+            self.segments.start(self.filename_data)
+        self.file_data = open(self.current_name(self.filename_data), "ab")
+        self.file_time = open(self.current_name(self.filename_time), "ab")
+        self.data_length = 0
+        self.time_length = 0
+        self.frames = 0
         self.initialized = True
 
     def deinit(self):
         """Deinitialize the writer."""
+        self.flush()
         self.file_data.close()
         self.file_time.close()
         self.initialized = False
+        if self.segments is not None:
+            self.segments.close(self.filename_data, self.filename_time)
+
+    def current_name(self, filename):
+        """Return the name of an output file, in the current segment if any."""
+        return self.segments.name(filename) if self.segments is not None else filename
+
+    def count_segment(self, length, timestamp):
+        """Count length bytes at timestamp in the current segment, after starting a new one if it is full."""
+        if self.segments is not None:
+            if self.segments.is_full(length, timestamp):
+                self.deinit()
+                self.init()
+            self.segments.count(length, timestamp)
+
+    def write(self, data, length, timestamp):
+        """Buffer the length first bytes of data and their timestamp."""
+        if self.initialized:
+            self.count_segment(length, timestamp)
+            if self.data_length + length > len(self.data_buffer) or \
+                    self.time_length + TIMESTAMP_LENGTH > len(self.time_buffer):
+                self.flush()
+            if not self.frames:
+                self.first_frame_time = pyb.millis()
+            self.frames += 1
+            if length > len(self.data_buffer):  # Frame longer than the buffer
+                self.file_data.write(data, 0, length)
+                metrics.add(metrics.BYTES_WRITTEN, length)
+            else:
+                self.append(data, 0, length)
+            self.format_timestamp(timestamp)
+            if self.is_due():
+                self.flush()
+        else:
+            print("Race condition occured...")
+
+    def is_due(self):
+        """Return whether the buffered frames have to be written to the files."""
+        return self.frames > 0 and pyb.elapsed_millis(self.first_frame_time) >= self.max_age
+
+    def time_to_due(self):
+        """Return the time before the buffered frames have to be written to the files (ms)."""
+        if not self.frames:
+            return self.max_age
+        return max(0, self.max_age - pyb.elapsed_millis(self.first_frame_time))
+
+    def flush(self):
+        """Write the buffered frames and timestamps to the files."""
+        if not self.frames:
+            return
+        start = pyb.micros()
+        self.file_data.write(self.data_buffer, 0, self.data_length)
+        self.file_data.flush()
+        self.file_time.write(self.time_buffer, 0, self.time_length)
+        self.file_time.flush()
+        self.count_flush(start, self.data_length + self.time_length)
+        self.data_length = 0
+        self.time_length = 0
+
+    def count_flush(self, start, nbytes):
+        """Update the metrics after a flush started at start (us) and writing nbytes."""
+        duration = pyb.elapsed_micros(start)
+        metrics.add(metrics.BYTES_WRITTEN, nbytes)
+        metrics.add(metrics.FLUSHES)
+        metrics.add(metrics.FLUSH_TIME_TOTAL, duration)
+        metrics.update_max(metrics.FLUSH_TIME_MAX, duration)
+        self.frames = 0
+
+    @micropython.viper
+    def append(self, data, begin: int, end: int):
+        """Append data[begin:end] to the data buffer, without allocating."""
+        position = int(self.data_length)
+        buffer = ptr8(self.data_buffer)
+        source = ptr8(data)
+        for i in range(begin, end):
+            buffer[position] = source[i]
+            position += 1
+        self.data_length = position
+
+    def format_timestamp(self, timestamp):
+        """Append the timestamp and a newline to the time buffer, without allocating."""
+        buffer = self.time_buffer
+        digits = 1
+        power = 10
+        while power <= timestamp:
+            digits += 1
+            power *= 10
+        position = self.time_length + digits
+        buffer[position] = 0x0A  # Newline
+        self.time_length = position + 1
+        for _ in range(digits):
+            position -= 1
+            buffer[position] = 0x30 + timestamp % 10
+            timestamp //= 10
+
+
+class BinaryWriter(Writer):
+    """Write the frames and their timestamps as records of a single binary file, through a buffer.
+
+    With delta encoding, a record only holds the groups which changed since the previous frame when the groups have the
+    same labels in the same order. The records with an absolute time are keyframes, holding every group.
+    """
+    def __init__(self, filename, delta=False, buffer_length=WRITE_BUFFER_LENGTH, max_age=WRITE_MAX_AGE,
+                 segments=None):
+        super().__init__(filename, None, buffer_length, max_age, segments)
+        self.time_buffer = None
+        self.previous_timestamp = 0
+        self.records_since_sync = 0
+        self.delta = delta
+        self.reference = bytearray(MAX_FRAME_LENGTH) if delta else None  # Previous complete frame
+        self.reference_length = 0
+        self.frame = None  # Frame being encoded
+
+    def init(self):
+        """Initialize the writer."""
+        if self.segments is not None:
+            self.segments.start(self.filename_data)
+        self.file_data = open(self.current_name(self.filename_data), "ab")
+        if self.file_data.tell() == 0:  # New file
+            self.file_data.write(BINARY_MAGIC)
+        self.data_length = 0
+        self.frames = 0
+        self.records_since_sync = 0  # The first record after a restart has an absolute time
+        self.reference_length = 0
+        self.initialized = True
+
+    def deinit(self):
+        """Deinitialize the writer."""
+        self.flush()
+        self.file_data.close()
+        self.initialized = False
+        if self.segments is not None:
+            self.segments.close(self.filename_data, None)
 
-    def write(self, data, timestamp):
-        """Write data to a file."""
+    def write(self, data, length, timestamp):
+        """Buffer the length first bytes of data and their timestamp as a record."""
         if self.initialized:
-            self.file_data.write(data)
-            self.file_data.flush()
-            self.file_time.write(timestamp + "\n")
-            self.file_time.flush()
+            self.count_segment(length + RECORD_OVERHEAD, timestamp)
+            if self.data_length + length + RECORD_OVERHEAD > len(self.data_buffer):
+                self.flush()
+            if not self.frames:
+                self.first_frame_time = pyb.millis()
+            self.frames += 1
+            start = self.data_length
+            marker = RECORD_MARKER
+            is_complete = data[length - 1] != EOT
+            if not is_complete:
+                marker |= RECORD_TRUNCATED
+            delta = timestamp - self.previous_timestamp
+            self.put(0, 3)  # Marker and length, set below
+            if self.records_since_sync == 0 or not 0 <= delta <= 0xFFFF:  # Keyframe
+                marker |= RECORD_ABSOLUTE
+                self.put(timestamp & 0xFFFFFFFF, 4)
+                self.records_since_sync = 0
+            else:
+                self.put(delta, 2)
+            content_start = self.data_length
+            if marker == RECORD_MARKER and self.delta and self.append_changes(data, length):
+                marker |= RECORD_DELTA
+            else:
+                self.append(data, 1, length - 1)  # Content, without STX and ETX or EOT
+            self.store(start, marker, 1)
+            self.store(start + 1, self.data_length - content_start, 2)
+            self.put(crc16(self.data_buffer, start, self.data_length), 2)
+            if self.delta and is_complete:
+                copy(self.reference, data, length)
+                self.reference_length = length
+            self.previous_timestamp = timestamp
+            self.records_since_sync = (self.records_since_sync + 1) % RECORD_SYNC_PERIOD
+            if self.is_due():
+                self.flush()
         else:
             print("Race condition occured...")
 
+    def append_changes(self, data, length):
+        """Append the groups of a frame which differ from the reference frame to the data buffer.
+
+        Return False, without appending anything, if the groups do not have the same labels as in the reference frame.
+        """
+        reference = self.reference
+        self.frame = data
+        start = self.data_length
+        position = 1
+        reference_position = 1
+        end = length - 1
+        reference_end = self.reference_length - 1
+        while position < end:
+            group_end = find(data, CR, position, end)
+            label_end = find(data, SP, position, end)
+            reference_group_end = find(reference, CR, reference_position, reference_end)
+            label_length = label_end - position
+            if group_end == -1 or label_end == -1 or reference_group_end == -1 \
+                    or reference_position + label_length >= reference_group_end \
+                    or reference[reference_position + label_length] != SP \
+                    or not self.matches(position, reference_position, label_length):
+                self.data_length = start
+                return False
+            group_length = group_end + 1 - position
+            if group_length != reference_group_end + 1 - reference_position \
+                    or not self.matches(position, reference_position, group_length):
+                self.append(data, position, group_end + 1)
+            position = group_end + 1
+            reference_position = reference_group_end + 1
+        if reference_position != reference_end:  # Groups missing from the frame
+            self.data_length = start
+            return False
+        return True
+
+    @micropython.viper
+    def matches(self, begin: int, reference_begin: int, length: int) -> bool:
+        """Return whether length bytes of the frame at begin are equal to those of the reference at reference_begin."""
+        frame = ptr8(self.frame)
+        reference = ptr8(self.reference)
+        for i in range(length):
+            if frame[begin + i] != reference[reference_begin + i]:
+                return False
+        return True
+
+    def put(self, value, size):
+        """Append an unsigned integer of size bytes to the data buffer, little endian."""
+        self.store(self.data_length, value, size)
+        self.data_length += size
+
+    def store(self, position, value, size):
+        """Store an unsigned integer of size bytes in the data buffer at position, little endian."""
+        buffer = self.data_buffer
+        for i in range(size):
+            buffer[position + i] = value & 0xFF
+            value >>= 8
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        if not self.frames:
+            return
+        start = pyb.micros()
+        self.file_data.write(self.data_buffer, 0, self.data_length)
+        self.file_data.flush()
+        self.count_flush(start, self.data_length)
+        self.data_length = 0
+
+
+@micropython.viper
+def find(data, value: int, begin: int, end: int) -> int:
+    """Return the position of the first byte equal to value in data[begin:end], or -1, without allocating."""
+    buffer = ptr8(data)
+    for i in range(begin, end):
+        if buffer[i] == value:
+            return i
+    return -1
+
+
+@micropython.viper
+def find_end(data, begin: int, end: int) -> int:
+    """Return the position of the first ETX or EOT in data[begin:end], or -1, without allocating."""
+    buffer = ptr8(data)
+    for i in range(begin, end):
+        if buffer[i] == ETX or buffer[i] == EOT:
+            return i
+    return -1
+
+
+@micropython.viper
+def copy(destination, source, length: int):
+    """Copy the length first bytes of source to destination, without allocating."""
+    destination_buffer = ptr8(destination)
+    source_buffer = ptr8(source)
+    for i in range(length):
+        destination_buffer[i] = source_buffer[i]
+
+
+@micropython.viper
+def crc16(data, begin: int, end: int) -> int:
+    """Compute the CRC-16/CCITT-FALSE of data[begin:end]."""
+    buffer = ptr8(data)
+    crc = 0xFFFF
+    for i in range(begin, end):
+        crc ^= buffer[i] << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
 
 class Timestamper:
     def __init__(self, start):
@@ -126,6 +630,7 @@ class Timestamper:
         self.previous_timestamp = 0
         self.max = 2**30
         self.times_wrapped = 0
+        self.skipped = 0  # Time elapsed while the system ticks were stopped (ms)
         self.elapsed_time_func = lambda: pyb.elapsed_millis(self.start)  # useful to test counter looping
 
     def timestamp(self):
@@ -133,47 +638,100 @@ class Timestamper:
         if elapsed_millis < self.previous_elapsed_millis:
             self.times_wrapped += 1
         self.previous_elapsed_millis = elapsed_millis
-        timestamp = self.times_wrapped * self.max + elapsed_millis
+        timestamp = self.times_wrapped * self.max + elapsed_millis + self.skipped
         self.previous_timestamp = timestamp
         return timestamp
 
+    def skip(self, duration):
+        """Account for a duration (ms) elapsed while the system ticks were stopped."""
+        self.skipped += duration
+
 
 class Logger:
-    def __init__(self, meter_mode, channel, filename_data, filename_time, active_wait_time, inactive_wait_time, on_reception):
+    """Log the TIC interface with a reception task and a storage task, linked by a queue.
+
+    The storage task is the only one using the files. The start and stop of the logger reach it through the queue,
+    after the frames received before.
+    """
+    def __init__(self, meter_mode, channel, filename_data, filename_time, on_reception, output_format="text",
+                 policy_rules=None, filename_index=None):
         self.timestamper = Timestamper(pyb.millis())
         self.on_reception = on_reception
         self.active = False
-        self.active_wait_time = active_wait_time
-        self.inactive_wait_time = inactive_wait_time
+        self.activated = asyncio.Flag(2)  # Set while the logger is active, awaited by the reception and the report
+        self.buffered = asyncio.Flag()  # Set while frames may be buffered in the writer
         self.parser = Parser()
         self.reader = create_reader(meter_mode, channel)
-        self.writer = Writer(filename_data, filename_time)
+        self.queue = FrameQueue()
+        self.writer = create_writer(output_format, filename_data, filename_time, filename_index)
+        self.policy = policy.create(policy_rules, MAX_FRAME_LENGTH)  # Selection of the logged groups, if any
 
     def activate(self):
         """Activate the logger."""
-        self.active = True
-        self.reader.init()
-        self.parser.init()
-        self.writer.init()
+        if self.queue.push_command(COMMAND_START, self.timestamper.timestamp()):
+            self.active = True
+            self.reader.init()
+            self.parser.init()
+            self.activated.set()
 
     def deactivate(self):
         """Deactivate the logger."""
-        self.active = False
-        self.reader.deinit()
-        self.parser.deinit()
-        self.writer.deinit()
+        if self.queue.push_command(COMMAND_STOP, self.timestamper.timestamp()):
+            self.active = False
+            self.activated.clear()
+            self.reader.deinit()
+            self.parser.deinit()
 
     async def log(self):
-        """Log the TIC interface."""
+        """Receive the frames of the TIC interface and queue them."""
         while True:
-            if self.active:
-                data = await self.reader.read()
-                frame_data, is_frame_complete = self.parser.parse(data)
-                if frame_data is not None:  # Frame received
-                    self.on_reception()
-                    timestamp = str(self.timestamper.timestamp())
-                    # TODO: correct race condition where file is closed when awaiting and then write is attempted
-                    self.writer.write(frame_data, timestamp)
-                await asyncio.sleep_ms(self.active_wait_time)
-            else:
-                await asyncio.sleep_ms(self.inactive_wait_time)
+            await self.activated  # Until the logger is started
+            await self.reader.readable  # Until bytes are received
+            if not self.active:  # Paused while waiting
+                continue
+            self.parser.feed(self.reader.buffer, self.reader.read())
+            while self.parser.next_frame():  # Frame received
+                self.on_reception()
+                metrics.add(metrics.FRAMES_RECEIVED)
+                if not self.parser.is_frame_complete:
+                    metrics.add(metrics.FRAMES_TRUNCATED)
+                self.queue.push_frame(self.parser.buffer, self.parser.length, self.timestamper.timestamp())
+
+    async def store(self):
+        """Store the queued frames and execute the queued commands."""
+        queue = self.queue
+        while True:
+            await queue.not_empty
+            length = queue.lengths[queue.head]
+            timestamp = queue.timestamps[queue.head]
+            if length == COMMAND_START:
+                self.writer.init()
+                if self.policy is not None:
+                    self.policy.init()
+            elif length == COMMAND_STOP:
+                if self.policy is not None and self.policy.close():  # Aggregates of the unfinished buckets
+                    self.writer.write(self.policy.buffer, self.policy.length, timestamp)
+                self.writer.deinit()
+                metrics.write()  # Up to date metrics while inactive
+            elif length == COMMAND_FLUSH:
+                if self.writer.initialized and self.writer.is_due():
+                    self.writer.flush()
+            elif self.policy is None:
+                self.writer.write(queue.frames[queue.head], length, timestamp)
+            elif self.policy.select(queue.frames[queue.head], length, timestamp):
+                self.writer.write(self.policy.buffer, self.policy.length, timestamp)
+            queue.pop()
+            if self.writer.frames:
+                self.buffered.set()
+            await asyncio.sleep_ms(0)  # Let the frames be received between two writes
+
+    async def sync(self):
+        """Have the buffered frames written to the files when they are too old, even if no more frames are received."""
+        while True:
+            await self.buffered  # Until frames are buffered
+            await asyncio.sleep_ms(self.writer.time_to_due())
+            if self.writer.is_due():
+                self.buffered.clear()  # Set again by the storage task if frames are still buffered
+                self.queue.push_command(COMMAND_FLUSH, 0)
+            elif not self.writer.frames:
+                self.buffered.clear()
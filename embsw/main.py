@@ -1,21 +1,37 @@
 import pyb
 import machine
 import uasyncio as asyncio
-import lib.aswitch as aswitch
 import logger
 import manager
 import notifications
 import input
+import metrics
+import power
 
-# Sleep time for inactivity
-SLEEP_TIME_INACTIVE = 50  # (ms)
-SLEEP_TIME_ACTIVE = 10  # (ms)
+# Delay before retrying a transition of the manager
+RETRY_TIME = 10  # (ms)
 
 # Configuration
 METER_MODE = "historic"
-OUTPUT_FILE_DATA = "data.txt"
+OUTPUT_FORMAT = "text"  # "text" (data and time files), "binary" or "delta" (binary with changed groups only)
+OUTPUT_FILE_DATA = "data.txt" if OUTPUT_FORMAT == "text" else "data.bin"
 OUTPUT_FILE_TIME = "time.txt"
+# Index of the segments of the output files (at most 1 MB or one day each), None to write single files
+OUTPUT_FILE_INDEX = "index.txt"
+# Selection of the logged groups: None to log every frame verbatim, or {label: (mode, parameter)} with mode "all",
+# "every" (every parameter-th value), "change" (values different from the previous one) or "aggregate" (mean,
+# minimum and maximum over buckets of parameter ms). The labels without a rule are logged with every frame.
+# For instance: {"PAPP": ("aggregate", 60000), "IINST": ("every", 10), "BASE": ("change",), "ADCO": ("change",)}
+# The viewer carries the last logged value of a label forward over the frames it was left out of.
+LOGGING_POLICY = None
 UART_CHANNEL = 3
+# Light sleep of the board while the logger is inactive, woken by the button
+LOW_POWER_IDLE = True
+# Scheduling statistics of the tasks (steps, run time, longest step, timer lateness), written with the metrics
+PROFILE_LOOP = False
+# Budget of the event loop: long-lived tasks, callbacks ready at once (timeouts of the LEDs, button), and timers
+# pending besides the sleeps of the tasks (timeouts of the LED waits ended early, button). The queues grow if needed.
+LOOP_BUDGET = {"tasks": 10, "callbacks": 6, "timers": 8}
 
 
 def main():
@@ -30,23 +46,35 @@ def logger_mode():
                         UART_CHANNEL,
                         OUTPUT_FILE_DATA,
                         OUTPUT_FILE_TIME,
-                        SLEEP_TIME_ACTIVE,
-                        SLEEP_TIME_INACTIVE,
-                        notifications.frame_received)
+                        notifications.frame_received,
+                        OUTPUT_FORMAT,
+                        LOGGING_POLICY,
+                        OUTPUT_FILE_INDEX)
     mgr = manager.Manager(log,
-                          SLEEP_TIME_ACTIVE,
+                          RETRY_TIME,
                           notifications.device_logging,
                           notifications.logger_paused,
                           notifications.logger_started,
-                          notifications.device_stopped)
-    button = aswitch.Pushbutton(machine.Pin.board.SW)
-    button.long_func(lambda: input.callback_long_press(mgr))
+                          notifications.device_stopped,
+                          notifications.logger_busy)
+    button = input.Button(machine.Pin.board.SW,
+                          on_press=lambda: mgr.notify(manager.Event.EVENT1),
+                          on_long_press=lambda: mgr.notify(manager.Event.EVENT2))
 
     loop = asyncio.get_event_loop()
+    loop.reserve(*asyncio.queue_lengths(**LOOP_BUDGET))
+    if LOW_POWER_IDLE:
+        loop.idle_hook = power.Idle(log, (button.edge,))
+    if PROFILE_LOOP:
+        loop.profile = asyncio.Profile()
     loop.create_task(log.log())
+    loop.create_task(log.store())
+    loop.create_task(log.sync())
     loop.create_task(mgr.execute())
-    loop.create_task(input.detect_button_press(mgr))
-    loop.create_task(button.buttoncheck())
+    loop.create_task(button.run())
+    loop.create_task(metrics.report(log.activated))
+    for led in notifications.LEDS:
+        loop.create_task(led.run())
     loop.run_forever()
 
 
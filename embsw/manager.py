@@ -1,5 +1,7 @@
+import ucollections
 import uasyncio as asyncio
 import utoken
+import metrics
 
 
 class State:
@@ -13,75 +15,87 @@ class Event:
     EVENT2 = 1
 
 
+# Maximum number of events waiting to be handled
+EVENT_QUEUE_LENGTH = 8
+
+
 class Manager:
     """Manage the state of the device."""
-    def __init__(self, logger, wait_time, on_init, on_pause, on_start, on_stop):
+    def __init__(self, logger, retry_time, on_init, on_pause, on_start, on_stop, on_busy=None):
         self.logger = logger
-        self.wait_time = wait_time
+        self.retry_time = retry_time  # Delay before retrying a transition refused by the logger (ms)
+        self.on_busy = on_busy  # Called when the logger refuses a transition, until it is done
         self.on_pause = on_pause
         self.on_start = on_start
         self.on_stop = on_stop
         self.on_init = on_init
-        self.event1_notified = False
-        self.event2_notified = False
+        self.events = ucollections.deque((), EVENT_QUEUE_LENGTH, 1)  # Notified events, in order
+        self.notified = asyncio.Flag()
         self.state = State.PAUSED
 
     def notify(self, event):
-        if event == Event.EVENT1:
-            self.event1_notified = True
-        elif event == Event.EVENT2:
-            self.event2_notified = True
-        else:
-            raise ValueError
-
-    def acknowledge(self, event):
-        if event == Event.EVENT1:
-            self.event1_notified = False
-        elif event == Event.EVENT2:
-            self.event2_notified = False
-        else:
+        if event != Event.EVENT1 and event != Event.EVENT2:
             raise ValueError
+        try:
+            self.events.append(event)
+        except IndexError:  # Queue full, the event is ignored
+            return
+        self.notified.set()
 
     def transition(self, dest_state):
+        """Transition to a state. Return False if the logger refused it, for the transition to be retried."""
         # Transition to STOPPED
         if (self.state == State.PAUSED or self.state == State.STARTED) and dest_state == State.STOPPED:
             self.logger.deactivate()
-            if not self.logger.active:
-                self.acknowledge(Event.EVENT2)
-                if not utoken.exists():
-                    utoken.create()
-                self.on_stop()
-                self.state = State.STOPPED
+            if self.logger.active:
+                return False
+            if not utoken.exists():
+                utoken.create()
+            self.on_stop()
+            self.state = State.STOPPED
         # Transition to PAUSED
         elif self.state == State.STARTED and dest_state == State.PAUSED:
             self.logger.deactivate()
-            if not self.logger.active:
-                self.acknowledge(Event.EVENT1)
-                self.on_pause()
-                self.state = State.PAUSED
+            if self.logger.active:
+                return False
+            self.on_pause()
+            self.state = State.PAUSED
         # Transition to STARTED
         elif self.state == State.PAUSED and dest_state == State.STARTED:
             self.logger.activate()
-            if self.logger.active:
-                self.acknowledge(Event.EVENT1)
-                self.on_start()
-                self.state = State.STARTED
+            if not self.logger.active:
+                return False
+            self.on_start()
+            self.state = State.STARTED
+        else:
+            return True
+        metrics.add(metrics.TRANSITIONS)
+        return True
+
+    def handle(self, event):
+        """Handle an event. Return False if it has to be handled again later."""
+        if self.state == State.PAUSED or self.state == State.STARTED:
+            if event == Event.EVENT2:
+                return self.transition(State.STOPPED)
+            elif self.state == State.PAUSED:
+                return self.transition(State.STARTED)
+            else:
+                return self.transition(State.PAUSED)
+        elif self.state == State.STOPPED:
+            return True
+        else:
+            raise ValueError
 
     async def execute(self):
         self.on_init()
         while True:
-            if self.state == State.PAUSED:
-                if self.event2_notified:
-                    self.transition(State.STOPPED)
-                elif self.event1_notified:
-                    self.transition(State.STARTED)
-            elif self.state == State.STARTED:
-                if self.event2_notified:
-                    self.transition(State.STOPPED)
-                elif self.event1_notified:
-                    self.transition(State.PAUSED)
-            elif self.state == State.STOPPED:
-                pass
-            else:
-                raise ValueError
-            await asyncio.sleep_ms(self.wait_time)
+            await self.notified  # Until an event is notified
+            self.notified.clear()
+            while self.events:
+                event = self.events.popleft()
+                busy = False
+                while not self.handle(event):
+                    if not busy and self.on_busy is not None:
+                        self.on_busy()
+                    busy = True
+                    await asyncio.sleep_ms(self.retry_time)
@@ -0,0 +1,108 @@
+import gc
+import pyb
+import uasyncio as asyncio
+from micropython import const
+
+# Indices of the metrics
+FRAMES_RECEIVED = const(0)
+FRAMES_TRUNCATED = const(1)  # Frames ended by EOT
+FRAMES_OVERSIZE = const(2)  # Frames dropped for being too long
+FRAMES_DROPPED = const(3)  # Frames dropped with a full queue
+QUEUE_HIGH_WATER_MARK = const(4)
+BYTES_READ = const(5)
+BYTES_WRITTEN = const(6)
+FLUSHES = const(7)
+FLUSH_TIME_TOTAL = const(8)  # (us)
+FLUSH_TIME_MAX = const(9)  # (us)
+TRANSITIONS = const(10)  # Transitions of the manager
+LOOP_LAG_MAX = const(11)  # Maximum delay of a timer of the event loop (ms)
+HEAP_FREE = const(12)  # Free heap at the last snapshot (bytes)
+HEAP_FREE_MIN = const(13)  # Minimum free heap over the snapshots (bytes)
+UPTIME = const(14)  # Time since the start at the last snapshot (ms)
+IDLE_TIME = const(15)  # Time slept by the board in low-power idle (ms)
+ACTIVE_TIME = const(16)  # Time awake, running the tasks or waiting for I/O, including the start (ms)
+RUNQ_LENGTH = const(17)  # Entries of the run queue of the event loop, doubled when full
+WAITQ_LENGTH = const(18)  # Entries of the timer queue of the event loop, doubled when full
+
+NAMES = ("frames_received", "frames_truncated", "frames_oversize", "frames_dropped", "queue_high_water_mark",
+         "bytes_read", "bytes_written", "flushes", "flush_time_total", "flush_time_max", "transitions",
+         "loop_lag_max", "heap_free", "heap_free_min", "uptime", "idle_time", "active_time", "runq_length",
+         "waitq_length")
+
+# Period of the snapshots written to the file (ms)
+SNAPSHOT_PERIOD = 60000
+SNAPSHOT_FILE = "stats.txt"
+
+values = [0] * len(NAMES)
+values[HEAP_FREE_MIN] = -1  # No snapshot yet
+
+
+def add(index, value=1):
+    """Add a value to a counter."""
+    values[index] += value
+
+
+def update_max(index, value):
+    """Update a maximum with a value."""
+    if value > values[index]:
+        values[index] = value
+
+
+def reset():
+    """Reset all of the metrics."""
+    for i in range(len(values)):
+        values[i] = 0
+    values[HEAP_FREE_MIN] = -1
+
+
+def sample():
+    """Sample the metrics which are not counted by the code: free heap, event loop lag, times and queues."""
+    free = gc.mem_free()
+    values[HEAP_FREE] = free
+    if values[HEAP_FREE_MIN] < 0 or free < values[HEAP_FREE_MIN]:
+        values[HEAP_FREE_MIN] = free
+    loop = asyncio.get_event_loop()
+    values[LOOP_LAG_MAX] = loop.lag_max
+    values[UPTIME] = pyb.millis() + loop.time_skipped
+    values[IDLE_TIME] = loop.idle_time
+    values[ACTIVE_TIME] = values[UPTIME] - loop.idle_time
+    values[RUNQ_LENGTH] = loop.runq_len
+    values[WAITQ_LENGTH] = loop.waitq_len
+
+
+def snapshot():
+    """Return the current metrics as a dictionary."""
+    sample()
+    return dict(zip(NAMES, values))
+
+
+def show():
+    """Print the current metrics, for instance in the REPL after interrupting the logger (Ctrl-C)."""
+    for name, value in snapshot().items():
+        print("{}: {}".format(name, value))
+    profile = asyncio.get_event_loop().profile
+    if profile is not None:
+        profile.show()
+
+
+def write(filename=SNAPSHOT_FILE):
+    """Write the current metrics to a file, one line per metric, followed by the profile of the event loop if any:
+    one line per task with its name, steps, time (ms), longest step (us) and largest lateness (ms)."""
+    sample()
+    with open(filename, "w") as f:
+        for name, value in zip(NAMES, values):
+            f.write("{} {}\n".format(name, value))
+        profile = asyncio.get_event_loop().profile
+        if profile is not None:
+            f.write("runq_max {}\nwaitq_max {}\nstep_max {} {}\n".format(
+                profile.runq_max, profile.waitq_max, profile.step_max, asyncio.task_name(profile.step_max_task)))
+            for row in profile.report():
+                f.write("task {} {} {} {} {}\n".format(*row))
+
+
+async def report(active, filename=SNAPSHOT_FILE, period=SNAPSHOT_PERIOD):
+    """Write the metrics to a file periodically, while the flag active is set."""
+    while True:
+        await active
+        await asyncio.sleep_ms(period)
+        write(filename)
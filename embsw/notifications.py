@@ -1,48 +1,102 @@
 import uasyncio as asyncio
 import machine
 
-LED_DEVICE_TRANSFERRING = machine.Pin.board.LED_BLUE
-LED_DEVICE_LOGGING = machine.Pin.board.LED_GREEN
-LED_LOGGER_STARTED = machine.Pin.board.LED_RED
-LED_LOGGER_STOPPED = machine.Pin.board.LED_YELLOW
-LED_FRAME_RECEPTION = machine.Pin.board.LED_YELLOW
+
+class Pattern:
+    """Declarative pattern of a LED: durations (ms) alternately on and off, starting on, played once or repeated.
+
+    A negative duration holds the LED until the next pattern.
+    """
+    def __init__(self, steps, repeat=False):
+        self.steps = steps
+        self.repeat = repeat
+
+
+def error_code(code):
+    """Return the pattern of an error code: code blinks, then a pause, repeated."""
+    return Pattern((200, 300) * (code - 1) + (200, 1500), repeat=True)
+
+
+ON = Pattern((-1,))
+OFF = Pattern(())
+PULSE = Pattern((100,))
+HEARTBEAT = Pattern((50, 150, 50, 1750), repeat=True)
+LOGGER_BUSY = error_code(2)
+
+
+class Led:
+    """LED playing patterns in a long-lived task, retriggered without allocating memory."""
+    def __init__(self, pin):
+        self.pin = pin
+        self.pattern = OFF
+        self.changed = asyncio.Flag()  # Set when a pattern is shown
+        self.wait = asyncio.TimedWait(self.changed)
+
+    def show(self, pattern):
+        """Play a pattern, from its start, instead of the current one."""
+        self.pattern = pattern
+        self.pin.value(len(pattern.steps) > 0)  # Also without the event loop
+        self.changed.set()
+
+    async def run(self):
+        """Play the patterns shown on the LED."""
+        while True:
+            await self.changed  # Until a pattern is shown
+            self.changed.clear()
+            steps = self.pattern.steps
+            repeat = self.pattern.repeat
+            i = 0
+            while i < len(steps):
+                self.pin.value(not i % 2)
+                if steps[i] < 0:  # Held until the next pattern
+                    break
+                await self.wait(steps[i])  # Until the end of the step or the next pattern
+                if self.changed.is_set():
+                    break
+                i += 1
+                if repeat and i == len(steps):
+                    i = 0
+            if i == len(steps):
+                self.pin.off()
+
+
+LED_DEVICE_TRANSFERRING = Led(machine.Pin.board.LED_BLUE)
+LED_DEVICE_LOGGING = Led(machine.Pin.board.LED_GREEN)
+LED_LOGGER_STARTED = Led(machine.Pin.board.LED_RED)
+LED_LOGGER_STOPPED = Led(machine.Pin.board.LED_YELLOW)
+LEDS = (LED_DEVICE_TRANSFERRING, LED_DEVICE_LOGGING, LED_LOGGER_STARTED, LED_LOGGER_STOPPED)
 
 
 def device_transferring():
-    LED_DEVICE_TRANSFERRING.on()
-    LED_DEVICE_LOGGING.off()
-    LED_LOGGER_STARTED.off()
-    LED_LOGGER_STOPPED.off()
-    LED_FRAME_RECEPTION.off()
+    LED_DEVICE_TRANSFERRING.show(ON)
+    LED_DEVICE_LOGGING.show(OFF)
+    LED_LOGGER_STARTED.show(OFF)
+    LED_LOGGER_STOPPED.show(OFF)
 
 
 def device_logging():
-    LED_DEVICE_LOGGING.on()
-    LED_DEVICE_TRANSFERRING.off()
+    LED_DEVICE_LOGGING.show(ON)
+    LED_DEVICE_TRANSFERRING.show(OFF)
 
 
 def logger_paused():
-    LED_LOGGER_STARTED.off()
-    LED_LOGGER_STOPPED.off()
+    LED_LOGGER_STARTED.show(OFF)
+    LED_LOGGER_STOPPED.show(OFF)
 
 
 def logger_started():
-    LED_LOGGER_STARTED.on()
-    LED_LOGGER_STOPPED.off()
+    LED_LOGGER_STARTED.show(HEARTBEAT)
+    LED_LOGGER_STOPPED.show(OFF)
 
 
 def device_stopped():
-    LED_LOGGER_STARTED.off()
-    LED_LOGGER_STOPPED.on()
+    LED_LOGGER_STARTED.show(OFF)
+    LED_LOGGER_STOPPED.show(ON)
 
 
-async def pulse_led(led, period):
-    """Pulse a LED once."""
-    led.on()
-    await asyncio.sleep_ms(period)
-    led.off()
+def logger_busy():
+    LED_LOGGER_STARTED.show(LOGGER_BUSY)  # Until the state of the transition is shown
 
 
 def frame_received():
-    pulse_duration = 100
-    asyncio.get_event_loop().call_soon(pulse_led(LED_FRAME_RECEPTION, pulse_duration))
+    LED_LOGGER_STOPPED.show(PULSE)  # Only while the logger is started, the LED is off then
@@ -0,0 +1,251 @@
+import micropython
+
+# Modes of the rules
+MODE_ALL = "all"  # Every value
+MODE_EVERY = "every"  # Every parameter-th value
+MODE_CHANGE = "change"  # Values different from the previous logged one
+MODE_AGGREGATE = "aggregate"  # Mean, minimum and maximum over buckets of parameter ms, for numerical values
+MODES = (MODE_ALL, MODE_EVERY, MODE_CHANGE, MODE_AGGREGATE)
+
+# Labels which must be logged without loss, whatever the rules
+LOSSLESS_LABELS = (b"BASE",)
+
+# Suffixes of the labels of the minimum and maximum of an aggregate
+LABEL_SUFFIX_MIN = b"MIN"
+LABEL_SUFFIX_MAX = b"MAX"
+
+MAX_GROUP_LENGTH = 64
+
+
+def create(rules, max_frame_length):
+    """Create a policy from a dictionary {label: (mode, parameter)}, or return None if there are no rules."""
+    if rules is None:
+        return None
+    return Policy([Rule(label, *rule) for label, rule in rules.items()], max_frame_length)
+
+
+class Rule:
+    """Selection of the values of a label."""
+    def __init__(self, label, mode, parameter=0):
+        if isinstance(label, str):
+            label = label.encode()
+        if mode not in MODES:
+            raise ValueError("mode is '{}' but is expected to be one of {}.".format(mode, MODES))
+        if label in LOSSLESS_LABELS and mode not in (MODE_ALL, MODE_CHANGE):
+            raise ValueError("{} must be logged losslessly, with mode '{}' or '{}'.".format(label, MODE_ALL,
+                                                                                            MODE_CHANGE))
+        self.label = label
+        self.label_min = label + LABEL_SUFFIX_MIN
+        self.label_max = label + LABEL_SUFFIX_MAX
+        self.mode = mode
+        self.parameter = parameter
+        self.last = bytearray(MAX_GROUP_LENGTH)  # Last logged group
+        self.init()
+
+    def init(self):
+        self.count = 0
+        self.last_length = 0
+        self.samples = 0  # Number of values in the bucket
+        self.bucket_start = 0  # (ms)
+        self.total = 0
+        self.minimum = 0
+        self.maximum = 0
+        self.width = 0  # Number of digits of the values
+
+    @micropython.viper
+    def keep(self, data, begin: int, end: int):
+        """Keep data[begin:end] as the last logged group."""
+        last = ptr8(self.last)
+        source = ptr8(data)
+        for i in range(begin, end):
+            last[i - begin] = source[i]
+        self.last_length = end - begin
+
+
+class Policy:
+    """Select the groups of the frames to log, label by label.
+
+    The selected groups of a frame are gathered in a frame of their own, in buffer[:length]. The labels without a rule
+    are logged with every frame. The aggregates of a bucket are logged with the first frame after its end.
+    """
+    def __init__(self, rules, max_frame_length):
+        self.rules = rules
+        self.buffer = bytearray(max_frame_length + 3 * MAX_GROUP_LENGTH * len(rules))  # Frame and aggregates
+        self.length = 0
+        self.frame = None  # Frame being selected
+
+    def init(self):
+        for rule in self.rules:
+            rule.init()
+        self.length = 0
+
+    def select(self, data, length, timestamp):
+        """Select the groups of the length first bytes of data. Return whether a group was selected."""
+        self.frame = data
+        self.length = 1
+        self.buffer[0] = 0x02  # STX
+        selected = False
+        position = 1
+        while True:
+            group_end = find(data, 0x0D, position, length)  # CR
+            if group_end == -1:
+                break
+            label_end = find(data, 0x20, position, group_end)  # SP
+            if data[position] == 0x0A and label_end != -1:  # LF
+                rule = self.find_rule(position + 1, label_end)
+                if rule is None or rule.mode == MODE_ALL:
+                    self.append(data, position, group_end + 1)
+                    selected = True
+                elif self.apply(rule, position, label_end, group_end, timestamp):
+                    selected = True
+            position = group_end + 1
+        self.buffer[self.length] = 0x03  # ETX
+        self.length += 1
+        return selected
+
+    def close(self):
+        """Select the aggregates of the current buckets. Return whether there were any."""
+        self.length = 1
+        self.buffer[0] = 0x02  # STX
+        selected = False
+        for rule in self.rules:
+            if rule.mode == MODE_AGGREGATE and rule.samples:
+                self.append_aggregates(rule)
+                selected = True
+        self.buffer[self.length] = 0x03  # ETX
+        self.length += 1
+        return selected
+
+    def find_rule(self, begin, end):
+        """Return the rule of the label in the frame at begin:end, or None."""
+        for rule in self.rules:
+            if len(rule.label) == end - begin and equal(self.frame, begin, rule.label, end - begin):
+                return rule
+        return None
+
+    def apply(self, rule, begin, label_end, group_end, timestamp):
+        """Apply a rule to the group at begin:group_end + 1. Return whether a group was selected."""
+        data = self.frame
+        if rule.mode == MODE_EVERY:
+            rule.count -= 1
+            if rule.count > 0:
+                return False
+            rule.count = rule.parameter
+        elif rule.mode == MODE_CHANGE:
+            length = group_end + 1 - begin
+            if length == rule.last_length and equal(data, begin, rule.last, length):
+                return False
+            if length <= len(rule.last):
+                rule.keep(data, begin, group_end + 1)
+        else:  # Aggregate
+            return self.aggregate(rule, begin, label_end, group_end, timestamp)
+        self.append(data, begin, group_end + 1)
+        return True
+
+    def aggregate(self, rule, begin, label_end, group_end, timestamp):
+        """Add the value of the group at begin:group_end + 1 to the bucket of the rule.
+
+        Return whether the aggregates of the previous bucket were selected.
+        """
+        data = self.frame
+        end = group_end - 2  # End of the value
+        if end <= label_end + 1 or data[end] != 0x20 or checksum(data, begin + 1, end) != data[group_end - 1]:
+            return False  # Invalid group
+        begin = label_end + 1
+        value = 0
+        for i in range(begin, end):
+            if not 0x30 <= data[i] <= 0x39:
+                return False
+            value = 10 * value + data[i] - 0x30
+        selected = False
+        if rule.samples and timestamp - rule.bucket_start >= rule.parameter:  # End of the bucket
+            self.append_aggregates(rule)
+            selected = True
+        if not rule.samples:
+            rule.bucket_start = timestamp
+            rule.total = 0
+            rule.minimum = value
+            rule.maximum = value
+            rule.width = end - begin
+        rule.samples += 1
+        rule.total += value
+        rule.minimum = min(rule.minimum, value)
+        rule.maximum = max(rule.maximum, value)
+        return selected
+
+    def append_aggregates(self, rule):
+        """Append the mean, minimum and maximum of the bucket of a rule, and empty it."""
+        self.append_group(rule.label, (rule.total + rule.samples // 2) // rule.samples, rule.width)
+        self.append_group(rule.label_min, rule.minimum, rule.width)
+        self.append_group(rule.label_max, rule.maximum, rule.width)
+        rule.samples = 0
+
+    def append_group(self, label, value, width):
+        """Append a group with a numerical value of width digits (or more if needed), and its checksum."""
+        buffer = self.buffer
+        position = self.length
+        buffer[position] = 0x0A  # LF
+        position += 1
+        total = 0x20  # SP
+        for i in range(len(label)):
+            buffer[position] = label[i]
+            total += label[i]
+            position += 1
+        buffer[position] = 0x20  # SP
+        digits = 1
+        power = 10
+        while power <= value:
+            digits += 1
+            power *= 10
+        digits = max(digits, width)
+        position += digits
+        for i in range(digits):
+            buffer[position - i] = 0x30 + value % 10
+            total += 0x30 + value % 10
+            value //= 10
+        buffer[position + 1] = 0x20  # SP
+        buffer[position + 2] = (total & 0x3F) + 0x20  # Checksum
+        buffer[position + 3] = 0x0D  # CR
+        self.length = position + 4
+
+    @micropython.viper
+    def append(self, data, begin: int, end: int):
+        """Append data[begin:end] to the buffer."""
+        position = int(self.length)
+        buffer = ptr8(self.buffer)
+        source = ptr8(data)
+        for i in range(begin, end):
+            buffer[position] = source[i]
+            position += 1
+        self.length = position
+
+
+@micropython.viper
+def equal(data, begin: int, other, length: int) -> bool:
+    """Return whether data[begin:begin + length] is equal to other[:length]."""
+    source = ptr8(data)
+    reference = ptr8(other)
+    for i in range(length):
+        if source[begin + i] != reference[i]:
+            return False
+    return True
+
+
+@micropython.viper
+def find(data, value: int, begin: int, end: int) -> int:
+    """Return the position of the first byte equal to value in data[begin:end], or -1."""
+    source = ptr8(data)
+    for i in range(begin, end):
+        if source[i] == value:
+            return i
+    return -1
+
+
+@micropython.viper
+def checksum(data, begin: int, end: int) -> int:
+    """Compute the checksum of the payload data[begin:end] of a group."""
+    source = ptr8(data)
+    total = 0
+    for i in range(begin, end):
+        total += source[i]
+    return (total & 0x3F) + 0x20
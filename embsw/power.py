@@ -0,0 +1,53 @@
+import machine
+import pyb
+import utime
+
+# Shortest wait in light sleep, as waking up restarts the clocks
+LIGHTSLEEP_MIN_DELAY = 100  # (ms)
+
+
+def rtc_millis(rtc):
+    """Return the time of the real-time clock (ms), which keeps counting while the system ticks are stopped."""
+    t = rtc.datetime()
+    seconds = utime.mktime((t[0], t[1], t[2], t[4], t[5], t[6], 0, 0))
+    return seconds * 1000 + (255 - t[7]) * 1000 // 256  # Subseconds count down from 255
+
+
+class Idle:
+    """Idle hook of the event loop, which puts the board in light sleep while the logger is inactive.
+
+    In light sleep, the clocks of the UART, of the USB and of the system ticks are stopped. The board only sleeps while
+    the logger is inactive and the USB is not connected, until the next timer of the event loop (woken by the
+    real-time clock) or an interrupt of a pin (the button). Otherwise, the event loop waits in its poller, which
+    executes WFI between the interrupts. The time slept is measured with the real-time clock, to correct the time of
+    the event loop and the time stamps of the logger.
+
+    The flags set by the interrupt handlers are checked again with the interrupts disabled just before sleeping, so an
+    edge arriving after the event loop polled them cancels the sleep instead of being missed until the next timer.
+    """
+    def __init__(self, logger, flags=()):
+        self.logger = logger
+        self.flags = flags  # IRQFlag of the interrupts waking up the board
+        self.rtc = pyb.RTC()
+        self.usb = pyb.USB_VCP()
+
+    def __call__(self, delay):
+        if 0 <= delay < LIGHTSLEEP_MIN_DELAY or self.logger.active or self.usb.isconnected():
+            return None  # Waiting in the poller
+        start_ticks = pyb.millis()
+        start = rtc_millis(self.rtc)
+        state = machine.disable_irq()  # A pending interrupt still wakes up the board, and is handled after
+        for flag in self.flags:
+            if flag.state:  # Set since the event loop polled it
+                machine.enable_irq(state)
+                return None
+        if delay < 0:
+            machine.lightsleep()
+        else:
+            machine.lightsleep(delay)
+        machine.enable_irq(state)
+        skipped = rtc_millis(self.rtc) - start - pyb.elapsed_millis(start_ticks)  # Time not seen by the ticks
+        if skipped < 0:
+            skipped = 0
+        self.logger.timestamper.skip(skipped)
+        return skipped
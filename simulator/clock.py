@@ -0,0 +1,91 @@
+import time
+
+TICKS_PERIOD = 2**30  # Period of the MicroPython tick counters
+
+
+class SimulationEnd(Exception):
+    """Raised when the simulated duration is over or nothing can happen anymore."""
+
+
+class Clock:
+    """Virtual clock of the simulation, in microseconds.
+
+    The clock only moves forward when the simulated code waits, so the simulation is deterministic. With a CPU
+    scale, the execution time of the code on the host, multiplied by the scale, is also added to the clock to
+    emulate a slower processor. In real time mode, waits are also performed on the host.
+    """
+    def __init__(self):
+        self.now = 0  # (us)
+        self.end = None  # End of the simulation (us), None for no end
+        self.cpu_scale = 0
+        self.realtime = False
+        self.sources = []  # Event sources, with next_time() and fire(now) methods
+        self.host_time = time.perf_counter()
+        self.advancing = False
+        self.ticks_stopped = 0  # Time with the tick counters stopped, as in light sleep (us)
+
+    def configure(self, duration=None, cpu_scale=0, realtime=False):
+        self.end = int(duration * 1e6) if duration is not None else None
+        self.cpu_scale = cpu_scale
+        self.realtime = realtime
+
+    def add_source(self, source):
+        self.sources.append(source)
+
+    def remove_source(self, source):
+        self.sources.remove(source)
+
+    def read(self):
+        """Return the current time (us), accounting for the host execution time if needed."""
+        if self.advancing:  # Read by the event sources
+            return self.now
+        host_time = time.perf_counter()
+        if self.cpu_scale:
+            self.advance(self.now + int((host_time - self.host_time) * 1e6 * self.cpu_scale), wait=False)
+        self.host_time = host_time
+        return self.now
+
+    def next_event(self):
+        times = [t for t in (s.next_time() for s in self.sources) if t is not None]
+        return min(times) if times else None
+
+    def advance(self, until, wait=True):
+        """Move the clock forward up to `until` (us), firing the events in between."""
+        self.advancing = True
+        try:
+            self.step(until, wait)
+        finally:
+            self.advancing = False
+        self.host_time = time.perf_counter()
+
+    def step(self, until, wait):
+        while True:
+            next_event = self.next_event()
+            target = until if next_event is None or next_event > until else next_event
+            if self.end is not None and target > self.end:
+                self.now = self.end
+                raise SimulationEnd
+            if wait and self.realtime and target > self.now:
+                time.sleep((target - self.now) / 1e6)
+            self.now = max(self.now, target)
+            for source in list(self.sources):
+                t = source.next_time()
+                if t is not None and t <= self.now:
+                    source.fire(self.now)
+            if target >= until:
+                break
+
+    def ticks_ms(self):
+        return ((self.read() - self.ticks_stopped) // 1000) % TICKS_PERIOD
+
+    def ticks_us(self):
+        return (self.read() - self.ticks_stopped) % TICKS_PERIOD
+
+    def unwrap_ms(self, ticks):
+        """Convert a tick value (ms) to an absolute time (us), assuming it is at most half a period away."""
+        now_ms = (self.read() - self.ticks_stopped) // 1000
+        diff = ((ticks - now_ms) + TICKS_PERIOD // 2) % TICKS_PERIOD - TICKS_PERIOD // 2
+        return (now_ms + diff) * 1000
+
+
+clock = Clock()
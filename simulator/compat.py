@@ -0,0 +1,131 @@
+"""Adaptation of uasyncio to CPython.
+
+MicroPython coroutines are generators which can hold a pending exception (pend_throw), and generators can be
+awaited. CPython coroutines are a distinct type without pend_throw. The event loop is left untouched: coroutines
+are wrapped into tasks emulating MicroPython generators when they are scheduled, and the awaitables of uasyncio
+are made awaitable in CPython.
+"""
+import builtins
+import gc
+import io
+import types
+
+
+class Task:
+    """Wrapper of a CPython coroutine or generator behaving like a MicroPython generator."""
+    def __init__(self, coro):
+        self.coro = coro
+        self.iterator = coro.__await__() if isinstance(coro, types.CoroutineType) else coro
+        self.pending = None
+
+    def send(self, value):
+        pending, self.pending = self.pending, None
+        if isinstance(pending, BaseException):
+            return self.iterator.throw(pending)
+        return self.iterator.send(value)
+
+    def __next__(self):
+        return self.send(None)
+
+    def __iter__(self):
+        return self
+
+    def throw(self, *args):
+        return self.iterator.throw(*args)
+
+    def close(self):
+        return self.coro.close()
+
+    def pend_throw(self, value):
+        previous, self.pending = self.pending, value
+        return previous
+
+    def __repr__(self):
+        return "<Task {!r}>".format(self.coro)
+
+
+def wrap(callback):
+    if isinstance(callback, (types.CoroutineType, types.GeneratorType)):
+        return Task(callback)
+    return callback
+
+
+def make_awaitable(cls):
+    if not hasattr(cls, "__await__"):
+        cls.__await__ = cls.__iter__
+
+
+flush_latency = 0  # Duration of a flush of a file (ms)
+
+
+class File:
+    """File accepting the MicroPython write(buf, off, sz) signature."""
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, buf, off=0, sz=-1):
+        if sz < 0:
+            sz = len(buf) - off
+        if isinstance(buf, str):
+            return self.file.write(buf[off:off + sz])
+        return self.file.write(memoryview(buf)[off:off + sz])
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def flush(self):
+        self.file.flush()
+        if flush_latency:  # The flush blocks the processor
+            from clock import clock
+            clock.advance(clock.read() + int(flush_latency * 1000), wait=False)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
+
+
+def open_file(*args, **kwargs):
+    return File(io.open(*args, **kwargs))
+
+
+HEAP_SIZE = 100000  # Heap of the pyboard (bytes)
+
+
+def install_builtins():
+    builtins.ptr8 = lambda obj: obj
+    gc.mem_free = lambda: HEAP_SIZE
+    gc.mem_alloc = lambda: 0
+    builtins.open = open_file
+
+
+def install():
+    install_builtins()
+    import uasyncio
+    import uasyncio.core as core
+
+    core.type_gen = Task
+    call_soon = core.EventLoop.call_soon
+    call_at_ = core.EventLoop.call_at_
+    core.EventLoop.call_soon = lambda self, callback, *args: call_soon(self, wrap(callback), *args)
+    core.EventLoop.call_at_ = lambda self, time, callback, args=(): call_at_(self, time, wrap(callback), args)
+    run_until_complete = core.EventLoop.run_until_complete
+    core.EventLoop.run_until_complete = lambda self, coro: run_until_complete(self, wrap(coro))
+
+    # Generator based awaitables
+    for cls in (uasyncio.StreamReader, uasyncio.StreamWriter):
+        for name, value in list(vars(cls).items()):
+            if isinstance(value, types.FunctionType) and value.__code__.co_flags & 0x20:  # CO_GENERATOR
+                setattr(cls, name, types.coroutine(value))
+    for module in (core, uasyncio):
+        for name, value in list(vars(module).items()):
+            if isinstance(value, types.FunctionType) and value.__code__.co_flags & 0x20:
+                setattr(module, name, types.coroutine(value))
+    # Object based awaitables
+    for value in list(vars(core).values()) + list(vars(uasyncio).values()):
+        if isinstance(value, type) and "__iter__" in vars(value) and not issubclass(value, types.GeneratorType):
+            make_awaitable(value)
@@ -0,0 +1,166 @@
+from clock import clock
+
+BITS_PER_BYTE = 10  # Start bit, 7 data bits, parity bit, stop bit
+
+
+class Line:
+    """Serial line replaying recorded bytes at a given baud rate, from the start of the simulation."""
+    def __init__(self, data, baudrate, loop=False):
+        self.data = data
+        self.baudrate = baudrate
+        self.loop = loop
+
+    def position(self, now):
+        """Return the number of bytes sent on the line up to now (us)."""
+        n = now * self.baudrate // (BITS_PER_BYTE * 1000000)
+        return n if self.loop else min(n, len(self.data))
+
+    def arrival(self, position):
+        """Return the time (us) at which the byte at the position is received, None if never."""
+        if not self.loop and position >= len(self.data):
+            return None
+        return -(-(position + 1) * BITS_PER_BYTE * 1000000 // self.baudrate)  # Rounded up
+
+    def read(self, begin, end):
+        if not self.loop:
+            return self.data[begin:end]
+        size = len(self.data)
+        return bytes(self.data[k % size] for k in range(begin, end))
+
+
+class UART:
+    """UART receiving the bytes of a line into a bounded buffer, as the pyboard's."""
+    def __init__(self, line, rxbuf=64):
+        self.line = line
+        self.rxbuf = rxbuf
+        self.initialized = False
+        self.position = 0  # Position on the line of the next byte to read
+        self.bytes_read = 0
+        self.bytes_lost = 0
+        clock.add_source(self)
+
+    def init(self):
+        self.initialized = True
+        self.position = self.line.position(clock.read())
+
+    def deinit(self):
+        self.initialized = False
+
+    def available(self):
+        return self.line.position(clock.read()) - self.position if self.initialized else 0
+
+    def read(self, nbytes=-1):
+        available = self.available()
+        if available <= 0:
+            return None
+        if available > self.rxbuf:  # Bytes received with a full buffer are lost
+            self.bytes_lost += available - self.rxbuf
+            available = self.rxbuf
+        if 0 <= nbytes < available:
+            available = nbytes
+        data = self.line.read(self.position, self.position + available)
+        self.position = self.line.position(clock.read()) if self.available() > self.rxbuf else self.position + available
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buf, nbytes=-1):
+        nbytes = len(buf) if nbytes < 0 else min(nbytes, len(buf))
+        data = self.read(nbytes)
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def any(self):
+        return min(self.available(), self.rxbuf)
+
+    def ioctl(self, request, arg):
+        return arg & 0x0001 if self.any() else 0
+
+    def next_time(self):
+        if self.initialized and not self.available():
+            return self.line.arrival(self.position)
+        return None
+
+    def fire(self, now):
+        pass
+
+
+class Pin:
+    """Digital pin, driven by the simulation for inputs."""
+    def __init__(self, name, value=0):
+        self.name = name
+        self.level = value
+        self.transitions = 0
+        self.handler = None
+        self.trigger = 0
+
+    def value(self, value=None):
+        if value is None:
+            return self.level
+        if value != self.level:
+            self.transitions += 1
+        self.level = int(bool(value))
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def set_input(self, value, rising, falling):
+        """Change the level of an input pin, calling its IRQ handler on the selected edges."""
+        if value == self.level:
+            return
+        self.value(value)
+        edge = rising if value else falling
+        if self.handler is not None and self.trigger & edge:
+            if board.irq_enabled:
+                self.handler(self)
+            else:  # Handled when the interrupts are enabled again
+                board.pending_irqs.append(self)
+
+
+class Button:
+    """Push button wired to an active low pin, pressed according to a script of (time, duration) in ms."""
+    def __init__(self, pin, presses, rising, falling):
+        self.pin = pin
+        self.rising = rising
+        self.falling = falling
+        self.edges = []
+        for t, duration in sorted(presses):
+            self.edges.append((int(t * 1000), 0))
+            self.edges.append((int((t + duration) * 1000), 1))
+        self.edges.sort()
+        clock.add_source(self)
+
+    def next_time(self):
+        return self.edges[0][0] if self.edges else None
+
+    def fire(self, now):
+        while self.edges and self.edges[0][0] <= now:
+            _, level = self.edges.pop(0)
+            self.pin.set_input(level, self.rising, self.falling)
+
+
+class Board:
+    """Simulated pyboard."""
+    def __init__(self):
+        self.lines = {}  # UART channel -> line
+        self.uarts = {}
+        self.pins = {name: Pin(name) for name in ("LED_RED", "LED_GREEN", "LED_YELLOW", "LED_BLUE")}
+        self.pins["SW"] = Pin("SW", 1)
+        self.button = None
+        self.usb_mode = "VCP"
+        self.idle_time = 0
+        self.sleep_time = 0  # Light sleep (us)
+        self.irq_enabled = True
+        self.pending_irqs = []  # Pins whose edges arrived while the interrupts were disabled
+
+    def get_uart(self, channel):
+        if channel not in self.uarts:
+            self.uarts[channel] = UART(self.lines[channel])
+        return self.uarts[channel]
+
+
+board = Board()
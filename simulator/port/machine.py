@@ -0,0 +1,85 @@
+from clock import clock, SimulationEnd
+from hardware import board
+import hardware
+import pyb
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    class board:
+        pass
+
+    def __init__(self, pin, mode=-1, pull=-1):
+        self.pin = pin
+
+    def value(self, value=None):
+        return self.pin.value(value)
+
+    def on(self):
+        self.pin.on()
+
+    def off(self):
+        self.pin.off()
+
+    def init(self, mode=-1, pull=-1, **kwargs):
+        pass
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False, **kwargs):
+        self.pin.handler = (lambda p: handler(self)) if handler is not None else None
+        self.pin.trigger = trigger
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+
+for _name, _pin in board.pins.items():
+    setattr(Pin.board, _name, Pin(_pin))
+
+
+def idle():
+    pyb.wfi()
+
+
+def disable_irq():
+    state = board.irq_enabled
+    board.irq_enabled = False
+    return state
+
+
+def enable_irq(state=True):
+    board.irq_enabled = state
+    while state and board.pending_irqs:
+        pin = board.pending_irqs.pop(0)
+        pin.handler(pin)
+
+
+def lightsleep(ms=None):
+    """Sleep until the next event or for ms, with the tick counters stopped as on the STM32."""
+    now = clock.read()
+    target = now + ms * 1000 if ms is not None else None
+    next_event = clock.next_event()
+    if next_event is not None and (target is None or next_event < target):
+        target = next_event
+    if target is None:
+        if clock.end is None:
+            raise SimulationEnd("deadlock: sleeping forever")
+        target = clock.end + 1
+    try:
+        clock.advance(target)
+    finally:  # Also accounted when the simulation ends during the sleep
+        board.idle_time += clock.now - now
+        board.sleep_time += clock.now - now
+        clock.ticks_stopped += clock.now - now
+
+
+def freq():
+    return 168000000
+
+
+def reset():
+    raise SystemExit
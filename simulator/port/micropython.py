@@ -0,0 +1,25 @@
+from clock import clock
+
+
+def const(x):
+    return x
+
+
+def schedule(func, arg):
+    """Run the function as soon as the current IRQ handler returns (the simulated IRQs fire between waits)."""
+    func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def mem_info(verbose=False):
+    pass
+
+
+def viper(func):
+    return func
+
+
+native = viper
@@ -0,0 +1,117 @@
+from clock import clock
+from hardware import board
+import utime
+
+
+def millis():
+    return utime.ticks_ms()
+
+
+def micros():
+    return utime.ticks_us()
+
+
+def elapsed_millis(start):
+    return utime.ticks_diff(millis(), start)
+
+
+def elapsed_micros(start):
+    return utime.ticks_diff(micros(), start)
+
+
+def delay(ms):
+    utime.sleep_ms(ms)
+
+
+def udelay(us):
+    utime.sleep_us(us)
+
+
+def wfi():
+    """Wait for the next event of the simulation, or for a systick (1 ms)."""
+    now = clock.read()
+    target = now + 1000
+    next_event = clock.next_event()
+    if next_event is not None and next_event < target:
+        target = next_event
+    try:
+        clock.advance(target)
+    finally:
+        board.idle_time += clock.now - now
+
+
+def main(filename):
+    pass
+
+
+def usb_mode(mode=None):
+    if mode is None:
+        return board.usb_mode
+    board.usb_mode = mode
+
+
+def freq():
+    return (168000000, 168000000, 42000000, 84000000)
+
+
+class UART:
+    def __init__(self, channel, baudrate=9600, bits=8, parity=None, stop=1, **kwargs):
+        self.uart = board.get_uart(channel)
+        self.init(baudrate, bits, parity, stop)
+
+    def init(self, baudrate=9600, bits=8, parity=None, stop=1, read_buf_len=64, **kwargs):
+        self.uart.rxbuf = read_buf_len
+        self.uart.init()
+
+    def deinit(self):
+        self.uart.deinit()
+
+    def read(self, nbytes=-1):
+        return self.uart.read(nbytes)
+
+    def readinto(self, buf, nbytes=-1):
+        return self.uart.readinto(buf, nbytes)
+
+    def any(self):
+        return self.uart.any()
+
+    def ioctl(self, request, arg):
+        return self.uart.ioctl(request, arg)
+
+
+class Switch:
+    def value(self):
+        return not board.pins["SW"].value()
+
+    def __call__(self):
+        return self.value()
+
+
+class LED:
+    NAMES = {1: "LED_RED", 2: "LED_GREEN", 3: "LED_YELLOW", 4: "LED_BLUE"}
+
+    def __init__(self, number):
+        self.pin = board.pins[LED.NAMES[number]]
+
+    def on(self):
+        self.pin.on()
+
+    def off(self):
+        self.pin.off()
+
+    def toggle(self):
+        self.pin.value(not self.pin.value())
+
+
+class RTC:
+    """Real-time clock, counting from 2000-01-01 with subseconds counting down from 255."""
+    def datetime(self):
+        now = clock.read()
+        t = utime.localtime(now // 1000000)
+        subseconds = 255 - (now % 1000000) * 256 // 1000000
+        return (t[0], t[1], t[2], t[6] + 1, t[3], t[4], t[5], subseconds)
+
+
+class USB_VCP:
+    def isconnected(self):
+        return False
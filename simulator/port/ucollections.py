@@ -0,0 +1,26 @@
+from collections import namedtuple, OrderedDict
+import collections
+
+
+class deque:
+    """MicroPython deque: the maximum length is mandatory and flag 1 raises IndexError on overflow."""
+    def __init__(self, iterable, maxlen, flags=0):
+        self.maxlen = maxlen
+        self.flags = flags
+        self.q = collections.deque(iterable, maxlen)
+
+    def append(self, x):
+        if len(self.q) >= self.maxlen and self.flags & 1:
+            raise IndexError("full")
+        self.q.append(x)
+
+    def popleft(self):
+        if not self.q:
+            raise IndexError("empty")
+        return self.q.popleft()
+
+    def __len__(self):
+        return len(self.q)
+
+    def __bool__(self):
+        return bool(self.q)
@@ -0,0 +1 @@
+from errno import *
@@ -0,0 +1,5 @@
+from io import BytesIO, StringIO
+
+
+class IOBase:
+    """Base class of the Python streams that can be registered with uselect.poll."""
@@ -0,0 +1,50 @@
+from clock import clock, SimulationEnd
+
+POLLIN = 0x0001
+POLLOUT = 0x0004
+POLLERR = 0x0008
+POLLHUP = 0x0010
+
+MP_STREAM_POLL = 3  # ioctl request for the readiness of a stream
+
+
+class poll:
+    """Poller of the simulated streams. Waiting moves the virtual clock forward."""
+    def __init__(self):
+        self.objects = {}  # id -> [object, event mask]
+
+    def register(self, obj, eventmask=POLLIN | POLLOUT):
+        self.objects[id(obj)] = [obj, eventmask]
+
+    def modify(self, obj, eventmask):
+        self.objects[id(obj)][1] = eventmask
+
+    def unregister(self, obj):
+        del self.objects[id(obj)]
+
+    def ready(self, flags):
+        res = []
+        for entry in self.objects.values():
+            obj, mask = entry
+            if mask:
+                ev = obj.ioctl(MP_STREAM_POLL, mask) & (mask | POLLERR | POLLHUP)
+                if ev:
+                    res.append((obj, ev))
+                    if flags & 1:  # One-shot: disable until registered again
+                        entry[1] = 0
+        return res
+
+    def ipoll(self, timeout=-1, flags=0):
+        deadline = clock.read() + timeout * 1000 if timeout >= 0 else None
+        while True:
+            res = self.ready(flags)
+            if res or (deadline is not None and clock.read() >= deadline):
+                return res
+            next_event = clock.next_event()
+            if next_event is None and deadline is None:
+                raise SimulationEnd("deadlock: waiting forever")
+            target = deadline if next_event is None or deadline is not None and deadline < next_event else next_event
+            clock.advance(target)
+
+    def poll(self, timeout=-1):
+        return list(self.ipoll(timeout))
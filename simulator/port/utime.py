@@ -0,0 +1,53 @@
+from clock import clock, TICKS_PERIOD
+
+
+def ticks_ms():
+    return clock.ticks_ms()
+
+
+def ticks_us():
+    return clock.ticks_us()
+
+
+def ticks_cpu():
+    return clock.ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2) + TICKS_PERIOD // 2) % TICKS_PERIOD - TICKS_PERIOD // 2
+
+
+def sleep_ms(ms):
+    clock.advance(clock.read() + ms * 1000)
+
+
+def sleep_us(us):
+    clock.advance(clock.read() + us)
+
+
+def sleep(s):
+    clock.advance(clock.read() + int(s * 1e6))
+
+
+def time():
+    return clock.read() // 1000000
+
+
+EPOCH = 946684800  # 2000-01-01, epoch of MicroPython
+
+
+def localtime(secs=None):
+    import time as _time
+    if secs is None:
+        secs = time()
+    t = _time.gmtime(secs + EPOCH)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+
+def mktime(t):
+    import calendar
+    return calendar.timegm((t[0], t[1], t[2], t[3], t[4], t[5], 0, 0, 0)) - EPOCH
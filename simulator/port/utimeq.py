@@ -0,0 +1,32 @@
+import heapq
+from clock import clock
+
+
+class utimeq:
+    """Priority queue of callbacks ordered by tick time, with a fixed capacity."""
+    def __init__(self, size):
+        self.size = size
+        self.heap = []
+        self.counter = 0  # Keeps the insertion order between equal times
+
+    def push(self, time, callback, args):
+        if len(self.heap) >= self.size:
+            raise IndexError("queue overflow")
+        self.counter += 1
+        heapq.heappush(self.heap, (clock.unwrap_ms(time), self.counter, time, callback, args))
+
+    def pop(self, entry):
+        if not self.heap:
+            raise IndexError("empty heap")
+        _, _, entry[0], entry[1], entry[2] = heapq.heappop(self.heap)
+
+    def peektime(self):
+        if not self.heap:
+            raise IndexError("empty heap")
+        return self.heap[0][2]
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
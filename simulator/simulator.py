@@ -0,0 +1,87 @@
+"""Simulation of the logger of the pyboard on CPython.
+
+The modules of MicroPython (pyb, machine, utime, utimeq, uselect...) are replaced by the shims of the port
+directory, on a simulated board: a UART replaying recorded TIC data at a given baud rate, a button, LEDs and a
+virtual clock. main.logger_mode() of embsw runs unmodified, and the files of the logger are written to the work
+directory. The simulation is deterministic unless the CPU scale or the real time mode are used.
+
+Usage: python simulator/simulator.py data.txt --baudrate 9600 --duration 60 --presses 1000:100,50000:3000
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBSW = os.environ.get("EMBSW", os.path.join(ROOT, "embsw"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "port"))
+sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(2, EMBSW)
+sys.path.append(os.path.join(EMBSW, "lib"))  # After the standard library, which it would shadow
+
+from clock import clock, SimulationEnd
+import hardware
+from hardware import board
+import compat
+
+
+def parse_presses(text):
+    """Parse button presses given as time:duration in ms, separated by commas."""
+    if not text:
+        return []
+    return [tuple(float(v) for v in press.split(":")) for press in text.split(",")]
+
+
+def run(data_filename, channel=3, baudrate=1200, duration=60, presses=(), cpu_scale=0, realtime=False,
+        loop_data=False, workdir="."):
+    with open(data_filename, "rb") as f:
+        data = f.read()
+    clock.configure(duration, cpu_scale, realtime)
+    board.lines[channel] = hardware.Line(data, baudrate, loop_data)
+    board.button = hardware.Button(board.pins["SW"], presses, rising=1, falling=2)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    compat.install()
+    import main
+    try:
+        main.logger_mode()
+    except SimulationEnd as e:
+        if e.args:
+            print("Simulation ended:", e.args[0])
+    return report(channel)
+
+
+def report(channel):
+    uart = board.uarts.get(channel)
+    results = {
+        "simulated_time": clock.now / 1e6,
+        "bytes_sent": board.lines[channel].position(clock.now),
+        "bytes_read": uart.bytes_read if uart else 0,
+        "bytes_lost": uart.bytes_lost if uart else 0,
+        "idle_time": board.idle_time / 1e6,
+        "sleep_time": board.sleep_time / 1e6,
+        "led_transitions": {name: pin.transitions for name, pin in board.pins.items() if name.startswith("LED")},
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the logger of the pyboard in a simulation.")
+    parser.add_argument("data", help="recorded TIC data replayed on the UART")
+    parser.add_argument("--baudrate", type=int, default=1200)
+    parser.add_argument("--duration", type=float, default=60, help="simulated duration (s)")
+    parser.add_argument("--presses", default="1000:100", help="button presses, as time:duration in ms")
+    parser.add_argument("--cpu-scale", type=float, default=0, help="host time to simulated time factor")
+    parser.add_argument("--realtime", action="store_true")
+    parser.add_argument("--loop", action="store_true", help="replay the data in a loop")
+    parser.add_argument("--workdir", default="sim_output")
+    parser.add_argument("--flush-latency", type=float, default=0, help="duration of a flush of a file (ms)")
+    args = parser.parse_args()
+    compat.flush_latency = args.flush_latency
+    results = run(args.data, 3, args.baudrate, args.duration, parse_presses(args.presses), args.cpu_scale,
+                  args.realtime, args.loop, args.workdir)
+    for name, value in results.items():
+        print("{}: {}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Import paths of the tests: the viewer, and the embedded code on the shims of the simulator.
+
+Run with `python -m pytest tests` from the root of the repository.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+sys.path.insert(0, os.path.join(ROOT, "viewer"))
+sys.path.insert(0, os.path.join(ROOT, "simulator", "port"))
+sys.path.insert(1, os.path.join(ROOT, "simulator"))
+sys.path.insert(2, os.path.join(ROOT, "embsw"))
+sys.path.append(os.path.join(ROOT, "embsw", "lib"))  # After the standard library, which it would shadow
+
+import compat  # noqa: E402
+
+compat.install()
+
+import pytest  # noqa: E402
+import uasyncio  # noqa: E402
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    """Fresh event loop, returned by get_event_loop to the code under test."""
+    monkeypatch.setattr(uasyncio.core, "_event_loop", None)
+    return uasyncio.get_event_loop()
@@ -0,0 +1,92 @@
+import numpy as np
+import analyzer
+import tic_parser
+from test_tic_parser import group
+
+
+def create_datastore(time, base):
+    time = np.array(time, dtype=float)
+    valid = np.full(len(time), True)
+    fields = {b'timestamp': (time, valid),
+              b'PAPP': (np.full(len(time), 600.0), valid),
+              b'BASE': (np.array(base, dtype=float), valid)}
+    return analyzer.Datastore(fields)
+
+
+def test_merge_concatenates_captures_restarting_from_zero():
+    first = create_datastore(np.arange(10) * 2.0, 1000 + np.arange(10))
+    second = create_datastore(np.arange(5) * 2.0 + 1, 5000 + np.arange(5))
+    merged = analyzer.merge_datastores([first, second])
+    time, _ = merged.get_field(b'timestamp')
+    base, _ = merged.get_field(b'BASE')
+    assert np.all(np.diff(time) > 0)
+    assert time[10] == time[9] + 2.0  # One median interval after the first capture
+    assert list(base) == list(range(1000, 1010)) + list(range(5000, 5005))  # Not interleaved
+    assert merged.get_segments() == [(0, 10), (10, 15)]
+    assert list(first.get_field(b'timestamp')[0]) == list(np.arange(10) * 2.0)  # Captures unchanged
+
+
+def test_merge_keeps_captures_already_following_each_other():
+    first = create_datastore([0, 1, 2, 3], [10, 11, 12, 13])
+    second = create_datastore([100, 101, 102, 103], [20, 21, 22, 23])
+    merged = analyzer.merge_datastores([first, second])
+    assert list(merged.get_field(b'timestamp')[0]) == [0, 1, 2, 3, 100, 101, 102, 103]
+    assert merged.get_segments() == [(0, 4), (4, 8)]
+
+
+def test_merged_average_power_does_not_span_captures():
+    first = create_datastore(np.arange(20.0), 1000 + np.arange(20) * 0.1)
+    second = create_datastore(np.arange(20.0), 9000 + np.arange(20) * 0.1)
+    anl = analyzer.create_from_datastore(analyzer.merge_datastores([first, second]))
+    assert np.allclose(anl.avgpower.values, 0.1 * analyzer.j_per_wh)
+
+
+def create_historic_datastore(timestamps):
+    frames = [{b'timestamp': t, b'PAPP': b'00600', b'BASE': b'%09d' % (1000 + k)} for k, t in enumerate(timestamps)]
+    return analyzer.HistoricDatastore(frames)
+
+
+def test_segment_shifts_restarts_after_the_previous_frames():
+    datastore = create_historic_datastore([0, 1000, 2000, 0, 1000, 2000])
+    time, _ = datastore.get_field(b'timestamp')
+    assert list(time) == [0, 1, 2, 3, 4, 5]
+    assert datastore.get_segments() == [(0, 3), (3, 6)]
+
+
+def test_segment_keeps_time_increasing_when_every_frame_restarts():
+    datastore = create_historic_datastore([5000, 4000, 3000, 2000, 1000])
+    time, _ = datastore.get_field(b'timestamp')
+    assert np.all(np.diff(time) > 0)
+    assert len(datastore.get_segments()) == 5
+
+
+def test_window_of_a_capture_restarting_on_the_first_frame():
+    anl = analyzer.create_from_datastore(create_historic_datastore([9000] + [1000 * k for k in range(10)]))
+    time, _ = anl.datastore.get_field(b'timestamp')
+    assert np.all(np.diff(time) > 0)
+    window = anl.window(time[2], time[6])
+    assert list(window.datastore.get_field(b'timestamp')[0]) == list(time[2:7])
+
+
+def parse_frames(contents):
+    parser = tic_parser.HistoricParser(None, None)
+    frames = [parser.parse_groups(content) for content in contents]
+    for k, frame in enumerate(frames):
+        frame[b'timestamp'] = 1000 * k
+    return frames
+
+
+def test_values_left_out_by_the_logging_policy_are_carried_forward():
+    base = [group(b'BASE', b'%09d' % (1000 + k)) for k in range(5)]
+    papp = group(b'PAPP', b'00600')
+    datastore = analyzer.HistoricDatastore(parse_frames([
+        base[0] + papp,
+        base[1],  # PAPP left out by the policy
+        base[2] + papp.replace(b'00600', b'00700'),  # Bad checksum
+        base[3],
+        base[4] + b'\nPAPP\r',  # Malformed group
+    ]))
+    values, validity = datastore.get_field(b'PAPP')
+    assert list(values) == [600, 600, 600, 600, 600]
+    assert list(validity) == [True, True, False, False, False]
+    assert np.all(datastore.get_field(b'BASE')[1])
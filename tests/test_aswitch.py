@@ -0,0 +1,55 @@
+import aswitch
+import uasyncio as asyncio
+from clock import clock
+
+
+def run_delay(loop, actions, duration=1000):
+    """Apply the actions [(time, method, args)] in ms from now to a Delay_ms of 100 ms and run the event loop.
+
+    Return the times (ms) of the callbacks and the number of steps of the task of the delay.
+    """
+    start = clock.read() // 1000
+    calls = []
+    loop.profile = asyncio.Profile()
+    delay = aswitch.Delay_ms(lambda: calls.append(clock.read() // 1000 - start), duration=100)
+
+    async def apply():
+        now = 0
+        for t, method, args in actions:
+            await asyncio.sleep_ms(t - now)
+            now = t
+            getattr(delay, method)(*args)
+        await asyncio.sleep_ms(duration - now)
+
+    loop.run_until_complete(apply())
+    steps = sum(s[0] for t, s in loop.profile.tasks.items() if asyncio.task_name(t).endswith("Delay_ms._run"))
+    return calls, steps
+
+
+def test_callback_at_the_deadline(loop):
+    calls, steps = run_delay(loop, [(100, "trigger", ())])
+    assert calls == [200]
+    assert steps == 3  # Parked, started, and called back then parked at the deadline
+
+
+def test_retrigger_extends_the_deadline(loop):
+    calls, steps = run_delay(loop, [(100, "trigger", ()), (150, "trigger", ()), (200, "trigger", (300,))])
+    assert calls == [500]
+    assert steps == 4  # The later deadlines are awaited at the end of the earlier one
+
+
+def test_retrigger_to_an_earlier_deadline(loop):
+    calls, _ = run_delay(loop, [(100, "trigger", (500,)), (150, "trigger", ())])
+    assert calls == [250]
+
+
+def test_stop_cancels_the_callback(loop):
+    calls, steps = run_delay(loop, [(100, "trigger", ()), (150, "stop", ())])
+    assert calls == []
+    assert steps == 3  # Parked at the deadline, without calling back
+
+
+def test_parked_while_stopped(loop):
+    calls, steps = run_delay(loop, [], 10000)
+    assert calls == []
+    assert steps == 1
@@ -0,0 +1,125 @@
+import collections
+import importlib.util
+import os
+import random
+import pytest
+from conftest import ROOT
+
+# The module is loaded from its file, as embsw/lib/collections would shadow the collections of the standard library
+spec = importlib.util.spec_from_file_location("ring_deque", os.path.join(ROOT, "embsw", "lib", "collections",
+                                                                          "deque.py"))
+ring_deque = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ring_deque)
+deque = ring_deque.deque
+
+
+def check(ring, reference):
+    assert len(ring) == len(reference)
+    assert bool(ring) == bool(reference)
+    assert list(ring) == list(reference)
+    for i in range(-len(reference), len(reference)):
+        assert ring[i] == reference[i]
+
+
+def test_operations_at_both_ends_across_the_wraparound():
+    ring = deque((), 5)
+    reference = collections.deque((), 5)
+    for i in range(4):
+        ring.append(i)
+        reference.append(i)
+    for i in range(20):  # The head goes around the storage several times, in both directions
+        assert ring.popleft() == reference.popleft()
+        ring.append(10 + i)
+        reference.append(10 + i)
+        check(ring, reference)
+    for i in range(20):
+        assert ring.pop() == reference.pop()
+        ring.appendleft(-i)
+        reference.appendleft(-i)
+        check(ring, reference)
+
+
+def test_overflow_discards_from_the_other_end():
+    ring = deque(range(3), 3)
+    reference = collections.deque(range(3), 3)
+    ring.append(3)
+    reference.append(3)
+    check(ring, reference)
+    ring.appendleft(-1)
+    reference.appendleft(-1)
+    check(ring, reference)
+    ring.extend(range(10, 15))
+    reference.extend(range(10, 15))
+    check(ring, reference)
+
+
+def test_overflow_raises_with_flag():
+    ring = deque(range(3), 3, 1)
+    with pytest.raises(IndexError):
+        ring.append(3)
+    with pytest.raises(IndexError):
+        ring.appendleft(-1)
+    assert list(ring) == [0, 1, 2]
+    ring.popleft()
+    ring.append(3)
+    assert list(ring) == [1, 2, 3]
+
+
+def test_zero_maxlen_keeps_nothing():
+    ring = deque((), 0)
+    ring.append(1)
+    ring.appendleft(2)
+    assert len(ring) == 0 and list(ring) == []
+
+
+def test_storage_grows_without_maxlen():
+    ring = deque()
+    reference = collections.deque()
+    for i in range(100):  # Beyond several doublings, with the head in the middle of the storage
+        if i % 3 == 0:
+            ring.appendleft(i)
+            reference.appendleft(i)
+        else:
+            ring.append(i)
+            reference.append(i)
+        if i % 7 == 0:
+            assert ring.popleft() == reference.popleft()
+    check(ring, reference)
+    assert len(ring.items) >= len(reference)
+
+
+def test_empty_deque_raises():
+    ring = deque()
+    with pytest.raises(IndexError):
+        ring.pop()
+    with pytest.raises(IndexError):
+        ring.popleft()
+    with pytest.raises(IndexError):
+        ring[0]
+
+
+@pytest.mark.parametrize("maxlen", [None, 1, 4, 9])
+def test_random_operations_match_collections_deque(maxlen):
+    rng = random.Random(maxlen)
+    ring = deque((), maxlen)
+    reference = collections.deque((), maxlen)
+    for i in range(2000):
+        operation = rng.randrange(6)
+        if operation == 0:
+            ring.append(i)
+            reference.append(i)
+        elif operation == 1:
+            ring.appendleft(i)
+            reference.appendleft(i)
+        elif operation == 2 and reference:
+            assert ring.pop() == reference.pop()
+        elif operation == 3 and reference:
+            assert ring.popleft() == reference.popleft()
+        elif operation == 4:
+            values = range(i, i + rng.randrange(4))
+            ring.extendleft(values)
+            reference.extendleft(values)
+        elif operation == 5 and rng.randrange(20) == 0:
+            ring.clear()
+            reference.clear()
+        check(ring, reference)
@@ -0,0 +1,95 @@
+import pytest
+import uasyncio as asyncio
+import utime
+from uasyncio.core import QueueFull
+
+
+def create_loop():
+    loop = asyncio.EventLoop(4, 4)
+    loop.queue_limit = 8
+    return loop
+
+
+def fill_runq(loop, calls):
+    # Schedule callbacks up to the limit of the runq
+    try:
+        for i in range(loop.queue_limit):
+            loop.call_soon(calls.append, i)
+    except QueueFull:
+        pass
+
+
+def test_running_task_rescheduled_at_the_limit():
+    loop = create_loop()
+    calls = []
+
+    async def main():
+        fill_runq(loop, calls)
+        await asyncio.sleep_ms(0)  # Rescheduled behind the callbacks
+
+    loop.run_until_complete(main())
+    assert calls == [0, 1, 2, 3]
+    assert loop.runq_len > loop.queue_limit
+
+
+def test_expired_timers_at_the_limit():
+    loop = create_loop()
+    calls = []
+    done = []
+
+    async def sleeper():
+        await asyncio.sleep_ms(10)
+        done.append(None)
+
+    async def main():
+        for _ in range(4):
+            loop.create_task(sleeper())
+        await asyncio.sleep_ms(0)  # The sleepers start
+        fill_runq(loop, calls)
+        utime.sleep_ms(20)  # The sleepers expire while the runq is full
+        await asyncio.sleep_ms(30)
+
+    loop.run_until_complete(main())
+    assert calls == [0, 1, 2, 3]
+    assert len(done) == 4
+
+
+def test_new_work_refused_at_the_limit():
+    loop = create_loop()
+
+    def task():
+        yield
+
+    for _ in range(8):
+        loop.create_task(task())
+    with pytest.raises(QueueFull):
+        loop.create_task(task())
+    with pytest.raises(QueueFull):
+        loop.call_soon(print)
+    for _ in range(8):
+        loop.call_later_ms(10, print)
+    with pytest.raises(QueueFull):
+        loop.call_later_ms(10, print)
+    loop.call_soon(task())  # Resumed task
+    loop.call_later_ms(10, task())  # Sleeping task
+    assert (len(loop.runq), len(loop.waitq)) == (9, 9)
+
+
+def test_profile_folds_finished_tasks_by_name():
+    loop = asyncio.EventLoop(4, 4)
+    loop.profile = asyncio.Profile()
+
+    async def short():
+        await asyncio.sleep_ms(0)
+
+    async def main():
+        for _ in range(100):
+            loop.create_task(short())
+            await asyncio.sleep_ms(1)
+
+    loop.run_until_complete(main())
+    profile = loop.profile
+    assert len(profile.tasks) <= 2  # main, and the callback of run_until_complete
+    (name, stats), = profile.finished.items()  # The tasks of short, under one name
+    assert name.endswith("short")
+    assert stats[0] == 200  # Two steps per task
@@ -0,0 +1,52 @@
+import machine
+import hardware
+import input
+import uasyncio as asyncio
+from clock import clock
+from hardware import board
+
+
+def run_presses(loop, presses, duration, *names):
+    """Press the button at (time, duration) in ms from now and run the event loop for duration ms.
+
+    Return the callbacks called among the names, with their times (ms) from now.
+    """
+    start = clock.read() // 1000
+    events = []
+
+    def callback(name):
+        return lambda: events.append((name, clock.read() // 1000 - start))
+
+    button = input.Button(machine.Pin.board.SW, **{name: callback(name) for name in names})
+    source = hardware.Button(board.pins["SW"], [(start + t, d) for t, d in presses],
+                             machine.Pin.IRQ_RISING, machine.Pin.IRQ_FALLING)
+
+    async def wait():
+        await asyncio.sleep_ms(duration)
+
+    loop.create_task(button.run())
+    try:
+        loop.run_until_complete(wait())
+    finally:
+        clock.remove_source(source)
+    return events
+
+
+def test_bounces_are_ignored(loop):
+    events = run_presses(loop, [(100, 5), (300, 100), (405, 3)], 1000, "on_press")
+    assert events == [("on_press", 400 + input.BUTTON_DEBOUNCE)]  # On release
+
+
+def test_long_press_does_not_click(loop):
+    events = run_presses(loop, [(100, 1500)], 2000, "on_press", "on_long_press")
+    assert events == [("on_long_press", 100 + input.BUTTON_LONGPRESS)]
+
+
+def test_double_click(loop):
+    events = run_presses(loop, [(100, 50), (300, 50)], 1000, "on_press", "on_double_click")
+    assert events == [("on_double_click", 350 + input.BUTTON_DEBOUNCE)]
+
+
+def test_single_click_waits_for_a_second_one(loop):
+    events = run_presses(loop, [(100, 50)], 1000, "on_press", "on_double_click")
+    assert events == [("on_press", 150 + input.BUTTON_DEBOUNCE + input.BUTTON_DOUBLE_CLICK)]
@@ -0,0 +1,182 @@
+import tracemalloc
+import pytest
+import hardware
+import logger
+import metrics
+import uasyncio as asyncio
+from clock import clock
+from hardware import board
+
+CHANNEL = 9  # UART of the tests, free on the simulated board
+
+
+class Buffer(bytearray):
+    """Buffer of the received bytes, without the methods missing from the bytearray of MicroPython."""
+    find = rfind = index = None
+
+
+def group(label, value):
+    payload = label + b" " + value
+    return b"\n" + payload + b" " + bytes(((sum(payload) & 0x3F) + 0x20,)) + b"\r"
+
+
+def create_frame(i):
+    return (b"\x02" + group(b"ADCO", b"031428097115") + group(b"BASE", b"%09d" % (6350000 + i))
+            + group(b"PAPP", b"%05d" % (1200 + i % 900)) + b"\x03")
+
+
+def parse(chunks):
+    parser = logger.Parser()
+    parser.init()
+    frames = []
+    for chunk in chunks:
+        parser.feed(chunk, len(chunk))
+        while parser.next_frame():
+            frames.append((bytes(parser.buffer[:parser.length]), parser.is_frame_complete))
+    return frames
+
+
+def split(data, length):
+    return [Buffer(data[i:i + length]) for i in range(0, len(data), length)]
+
+
+def test_parser_assembles_frames_split_across_reads():
+    frames = [create_frame(i) for i in range(20)]
+    assert parse(split(b"noise" + b"".join(frames), 7)) == [(f, True) for f in frames]
+
+
+def test_parser_ends_frames_interrupted_by_eot():
+    frame = create_frame(0)
+    truncated = frame[:20] + b"\x04"
+    assert parse(split(truncated + b"lost\x03" + frame, 16)) == [(truncated, False), (frame, True)]
+
+
+def test_frame_queue_keeps_slots_for_the_commands():
+    metrics.reset()
+    queue = logger.FrameQueue(capacity=4, frame_length=16)
+    frame = create_frame(0)
+    assert [queue.push_frame(frame, 16, i) for i in range(3)] == [True, True, False]
+    assert metrics.values[metrics.FRAMES_DROPPED] == 1
+    assert queue.push_command(logger.COMMAND_STOP, 3)
+    assert queue.push_command(logger.COMMAND_FLUSH, 4)
+    assert not queue.push_command(logger.COMMAND_FLUSH, 5)  # Full
+    assert not queue.push_frame(frame, 16, 6)
+    assert metrics.values[metrics.FRAMES_DROPPED] == 2
+    assert metrics.values[metrics.QUEUE_HIGH_WATER_MARK] == 4
+    items = []
+    while queue.not_empty.is_set():
+        items.append((queue.lengths[queue.head], queue.timestamps[queue.head], bytes(queue.frames[queue.head])))
+        queue.pop()
+    assert items == [(16, 0, frame[:16]), (16, 1, frame[:16]), (logger.COMMAND_STOP, 3, bytes(16)),
+                     (logger.COMMAND_FLUSH, 4, bytes(16))]
+    assert queue.push_frame(frame, 16, 7)  # Slots reused
+    assert queue.count == 1
+
+
+@pytest.fixture
+def line():
+    """Standard frames replayed at 9600 baud on the UART of the tests."""
+    board.lines[CHANNEL] = hardware.Line(b"".join(create_frame(i) for i in range(100)), 9600, loop=True)
+    yield board.lines[CHANNEL]
+    uart = board.uarts.pop(CHANNEL, None)
+    if uart is not None:
+        clock.remove_source(uart)
+    del board.lines[CHANNEL]
+
+
+def test_reception_waits_for_the_uart(loop, line, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    receptions = []
+    log = logger.Logger("standard", CHANNEL, "data.txt", "time.txt", lambda: receptions.append(clock.read()))
+    reads = []
+    read = log.reader.read
+    log.reader.read = lambda: reads.append(None) or read()
+    loop.create_task(log.log())
+    loop.create_task(log.store())
+
+    def run(duration):
+        async def wait():
+            await asyncio.sleep_ms(duration)
+        loop.run_until_complete(wait())
+        return len(reads)
+
+    assert run(1000) == 0  # Waiting to be started
+    log.activate()
+    start = clock.read()
+    count = run(2000)
+    assert board.uarts[CHANNEL].bytes_lost == 0
+    assert 2 < len(receptions) < count  # Woken by the received bytes
+    for t in receptions:  # Each frame is received as soon as its ETX
+        position = line.position(t) - 1
+        while line.read(position, position + 1) != b"\x03":
+            position -= 1
+        assert 0 <= t - line.arrival(position) < 2000
+    assert receptions[-1] > start + 1800000
+    log.deactivate()
+    assert run(1000) == count  # Back to waiting to be started
+
+
+def test_reception_and_write_allocate_nothing_per_frame(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    parser = logger.Parser()
+    parser.init()
+    queue = logger.FrameQueue()
+    writer = logger.create_writer("text", "data.txt", "time.txt")
+    writer.init()
+
+    def process(chunks):
+        frames = 0
+        for chunk in chunks:
+            parser.feed(chunk, len(chunk))
+            while parser.next_frame():
+                queue.push_frame(parser.buffer, parser.length, frames)
+                writer.write(queue.frames[queue.head], queue.lengths[queue.head], queue.timestamps[queue.head])
+                queue.pop()
+                frames += 1
+        return frames
+
+    def measure(count):
+        # Peak of the memory allocated at once while processing, and blocks left allocated, above the start
+        chunks = split(b"".join(create_frame(i) for i in range(count)), 256)
+        tracemalloc.start()
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            start = tracemalloc.get_traced_memory()[0]
+            assert process(chunks) == count
+            peak = tracemalloc.get_traced_memory()[1] - start
+            blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+        finally:
+            tracemalloc.stop()
+        return peak, blocks
+
+    try:
+        measure(1000)  # Buffers of the files allocated
+        peak, blocks = measure(1000)
+        peak_more_frames, blocks_more_frames = measure(10000)
+    finally:
+        writer.deinit()
+    # CPython allocates its integers and the frames of the calls, in a number which must not grow with the frames
+    assert peak_more_frames - peak < 128
+    assert blocks_more_frames - blocks < 4
+
+
+def test_delta_records_are_decoded_by_the_viewer(tmp_path, monkeypatch):
+    import tic_parser
+    monkeypatch.chdir(tmp_path)
+    frames = [create_frame(i // 3) for i in range(30)]  # Groups changing every 3 frames
+    frames[10] = frames[10][:30] + b"\x04"  # Truncated frame
+    writer = logger.create_writer("delta", "data.bin", None)
+    writer.init()
+    for i, frame in enumerate(frames):
+        writer.write(Buffer(frame), len(frame), 1000 * i)
+    writer.deinit()
+    parser = tic_parser.HistoricBinaryParser("data.bin")
+    parsed = parser.parse()
+    complete = [i for i, frame in enumerate(frames) if frame[-1] == 0x03]
+    assert [f[b'timestamp'] for f in parsed] == [1000 * i for i in complete]
+    assert [f[b'BASE'] for f in parsed] == [b"%09d" % (6350000 + i // 3) for i in complete]
+    assert parser.statistics.corrupt_records == 0
+    with open("data.bin", "rb") as f:
+        data = f.read()
+    assert sum(1 for _, marker, _ in tic_parser.scan_records(data, tic_parser.ScanStatistics())
+               if marker & tic_parser.RECORD_DELTA) > 0
@@ -0,0 +1,71 @@
+import os
+import manager
+import metrics
+import uasyncio as asyncio
+from clock import clock
+from manager import Event, State
+
+
+class Logger:
+    """Logger refusing its first activations and deactivations, as while its queue is full."""
+    def __init__(self, refusals):
+        self.active = False
+        self.refusals = refusals
+
+    def activate(self):
+        if self.refusals:
+            self.refusals -= 1
+        else:
+            self.active = True
+
+    def deactivate(self):
+        if self.refusals:
+            self.refusals -= 1
+        else:
+            self.active = False
+
+
+def run_events(loop, refusals, events, duration=1000):
+    """Notify the events at (time, event) in ms from now. Return the callbacks called, with their times (ms)."""
+    start = clock.read() // 1000
+    calls = []
+
+    def callback(name):
+        return lambda: calls.append((name, clock.read() // 1000 - start))
+
+    mgr = manager.Manager(Logger(refusals), 10, callback("init"), callback("pause"), callback("start"),
+                          callback("stop"), callback("busy"))
+
+    async def notify():
+        now = 0
+        for t, event in events:
+            await asyncio.sleep_ms(t - now)
+            now = t
+            mgr.notify(event)
+        await asyncio.sleep_ms(duration - now)
+
+    loop.create_task(mgr.execute())
+    loop.run_until_complete(notify())
+    return mgr, calls
+
+
+def test_refused_transition_is_retried(loop):
+    metrics.reset()
+    mgr, calls = run_events(loop, 3, [(100, Event.EVENT1)])
+    assert calls == [("init", 0), ("busy", 100), ("start", 130)]
+    assert mgr.state == State.STARTED
+    assert metrics.values[metrics.TRANSITIONS] == 1
+
+
+def test_events_handled_in_order_after_a_retry(loop):
+    mgr, calls = run_events(loop, 2, [(100, Event.EVENT1), (105, Event.EVENT1), (110, Event.EVENT1)])
+    assert calls == [("init", 0), ("busy", 100), ("start", 120), ("pause", 120), ("start", 120)]
+    assert mgr.state == State.STARTED
+
+
+def test_stopped_after_a_long_press(loop, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mgr, calls = run_events(loop, 0, [(100, Event.EVENT1), (200, Event.EVENT2), (300, Event.EVENT1)])
+    assert calls == [("init", 0), ("start", 100), ("stop", 200)]
+    assert mgr.state == State.STOPPED
+    assert os.path.exists(".token")
@@ -0,0 +1,47 @@
+import machine
+import hardware
+import notifications
+import uasyncio as asyncio
+from notifications import Led, Pattern
+
+
+def play(loop, changes, times):
+    """Show the patterns of changes [(time, pattern)] on a LED and return its levels at the times (ms)."""
+    led = Led(machine.Pin(hardware.Pin("LED")))
+    levels = []
+
+    async def sample():
+        now = 0
+        for t in sorted(set(times) | set(t for t, _ in changes)):
+            await asyncio.sleep_ms(t - now)
+            now = t
+            for change_time, pattern in changes:
+                if change_time == t:
+                    led.show(pattern)
+            if t in times:
+                levels.append(led.pin.value())
+
+    loop.create_task(led.run())
+    loop.run_until_complete(sample())
+    return levels
+
+
+def test_heartbeat_repeats(loop):
+    times = [25, 100, 225, 1000, 2025, 2100]
+    assert play(loop, [(0, notifications.HEARTBEAT)], times) == [1, 0, 1, 0, 1, 0]
+
+
+def test_error_code_blinks_then_pauses(loop):
+    times = [100, 300, 600, 800, 1500, 2300]
+    assert play(loop, [(0, notifications.error_code(2))], times) == [1, 0, 1, 0, 0, 1]
+
+
+def test_pattern_replaced_from_its_start(loop):
+    # Pulse shown during the long off step of the heartbeat, then held on
+    changes = [(0, notifications.HEARTBEAT), (1000, notifications.PULSE), (2000, notifications.ON)]
+    times = [1050, 1150, 1990, 3000]
+    assert play(loop, changes, times) == [1, 0, 0, 1]
+
+
+def test_played_once(loop):
+    assert play(loop, [(0, Pattern((100, 100, 100)))], [50, 150, 250, 1000]) == [1, 0, 1, 0]
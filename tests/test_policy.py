@@ -0,0 +1,45 @@
+import policy
+from test_logger import Buffer, create_frame
+
+
+def select(rules, frames):
+    selection = policy.create(rules, 1024)
+    selection.init()
+    selected = []
+    for i, frame in enumerate(frames):
+        if selection.select(Buffer(frame), len(frame), 1000 * i):
+            selected.append(bytes(selection.buffer[:selection.length]))
+    return selected
+
+
+def test_groups_without_rule_are_selected_with_every_frame():
+    frames = [create_frame(i) for i in range(3)]
+    assert select({"PAPP": ("every", 1)}, frames) == frames
+
+
+def test_unchanged_groups_are_dropped():
+    frames = [create_frame(i // 2) for i in range(4)]
+    selected = select({"ADCO": ("change",), "BASE": ("change",), "PAPP": ("change",)}, frames)
+    assert len(selected) == 2  # Nothing selected from the repeated frames
+    assert selected[0] == frames[0]
+    assert b"ADCO" not in selected[1] and b"\nBASE 006350001 " in selected[1]
+
+
+def test_values_are_aggregated_over_buckets():
+    frames = [create_frame(i) for i in range(5)]
+    selected = select({"ADCO": ("change",), "BASE": ("change",), "PAPP": ("aggregate", 2000)}, frames)
+    assert b"\nPAPP 01201 " in selected[2] and b"\nPAPPMIN 01200 " in selected[2] \
+        and b"\nPAPPMAX 01201 " in selected[2]
+
+
+def test_values_left_out_stay_valid_in_the_viewer():
+    import analyzer
+    import tic_parser
+    selected = select({"PAPP": ("every", 2)}, [create_frame(i) for i in range(6)])
+    assert sum(b"\nPAPP " in frame for frame in selected) == 3
+    parser = tic_parser.HistoricParser(None, None)
+    frames = [parser.parse_groups(frame[1:-1]) for frame in selected]
+    for k, frame in enumerate(frames):
+        frame[b'timestamp'] = 1000 * k
+    datastore = analyzer.HistoricDatastore(frames)
+    assert datastore.get_field(b'PAPP')[1].all() and datastore.get_field(b'BASE')[1].all()
@@ -0,0 +1,44 @@
+import machine
+import hardware
+import power
+import uasyncio as asyncio
+from clock import clock
+from hardware import board
+
+
+class Logger:
+    active = False
+
+    def __init__(self):
+        self.timestamper = self
+        self.skipped = 0
+
+    def skip(self, skipped):
+        self.skipped += skipped
+
+
+def test_no_sleep_when_an_edge_arrived_after_the_poll():
+    flag = asyncio.IRQFlag()
+    flag.set()
+    start = clock.read()
+    assert power.Idle(Logger(), (flag,))(500) is None
+    assert clock.read() == start
+    assert board.irq_enabled
+
+
+def test_edge_during_the_sleep_wakes_up_and_is_handled_after():
+    flag = asyncio.IRQFlag()
+    pin = machine.Pin(board.pins["SW"])
+    pin.irq(lambda p: flag.set(), machine.Pin.IRQ_FALLING)
+    start = clock.read()
+    source = hardware.Button(board.pins["SW"], [(start // 1000 + 100, 50)], machine.Pin.IRQ_RISING,
+                             machine.Pin.IRQ_FALLING)
+    logger = Logger()
+    try:
+        assert power.Idle(logger, (flag,))(500) == logger.skipped
+    finally:
+        clock.remove_source(source)
+        board.pins["SW"].value(1)  # Released
+        pin.irq(None)
+    assert clock.read() - start == 100000  # Woken by the edge
+    assert flag.state
@@ -0,0 +1,67 @@
+import numpy as np
+import analyzer
+import tic_parser
+from session import Session
+from test_tic_parser import frame
+
+
+def write_segmented_capture(directory, first_frame, segments=2, frames=10):
+    """Write a text capture of segments of frames 1 s apart, the timestamps of each segment following the previous."""
+    directory.mkdir()
+    lines = [tic_parser.INDEX_MAGIC.decode()]
+    for n in range(1, segments + 1):
+        times = [1000 * ((n - 1) * frames + k) for k in range(frames)]
+        (directory / ('data_%04d.txt' % n)).write_bytes(b''.join(frame(first_frame + t // 1000) for t in times))
+        (directory / ('time_%04d.txt' % n)).write_text(''.join('%d\n' % t for t in times))
+        lines.append('data_%04d.txt time_%04d.txt %d %d %d' % (n, n, times[0], times[-1], frames))
+    (directory / 'index.txt').write_text('\n'.join(lines) + '\n')
+    return str(directory / 'index.txt')
+
+
+def numbers(datastore):
+    """Return the numbers of the frames of a datastore, as given to frame()."""
+    return [round(base / analyzer.kwh_per_wh) - 1000 for base in datastore.get_field(b'BASE')[0]]
+
+
+def test_window_of_merged_captures_is_in_the_merged_timeline(tmp_path):
+    captures = [write_segmented_capture(tmp_path / 'first', 0), write_segmented_capture(tmp_path / 'second', 100)]
+    reference = Session()
+    for c in captures:
+        reference.add('historic', c)
+    expected = reference.get_merged().window(12, 25).datastore.get_field(b'BASE')[0]
+    session = Session()
+    session.set_window(12, 25)
+    for c in captures:
+        session.add('historic', c)
+    assert np.array_equal(session.get_merged().datastore.get_field(b'BASE')[0], expected)
+    session.set_window(12, 25)  # Set again with both captures
+    assert np.array_equal(session.get_merged().datastore.get_field(b'BASE')[0], expected)
+
+
+def test_window_of_a_single_capture_parses_only_its_segments(tmp_path):
+    session = Session()
+    session.set_window(12, 15)
+    session.add('historic', write_segmented_capture(tmp_path / 'first', 0))
+    capture, = session.get_captures()
+    assert capture.selection == [str(tmp_path / 'first' / 'data_0002.txt')]
+    assert numbers(session.get_merged().datastore) == [12, 13, 14, 15]
+
+
+def test_window_of_compared_captures_is_in_their_timelines(tmp_path):
+    session = Session()
+    session.set_overlay(True)
+    session.add('historic', write_segmented_capture(tmp_path / 'first', 0))
+    session.add('historic', write_segmented_capture(tmp_path / 'second', 100))
+    session.set_window(12, 15)
+    view = session.get_view()
+    assert [numbers(a.datastore) for a in view.analyzers] == [[12, 13, 14, 15], [112, 113, 114, 115]]
+    assert [len(c.selection) for c in session.get_captures()] == [1, 1]
+
+
+def test_datastore_of_compared_captures_is_windowed_in_their_timelines(tmp_path):
+    session = Session()
+    session.set_overlay(True)
+    session.add('historic', write_segmented_capture(tmp_path / 'first', 0))
+    session.add('historic', write_segmented_capture(tmp_path / 'second', 100))
+    session.set_window(12, 15)  # Outside of the second capture in the merged timeline
+    assert numbers(session.get_datastore()) == [12, 13, 14, 15, 112, 113, 114, 115]
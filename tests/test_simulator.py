@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+from conftest import ROOT
+from test_logger import create_frame
+
+
+def run_simulator(tmp_path, *args):
+    data = tmp_path / "capture.txt"
+    data.write_bytes(b"".join(create_frame(i) for i in range(100)))
+    subprocess.run([sys.executable, "-W", "ignore", os.path.join(ROOT, "simulator", "simulator.py"), str(data),
+                    "--workdir", str(tmp_path / "output"), "--loop"] + list(args),
+                   check=True, capture_output=True, timeout=600)
+    with open(tmp_path / "output" / "stats.txt") as f:
+        return dict(line.split(" ", 1) for line in f.read().splitlines() if line.count(" ") == 1)
+
+
+def test_metrics_count_the_time_awake_while_logging(tmp_path):
+    # Logging from 1 s to 30 s, then paused: the metrics are written when the logger stops
+    stats = run_simulator(tmp_path, "--baudrate", "9600", "--duration", "40", "--presses", "1000:100,30000:100")
+    uptime, idle_time, active_time = int(stats["uptime"]), int(stats["idle_time"]), int(stats["active_time"])
+    assert int(stats["frames_received"]) > 0
+    assert active_time >= 28000  # Waiting for the UART is not idle
+    assert idle_time + active_time == uptime
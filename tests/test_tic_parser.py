@@ -0,0 +1,116 @@
+import binascii
+import tic_parser
+
+
+def record(content, timestamp, marker=tic_parser.RECORD_MARKER | tic_parser.RECORD_ABSOLUTE):
+    data = tic_parser.RECORD_HEADER.pack(marker, len(content)) + tic_parser.RECORD_ABSOLUTE_TIME.pack(timestamp) \
+        + content
+    return data + tic_parser.RECORD_CRC.pack(binascii.crc_hqx(data, 0xFFFF))
+
+
+def group(label, value, checksum=None):
+    payload = label + b' ' + value
+    checksum = tic_parser.checksum(payload) if checksum is None else checksum
+    return b'\n' + payload + b' ' + bytes((checksum,)) + b'\r'
+
+
+def frame(i, extra=b''):
+    return b'\x02' + group(b'ADCO', b'031428097115') + group(b'BASE', b'%09d' % (1000 + i)) + group(b'PAPP', b'00600') \
+        + extra + b'\x03'
+
+
+def parse_text(tmp_path, records):
+    """Parse a text capture of (bytes written, timestamp) records, as the logger writes them."""
+    (tmp_path / 'data.txt').write_bytes(b''.join(data for data, _ in records))
+    (tmp_path / 'time.txt').write_text(''.join('%d\n' % t for _, t in records))
+    parser = tic_parser.HistoricParser(str(tmp_path / 'data.txt'), str(tmp_path / 'time.txt'))
+    frames = parser.parse()
+    for f in frames:  # Aligned with the timestamps: frame i received at 1000 * i ms
+        assert f[b'timestamp'] == 1000 * (int(f[b'BASE']) - 1000)
+    return frames, parser.statistics
+
+
+def scan(data):
+    statistics = tic_parser.ScanStatistics()
+    return [(content, timestamp) for content, _, timestamp in tic_parser.scan_records(data, statistics)], statistics
+
+
+def test_find_marker_returns_the_next_byte_starting_a_record():
+    data = b'\x00\xa6\x10\xa0'
+    assert tic_parser.find_marker(data, 0) == 1
+    assert tic_parser.find_marker(data, 2) == 3
+    assert tic_parser.find_marker(data, 4) == len(data)
+    assert tic_parser.find_marker(b'\x9f\xa8\x00', 0) == 3
+
+
+def test_records_are_found_after_a_corruption():
+    garbage = b'\xa0\xff\xff' + b'\xa3\x05\x00' + bytes(range(256))  # Candidates with wrong lengths or CRC
+    data = tic_parser.BINARY_MAGIC + record(b'first', 1000) + garbage + record(b'second', 2000)
+    records, statistics = scan(data)
+    assert records == [(b'first', 1000), (b'second', 2000)]
+    assert statistics.corrupt_records > 0
+
+
+def test_corrupted_capture_is_scanned_in_linear_time():
+    # Markers with a CRC error every few bytes: each resynchronization looks only up to the next candidate
+    corrupt = (b'\xa1\x04\x00' + b'\x00' * 13) * 20000
+    data = tic_parser.BINARY_MAGIC + corrupt + record(b'last', 5000)
+    records, statistics = scan(data)
+    assert records == [(b'last', 5000)]
+    assert statistics.corrupt_records == 20000
+
+
+def test_absolute_times_are_unwrapped_after_2_32_ms():
+    period = tic_parser.RECORD_TIME_PERIOD
+    data = tic_parser.BINARY_MAGIC + record(b'a', period - 1500) + record(b'b', period - 500) + record(b'c', 500) \
+        + record(b'd', 1500)
+    records, _ = scan(data)
+    assert [t for _, t in records] == [period - 1500, period - 500, period + 500, period + 1500]
+
+
+def test_absolute_times_falling_back_less_than_half_a_period_are_restarts():
+    data = tic_parser.BINARY_MAGIC + record(b'a', 2 ** 30) + record(b'b', 1000)
+    records, _ = scan(data)
+    assert [t for _, t in records] == [2 ** 30, 1000]
+
+
+def test_frame_whose_etx_was_lost_is_dropped_with_the_next_one_kept(tmp_path):
+    # Without the ETX, the logger receives frames 1 and 2 as one and timestamps them once
+    frames, statistics = parse_text(tmp_path, [(frame(0), 0), (frame(1)[:-1] + frame(2), 2000), (frame(3), 3000)])
+    assert [f[b'timestamp'] for f in frames] == [0, 2000, 3000]
+    assert (statistics.frames, statistics.truncated_frames) == (3, 1)
+
+
+def test_frame_whose_eot_was_lost_is_dropped_with_the_next_one_kept(tmp_path):
+    frames, statistics = parse_text(tmp_path, [(frame(0), 0), (frame(1)[:30] + frame(2), 2000), (frame(3), 3000)])
+    assert [f[b'timestamp'] for f in frames] == [0, 2000, 3000]
+    assert (statistics.frames, statistics.truncated_frames) == (3, 1)
+
+
+def test_frame_ended_by_eot_is_skipped_with_its_timestamp(tmp_path):
+    frames, statistics = parse_text(tmp_path, [(frame(0), 0), (frame(1)[:30] + b'\x04', 1000), (frame(2), 2000)])
+    assert [f[b'timestamp'] for f in frames] == [0, 2000]
+    assert (statistics.frames, statistics.truncated_frames) == (3, 1)
+
+
+def test_oversize_frame_is_skipped_with_its_timestamp(tmp_path):
+    oversize = b'\x02' + b'\n' * (tic_parser.MAX_FRAME_LENGTH + 100) + b'\x03'
+    frames, statistics = parse_text(tmp_path, [(frame(0), 0), (oversize, 1000), (frame(2), 2000)])
+    assert [f[b'timestamp'] for f in frames] == [0, 2000]
+    assert (statistics.frames, statistics.oversize_frames, statistics.truncated_frames) == (3, 1, 0)
+
+
+def test_group_with_a_bad_checksum_is_invalid(tmp_path):
+    corrupted = frame(1).replace(group(b'PAPP', b'00600'), group(b'PAPP', b'00600', checksum=0x21))
+    frames, statistics = parse_text(tmp_path, [(frame(0), 0), (corrupted, 1000), (frame(2), 2000)])
+    assert [f[b'timestamp'] for f in frames] == [0, 1000, 2000]
+    assert frames[1][b'PAPP'] is None and frames[1][b'BASE'] == b'000001001'
+    assert frames[1][b'checksum_errors'] == b'PAPP'
+    assert (statistics.bad_checksums, statistics.malformed_groups) == (1, 0)
+
+
+def test_group_with_an_unknown_label_is_ignored(tmp_path):
+    frames, statistics = parse_text(tmp_path, [(frame(0, group(b'ADPS', b'045')), 0), (frame(1), 1000)])
+    assert [f[b'PAPP'] for f in frames] == [b'00600', b'00600']
+    assert b'ADPS' not in frames[0]
+    assert (statistics.unknown_labels, statistics.bad_checksums, statistics.malformed_groups) == (1, 0, 0)
@@ -1,3 +1,4 @@
+import concurrent.futures
 import matplotlib.pyplot as plt
 import scipy.signal
 import numpy as np
@@ -12,12 +13,32 @@ h_per_d = 24  # hours per day
 s_per_h = 3600  # seconds per hour
 d_per_w = 7  # days per week
 
+# Segmentation of the captures
+max_frame_interval = 10  # Interval between two frames above which the acquisition is interrupted (s)
+parallel_threshold = 1000000  # Number of frames above which segments are analyzed in parallel
+
 
 def create(meter_mode, data_filename, time_filename=None):
-    parser = tic_parser.create(meter_mode, data_filename, time_filename)
+    return create_from_datastore(create_datastore(meter_mode, data_filename, time_filename))
+
+
+def create_datastore(meter_mode, data_filename, time_filename=None, time_range=None):
+    parser = tic_parser.create(meter_mode, data_filename, time_filename, time_range)
     frames = parser.parse()
+    return HistoricDatastore(frames, parser.statistics)
+
+
+def map_segments(function, segments, length):
+    """Apply a function to every segment of a capture of the given length, in parallel for large captures."""
+    if length > parallel_threshold and len(segments) > 1:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            return list(executor.map(function, segments))
+    return [function(segment) for segment in segments]
+
+
+def create_from_datastore(datastore):
     analyzer = Analyzer()
-    analyzer.datastore = HistoricDatastore(frames)
+    analyzer.datastore = datastore
     analyzer.analyze()
     return analyzer
 
@@ -36,9 +57,27 @@ class Analyzer:
         avgpower_validity = np.full_like(avgpower, True)
         return time, avgpower * j_per_wh, avgpower_validity
 
+    @staticmethod
+    def compute_avgpower_segmented(index_values, time, segments):
+        """Compute the average power independently on every segment."""
+        def compute(segment):
+            begin, end = segment
+            if end - begin < 3:  # Too short for the filter
+                return time[begin:end], np.zeros(end - begin), np.full(end - begin, False)
+            return Analyzer.compute_avgpower(index_values[begin:end], time[begin:end])
+        results = map_segments(compute, segments, len(time))
+        return tuple(np.concatenate(r) for r in zip(*results))
+
+    @staticmethod
+    def compute_durations(time, segments):
+        """Compute the duration of every sample but the last one. Samples ending a segment last zero seconds."""
+        durations = np.diff(time)
+        durations[[end - 1 for _, end in segments[:-1]]] = 0
+        return durations
+
     @staticmethod
     def compute_seasonality(ts, period):
-        nb_periods = int(np.floor(ts.time[-1]/period))
+        nb_periods = int(np.floor((ts.time[-1] - ts.time[0])/period))
         if nb_periods < 1:
             raise ValueError(period)
         else:
@@ -53,15 +92,36 @@ class Analyzer:
             period_average = scipy.signal.convolve(values_trunc, period_average_filter)
             begin_index = len(values_trunc)
             end_index = len(period_average_filter)
-            time_fin = time_trunc[0:samples_per_period]
+            time_fin = time_trunc[0:samples_per_period] - time_trunc[0]
             values_fin = period_average[begin_index:end_index]
             validity = np.full_like(time_fin, True)
             return TimeSeries(time_fin, values_fin, validity)
 
+    @staticmethod
+    def compute_seasonality_segmented(ts, period, segments):
+        """Compute the seasonality on every segment lasting at least one period and average the results."""
+        def compute(segment):
+            begin, end = segment
+            try:
+                return Analyzer.compute_seasonality(TimeSeries(ts.time[begin:end], ts.values[begin:end]), period)
+            except ValueError:  # Segment shorter than the period
+                return None
+        results = map_segments(compute, segments, len(ts.time))
+        weights = [np.floor((ts.time[end - 1] - ts.time[begin]) / period) for begin, end in segments]
+        kept = [(r, w) for r, w in zip(results, weights) if r is not None]
+        if not kept:
+            raise ValueError(period)
+        results, weights = zip(*kept)
+        # Average on the sampling of the longest segment, weighted by the number of periods
+        reference = results[int(np.argmax(weights))]
+        values = sum(w * np.interp(reference.time, r.time, r.values) for r, w in zip(results, weights)) / sum(weights)
+        return TimeSeries(reference.time, values, np.full_like(reference.time, True))
+
     def __init__(self):
         self.power = None
         self.index = None
         self.avgpower = None
+        self.durations = None
         self.datastore = None
 
     def analyze(self):
@@ -69,72 +129,144 @@ class Analyzer:
         power_values, power_validity = self.datastore.get_field(b'PAPP')
         index_values, index_validity = self.datastore.get_field(b'BASE')
 
-        # Compute derived data
-        time_avgpower, avgpower_values, avgpower_validity = self.compute_avgpower(index_values, time)
+        # Compute derived data, independently on every segment of continuous acquisition
+        segments = self.datastore.get_segments()
+        time_avgpower, avgpower_values, avgpower_validity = self.compute_avgpower_segmented(index_values, time,
+                                                                                            segments)
+        self.durations = self.compute_durations(time, segments)
 
         self.power = TimeSeries(time, power_values, power_validity)
         self.index = TimeSeries(time, index_values, index_validity)
         self.avgpower = TimeSeries(time_avgpower, avgpower_values, avgpower_validity)
 
+    def window(self, t0, t1):
+        """Return an analyzer restricted to the time range [t0, t1] (s).
+
+        The time series of the returned analyzer are views on the ones of this analyzer: only the derived data
+        are computed again, on the selected range.
+        """
+        time, _ = self.datastore.get_field(b'timestamp')
+        begin = np.searchsorted(time, t0, side='left')
+        end = np.searchsorted(time, t1, side='right')
+        if end - begin < 3:  # Too short to compute the average power
+            raise ValueError((t0, t1))
+        return create_from_datastore(self.datastore.slice(begin, end))
+
+    def get_seasonality(self, period):
+        return Analyzer.compute_seasonality_segmented(self.avgpower, period, self.datastore.get_segments())
+
     def get_figure_power(self, width, height, dpi):
-        return Analyzer.get_figure_with_time(width, height, dpi, self.power, "Puissance apparente (VA)")
+        return Comparison([self]).get_figure_power(width, height, dpi)
 
     def get_figure_index(self, width, height, dpi):
-        return Analyzer.get_figure_with_time(width, height, dpi, self.index, "Index (kWh)")
+        return Comparison([self]).get_figure_index(width, height, dpi)
 
     def get_figure_avgpower(self, width, height, dpi):
-        return Analyzer.get_figure_with_time(width, height, dpi, self.avgpower, "Puissance moyenne (W)")
+        return Comparison([self]).get_figure_avgpower(width, height, dpi)
 
     def get_figure_day(self, width, height, dpi):
-        try:
-            average_day = Analyzer.compute_seasonality(self.avgpower, h_per_d * s_per_h)
-            return Analyzer.get_figure_with_time(width, height, dpi, average_day, "Puissance moyenne (W)")
-        except ValueError:
-            return plt.Figure()
+        return Comparison([self]).get_figure_day(width, height, dpi)
 
     def get_figure_week(self, width, height, dpi):
-        try:
-            average_day = Analyzer.compute_seasonality(self.avgpower, h_per_d * s_per_h * d_per_w)
-            return Analyzer.get_figure_with_time(width, height, dpi, average_day, "Puissance moyenne (W)")
-        except ValueError:
-            return plt.Figure()
+        return Comparison([self]).get_figure_week(width, height, dpi)
 
     @staticmethod
     def get_figure_with_time(width, height, dpi, timeseries, ylabel):
+        return Comparison.get_figure_with_times(width, height, dpi, [timeseries], ylabel)
+
+    def get_figure_hist_power_time(self, width, height, dpi):
+        return Comparison([self]).get_figure_hist_power_time(width, height, dpi)
+
+    def get_figure_hist_power_energy(self, width, height, dpi):
+        return Comparison([self]).get_figure_hist_power_energy(width, height, dpi)
+
+
+class Comparison:
+    """Analyzers displayed side by side on the same figures."""
+    def __init__(self, analyzers, labels=None):
+        self.analyzers = analyzers
+        self.labels = labels
+
+    def get_figure_power(self, width, height, dpi):
+        series = [a.power for a in self.analyzers]
+        return Comparison.get_figure_with_times(width, height, dpi, series, "Puissance apparente (VA)", self.labels)
+
+    def get_figure_index(self, width, height, dpi):
+        series = [a.index for a in self.analyzers]
+        return Comparison.get_figure_with_times(width, height, dpi, series, "Index (kWh)", self.labels)
+
+    def get_figure_avgpower(self, width, height, dpi):
+        series = [a.avgpower for a in self.analyzers]
+        return Comparison.get_figure_with_times(width, height, dpi, series, "Puissance moyenne (W)", self.labels)
+
+    def get_figure_day(self, width, height, dpi):
+        return self.get_figure_seasonality(width, height, dpi, h_per_d * s_per_h)
+
+    def get_figure_week(self, width, height, dpi):
+        return self.get_figure_seasonality(width, height, dpi, h_per_d * s_per_h * d_per_w)
+
+    def get_figure_seasonality(self, width, height, dpi, period):
+        series, labels = [], []
+        for k, a in enumerate(self.analyzers):
+            try:
+                series.append(a.get_seasonality(period))
+            except ValueError:  # Capture shorter than the period
+                continue
+            if self.labels is not None:
+                labels.append(self.labels[k])
+        if not series:
+            return plt.Figure()
+        labels = labels if self.labels is not None else None
+        return Comparison.get_figure_with_times(width, height, dpi, series, "Puissance moyenne (W)", labels)
+
+    @staticmethod
+    def get_figure_with_times(width, height, dpi, timeseries_list, ylabel, labels=None):
         figure = plt.Figure(figsize=(width/dpi, height/dpi), dpi=dpi)
         ax = figure.add_subplot(1, 1, 1)
-        ax.plot(timeseries.time, timeseries.values)
+        for k, timeseries in enumerate(timeseries_list):
+            label = labels[k] if labels is not None else None
+            ax.plot(timeseries.time, timeseries.values, label=label)
+            invalid_indices = np.logical_not(timeseries.validity)
+            invalid_data = timeseries.values[invalid_indices]
+            invalid_time = timeseries.time[invalid_indices]
+            ax.plot(invalid_time, invalid_data, 'r. ')
         ax.set_xlabel("Temps (s)")
         ax.set_ylabel(ylabel)
-        invalid_indices = np.logical_not(timeseries.validity)
-        invalid_data = timeseries.values[invalid_indices]
-        invalid_time = timeseries.time[invalid_indices]
-        figure.gca().plot(invalid_time, invalid_data, 'r. ')
+        if labels is not None:
+            ax.legend()
         return figure
 
     def get_figure_hist_power_time(self, width, height, dpi):
+        values = [a.avgpower.values[:-1] for a in self.analyzers]
+        durations = [a.durations for a in self.analyzers]
         figure = plt.Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
         ax = figure.add_subplot(2, 1, 1)
-        dt = np.diff(self.avgpower.time)
-        ax.hist(self.avgpower.values[:-1], bins=range(0, 6000, 200), weights=dt)
+        ax.hist(values, bins=range(0, 6000, 200), weights=durations, label=self.labels)
         ax.set_ylabel("Durée (s)")
+        if self.labels is not None:
+            ax.legend()
 
         ax = figure.add_subplot(2, 1, 2)
-        ax.hist(self.avgpower.values[:-1], bins=range(0, 6000, 50), weights=dt, cumulative=True, density=True)
+        ax.hist(values, bins=range(0, 6000, 50), weights=durations, cumulative=True, density=True,
+                label=self.labels)
         ax.grid()
         ax.set_ylabel("Durée cumulée normalisée")
         ax.set_xlabel("Puissance moyenne (W)")
         return figure
 
     def get_figure_hist_power_energy(self, width, height, dpi):
+        values = [a.avgpower.values[:-1] for a in self.analyzers]
+        energies = [a.durations * a.avgpower.values[:-1] * kwh_per_j for a in self.analyzers]
         figure = plt.Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
         ax = figure.add_subplot(2, 1, 1)
-        energy = np.diff(self.avgpower.time) * self.avgpower.values[:-1] * kwh_per_j
-        ax.hist(self.avgpower.values[:-1], bins=range(0, 6000, 50), weights=energy)
+        ax.hist(values, bins=range(0, 6000, 50), weights=energies, label=self.labels)
         ax.set_ylabel("Énergie (kWh)")
+        if self.labels is not None:
+            ax.legend()
 
         ax = figure.add_subplot(2, 1, 2)
-        ax.hist(self.avgpower.values[:-1], bins=range(0, 6000, 50), weights=energy, cumulative=True, density=True)
+        ax.hist(values, bins=range(0, 6000, 50), weights=energies, cumulative=True, density=True,
+                label=self.labels)
         ax.grid()
         ax.set_ylabel("Énergie cumulée normalisée")
         ax.set_xlabel("Puissance moyenne (W)")
@@ -148,32 +280,122 @@ class TimeSeries:
         self.validity = validity
 
 
-class HistoricDatastore:
-    def __init__(self, frames):
+class Datastore:
+    """Columnar store of the fields of a capture.
+
+    `fields` holds the decoded numeric fields as (values, validity) pairs and `raw` the undecoded values
+    of the data groups, as object arrays. `starts` marks the rows starting a segment of continuous acquisition.
+    """
+    def __init__(self, fields, raw=None, starts=None):
+        self.fields = fields
+        self.raw = raw if raw is not None else {}
+        self.length = len(fields[b'timestamp'][0])
+        if starts is None:
+            starts = np.full(self.length, False)
+            starts[:1] = True
+        self.starts = starts
+
+    def get_field(self, field):
+        try:
+            return self.fields[field]
+        except KeyError:
+            raise ValueError(field)
+
+    def slice(self, begin, end):
+        """Return a new datastore with the rows from begin to end (excluded), sharing its memory with this one."""
+        fields = {name: (values[begin:end], validity[begin:end]) for name, (values, validity) in self.fields.items()}
+        raw = {name: column[begin:end] for name, column in self.raw.items()}
+        return Datastore(fields, raw, self.starts[begin:end])
+
+    def get_segments(self):
+        """Return the (begin, end) indices of the segments of continuous acquisition."""
+        begins = np.flatnonzero(self.starts[1:]) + 1
+        begins = np.concatenate(([0], begins))
+        ends = np.concatenate((begins[1:], [self.length]))
+        return list(zip(begins.tolist(), ends.tolist()))
+
+
+def merge_datastores(datastores):
+    """Merge datastores into a single timeline, one capture after the other in the given order.
+
+    The timestamps restart from zero with the logger: as the segments of a capture (see tic_parser.SegmentedParser),
+    a capture starting before the end of the previous one is shifted to follow it, one median frame interval later.
+    Each capture starts a segment, so that no derived data spans two captures.
+    """
+    names = set.intersection(*(set(ds.fields) for ds in datastores))
+    fields = {name: (np.concatenate([ds.fields[name][0] for ds in datastores]),
+                     np.concatenate([ds.fields[name][1] for ds in datastores])) for name in names}
+    raw_names = set.intersection(*(set(ds.raw) for ds in datastores))
+    raw = {name: np.concatenate([ds.raw[name] for ds in datastores]) for name in raw_names}
+    starts = np.concatenate([ds.starts for ds in datastores])
+    time = fields[b'timestamp'][0]  # Copy of the timestamps of the captures
+    begin = 0
+    end = None  # End of the timeline
+    interval = tic_parser.SEGMENT_INTERVAL * s_per_ms
+    for ds in datastores:
+        if ds.length:
+            capture = time[begin:begin + ds.length]
+            if end is not None and capture[0] < end:
+                capture += end - capture[0] + interval
+            starts[begin] = True
+            end = capture[-1]
+            if ds.length > 1:
+                interval = np.median(np.diff(capture))
+        begin += ds.length
+    return Datastore(fields, raw, starts)
+
+
+class HistoricDatastore(Datastore):
+    def __init__(self, frames, statistics=None):
         self.frames = frames
+        self.statistics = statistics if statistics is not None else tic_parser.ScanStatistics()
         self.length = len(self.frames)
         self.timestamp = self.extract(b'timestamp', s_per_ms, float)
         self.papp = self.extract(b'PAPP', 1, float)
         self.base = self.extract(b'BASE', kwh_per_wh, float)
+        starts = self.segment()
+        raw = {label: self.extract_raw(label) for label in tic_parser.HISTORIC_LABELS + (b'checksum_errors',)}
+        super().__init__({b'timestamp': self.timestamp, b'PAPP': self.papp, b'BASE': self.base}, raw, starts)
 
-    def get_field(self, field):
-        if field == b"timestamp":
-            return self.timestamp
-        elif field == b"PAPP":
-            return self.papp
-        elif field == b"BASE":
-            return self.base
-        else:
-            raise ValueError(field)
+    def segment(self):
+        """Find the segments of continuous acquisition and make the timestamps increasing.
+
+        A segment starts with the capture, after a gap between frames (logger paused) and when the timestamps
+        restart from zero (logger restarted). In the latter case, the following frames are shifted to come after
+        the previous ones, one median frame interval later, or one default interval if every frame restarts.
+        """
+        time = self.timestamp[0]
+        intervals = np.diff(time)
+        resets = intervals < 0
+        gaps = intervals > max_frame_interval
+        if np.any(resets):
+            interval = np.median(intervals[~resets]) if not np.all(resets) \
+                else tic_parser.SEGMENT_INTERVAL * s_per_ms
+            shifts = np.where(resets, interval - intervals, 0)
+            time[1:] += np.cumsum(shifts)
+        assert np.all(np.diff(time) >= 0), "timestamps not increasing after the restarts"  # See Analyzer.window()
+        return np.concatenate(([True], resets | gaps))[:self.length]
 
     def extract(self, field, scaling, converter):
+        """Extract a numeric field of the frames, with its validity.
+
+        A field missing from a frame without corrupted groups was left out by the logging policy of the logger (see
+        embsw/policy.py): its previous value is carried forward, valid if it was.
+        """
         data = np.zeros(self.length)
         validity = np.full(self.length, False)
         for k, frame in zip(range(self.length), self.frames):
             try:
                 validity[k] = frame[field] is not None
                 data[k] = converter(frame[field]) if validity[k] else data[k - 1]
+                if not validity[k] and k > 0 and frame.get(b'corrupted') is False:
+                    validity[k] = validity[k - 1]
             except (ValueError, KeyError):  # Field does not exist or cannot be converted
                 data[k] = data[k-1]
                 # validity[k] already false by default
         return data * scaling, validity
+
+    def extract_raw(self, field):
+        column = np.empty(self.length, dtype=object)
+        column[:] = [frame.get(field) for frame in self.frames]
+        return column
@@ -6,7 +6,9 @@ import tkinter.filedialog as fd
 import tkinter.messagebox as mb
 from matplotlib.backends.backend_tkagg import (
     FigureCanvasTkAgg, NavigationToolbar2Tk)
-import analyzer
+import numpy as np
+import session
+import tic_parser
 import os
 matplotlib.use("TkAgg")
 
@@ -32,6 +34,112 @@ class FigurePane(ttk.Frame):
         self.canvas.draw()
 
 
+class FrameTable(ttk.Frame):
+    """Widget displaying the decoded frames in a table.
+
+    The table is virtual: the tree view only holds the visible rows, which are filled from the columns of the
+    datastore whenever the view is scrolled or resized.
+    """
+    ROW_HEIGHT = 20  # (px)
+    LABELS = tic_parser.HISTORIC_LABELS + (b'checksum_errors',)
+
+    def __init__(self, parent, width, height, name):
+        super().__init__(parent, width=width, height=height)
+        self.name = name
+        self.datastore = None
+        self.first_row = 0
+        self.rows = []  # Identifiers of the items of the tree view
+        self.grid_columnconfigure(index=0, weight=1)
+        self.grid_rowconfigure(index=0, weight=1)
+        columns = ["#", "Temps (s)"] + [label.decode() for label in tic_parser.HISTORIC_LABELS] + ["Erreurs"]
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode=tk.NONE, height=1)
+        for column in columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=70, stretch=True)
+        self.tree.tag_configure("error", foreground="red")
+        self.tree.grid(column=0, row=0, sticky=tk.W + tk.E + tk.N + tk.S)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll)
+        self.scrollbar.grid(column=1, row=0, sticky=tk.N + tk.S)
+        self.goto_bar = ttk.Frame(self)
+        self.goto_bar.grid(column=0, row=1, columnspan=2, sticky=tk.W)
+        self.goto_label = tk.Label(self.goto_bar, text="Aller au temps (s) :")
+        self.goto_label.grid(column=0, row=0)
+        self.goto_entry = tk.Entry(self.goto_bar, width=15)
+        self.goto_entry.grid(column=1, row=0)
+        self.goto_entry.bind("<Return>", lambda event: self.goto_entered_time())
+        self.goto_button = tk.Button(self.goto_bar, text="Aller", command=self.goto_entered_time)
+        self.goto_button.grid(column=2, row=0)
+        self.tree.bind("<Configure>", self.resize)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll("scroll", -3, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll("scroll", 3, "units"))
+
+    def set_datastore(self, datastore):
+        self.datastore = datastore
+        self.first_row = 0
+        self.refresh()
+
+    def get_length(self):
+        return self.datastore.length if self.datastore is not None else 0
+
+    def resize(self, event):
+        """Adjust the number of items of the tree view to the height of the widget."""
+        nb_rows = max(1, event.height // FrameTable.ROW_HEIGHT - 1)
+        if nb_rows != len(self.rows):
+            self.tree.configure(height=nb_rows)
+            while len(self.rows) < nb_rows:
+                self.rows.append(self.tree.insert("", tk.END))
+            while len(self.rows) > nb_rows:
+                self.tree.delete(self.rows.pop())
+            self.refresh()
+
+    def scroll(self, action, amount, unit=None):
+        """Action when using the scrollbar or the mouse wheel."""
+        if action == "moveto":
+            first_row = int(float(amount) * self.get_length())
+        elif unit == "pages":
+            first_row = self.first_row + int(amount) * len(self.rows)
+        else:
+            first_row = self.first_row + int(amount)
+        self.goto_row(first_row)
+
+    def goto_row(self, first_row):
+        self.first_row = max(0, min(first_row, self.get_length() - len(self.rows)))
+        self.refresh()
+
+    def goto_entered_time(self):
+        """Action when validating the time to go to."""
+        if self.datastore is None:
+            return
+        try:
+            time = float(self.goto_entry.get())
+        except ValueError:
+            mb.showerror("Erreur", "Le temps saisi n'est pas un nombre.")
+            return
+        timestamps, _ = self.datastore.get_field(b'timestamp')
+        self.goto_row(int(np.searchsorted(timestamps, time)))
+
+    def refresh(self):
+        """Fill the visible rows from the columns of the datastore."""
+        length = self.get_length()
+        timestamps = self.datastore.get_field(b'timestamp')[0] if self.datastore is not None else None
+        for k, row in enumerate(self.rows):
+            index = self.first_row + k
+            if index < length:
+                raw = [self.datastore.raw[label][index] if label in self.datastore.raw else None
+                       for label in FrameTable.LABELS]
+                values = [index, "{:.3f}".format(timestamps[index])]
+                values += [value.decode(errors="replace") if value is not None else "" for value in raw]
+                tags = ("error",) if raw[-1] is not None else ()
+                self.tree.item(row, values=values, tags=tags)
+            else:
+                self.tree.item(row, values=(), tags=())
+        if length > 0:
+            self.scrollbar.set(self.first_row / length, (self.first_row + len(self.rows)) / length)
+        else:
+            self.scrollbar.set(0, 1)
+
+
 class ModeSelector(ttk.Frame):
     """Widget for mode selection."""
     def __init__(self, parent):
@@ -79,13 +187,13 @@ class FilenameSelector(ttk.Frame):
 class DataFilenameSelector(FilenameSelector):
     """Widget for the selection of the data file."""
     def __init__(self, parent):
-        super().__init__(parent, "Fichier de données :")
+        super().__init__(parent, "Fichier de données ou index :")
 
 
 class TimeFilenameSelector(FilenameSelector):
     """Widget for the selection of the time file."""
     def __init__(self, parent):
-        super().__init__(parent, "Fichier de temps :")
+        super().__init__(parent, "Fichier de temps (format texte) :")
 
 
 class ImportButton(tk.Button):
@@ -97,6 +205,96 @@ class ImportButton(tk.Button):
         self["command"] = import_action
 
 
+class CaptureList(ttk.Frame):
+    """Widget listing the captures of the session."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.label = tk.Label(self, text="Captures :")
+        self.label.grid(column=0, row=0, sticky=tk.W)
+        self.listbox = tk.Listbox(self, height=5, selectmode=tk.SINGLE, exportselection=False)
+        self.listbox.grid(column=0, row=1, sticky=tk.W + tk.E)
+        self.remove_button = tk.Button(self, text="Retirer")
+        self.remove_button.grid(column=0, row=2, sticky=tk.W + tk.E)
+        self.overlay = tk.BooleanVar(None, False)
+        self.overlay_button = tk.Checkbutton(self, text="Superposer les captures", variable=self.overlay)
+        self.overlay_button.grid(column=0, row=3, sticky=tk.W)
+
+    def set_names(self, names):
+        self.listbox.delete(0, tk.END)
+        for name in names:
+            self.listbox.insert(tk.END, name)
+
+    def get_selection(self):
+        """Return the index of the selected capture, or None."""
+        selection = self.listbox.curselection()
+        return selection[0] if selection else None
+
+    def get_overlay(self):
+        return self.overlay.get()
+
+    def set_remove_action(self, remove_action):
+        self.remove_button["command"] = remove_action
+
+    def set_overlay_action(self, overlay_action):
+        self.overlay_button["command"] = overlay_action
+
+
+class TimeRangeSelector(ttk.Frame):
+    """Widget for the selection of the analyzed time range."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.label = tk.Label(self, text="Plage de temps (s) :")
+        self.label.grid(column=0, row=0, columnspan=2, sticky=tk.W)
+        self.begin_entry = tk.Entry(self, width=12)
+        self.begin_entry.grid(column=0, row=1, sticky=tk.W + tk.E)
+        self.end_entry = tk.Entry(self, width=12)
+        self.end_entry.grid(column=1, row=1, sticky=tk.W + tk.E)
+        self.apply_button = tk.Button(self, text="Appliquer")
+        self.apply_button.grid(column=0, row=2, sticky=tk.W + tk.E)
+        self.reset_button = tk.Button(self, text="Tout afficher")
+        self.reset_button.grid(column=1, row=2, sticky=tk.W + tk.E)
+
+    def get_range(self):
+        """Return the bounds of the time range, None for an empty bound. Raise ValueError on invalid input."""
+        bounds = (self.begin_entry.get().strip(), self.end_entry.get().strip())
+        return tuple(float(b) if b else None for b in bounds)
+
+    def clear(self):
+        self.begin_entry.delete(0, last=tk.END)
+        self.end_entry.delete(0, last=tk.END)
+
+    def set_apply_action(self, apply_action):
+        self.apply_button["command"] = apply_action
+
+    def set_reset_action(self, reset_action):
+        self.reset_button["command"] = reset_action
+
+
+class StatisticsPane(ttk.Frame):
+    """Widget reporting the anomalies found in the captures."""
+    FIELDS = (("frames", "Trames"),
+              ("truncated_frames", "Trames tronquées"),
+              ("oversize_frames", "Trames trop longues"),
+              ("malformed_groups", "Groupes mal formés"),
+              ("bad_checksums", "Sommes de contrôle erronées"),
+              ("unknown_labels", "Étiquettes inconnues"),
+              ("corrupt_records", "Enregistrements corrompus"))
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.label = tk.Label(self, text="Statistiques :")
+        self.label.grid(column=0, row=0, sticky=tk.W)
+        self.values = {}
+        for k, (name, text) in enumerate(StatisticsPane.FIELDS):
+            tk.Label(self, text=text).grid(column=0, row=k + 1, sticky=tk.W, padx=20)
+            self.values[name] = tk.Label(self, text="0")
+            self.values[name].grid(column=1, row=k + 1, sticky=tk.E)
+
+    def set_statistics(self, statistics):
+        for name, value in self.values.items():
+            value["text"] = str(getattr(statistics, name))
+
+
 class ConfigPane(ttk.Frame):
     """Pane regrouping configuration widgets."""
     def __init__(self, parent):
@@ -118,6 +316,8 @@ class DisplayArea(ttk.Notebook):
                              'histpowerenergy': FigurePane(self, w, h, "Énergie vs puissance moyenne")}
         for fp in self.figure_panes.values():
             self.add(fp, text=fp.name)
+        self.frame_table = FrameTable(self, w, h, "Trames")
+        self.add(self.frame_table, text=self.frame_table.name)
 
     def set_figure_functions(self, functions):
         for k in self.figure_panes.keys():
@@ -127,6 +327,9 @@ class DisplayArea(ttk.Notebook):
         for fp in self.figure_panes.values():
             fp.update_fig()
 
+    def set_datastore(self, datastore):
+        self.frame_table.set_datastore(datastore)
+
 
 class MainWindow(tk.PanedWindow):
     def __init__(self, parent):
@@ -149,6 +352,9 @@ class Gui:
         self.datafilename_selector = DataFilenameSelector(self.config_pane)
         self.timefilename_selector = TimeFilenameSelector(self.config_pane)
         self.import_button = ImportButton(self.config_pane)
+        self.capture_list = CaptureList(self.config_pane)
+        self.time_range_selector = TimeRangeSelector(self.config_pane)
+        self.statistics_pane = StatisticsPane(self.config_pane)
 
         self.display_area = DisplayArea(self.main_window)
 
@@ -161,6 +367,9 @@ class Gui:
         self.timefilename_selector.grid(column=0, row=1, sticky=tk.W)
         self.mode_selector.grid(column=0, row=2, sticky=tk.W)
         self.import_button.grid(column=0, row=3, sticky=tk.W+tk.E)
+        self.capture_list.grid(column=0, row=4, sticky=tk.W+tk.E)
+        self.time_range_selector.grid(column=0, row=5, sticky=tk.W+tk.E)
+        self.statistics_pane.grid(column=0, row=6, sticky=tk.W+tk.E)
 
     def get_meter_mode(self):
         return self.mode_selector.get_mode()
@@ -174,12 +383,46 @@ class Gui:
     def set_import_action(self, import_action):
         self.import_button.set_action(import_action)
 
+    def set_remove_action(self, remove_action):
+        self.capture_list.set_remove_action(remove_action)
+
+    def set_overlay_action(self, overlay_action):
+        self.capture_list.set_overlay_action(overlay_action)
+
+    def get_selected_capture(self):
+        return self.capture_list.get_selection()
+
+    def get_overlay(self):
+        return self.capture_list.get_overlay()
+
+    def get_time_range(self):
+        return self.time_range_selector.get_range()
+
+    def clear_time_range(self):
+        self.time_range_selector.clear()
+
+    def set_time_range_actions(self, apply_action, reset_action):
+        self.time_range_selector.set_apply_action(apply_action)
+        self.time_range_selector.set_reset_action(reset_action)
+
+    def set_statistics(self, statistics):
+        self.statistics_pane.set_statistics(statistics)
+
+    def set_capture_names(self, names):
+        self.capture_list.set_names(names)
+
+    def get_figure_keys(self):
+        return self.display_area.figure_panes.keys()
+
     def set_figure_functions(self, functions):
         self.display_area.set_figure_functions(functions)
 
     def update_figures(self):
         self.display_area.update_figures()
 
+    def set_datastore(self, datastore):
+        self.display_area.set_datastore(datastore)
+
     def mainloop(self):
         self.root.mainloop()
 
@@ -188,14 +431,17 @@ class Interface:
     def __init__(self, title):
         self.gui = Gui(title)
         self.gui.set_import_action(self.import_button_action)
-        self.anl = None
+        self.gui.set_remove_action(self.remove_button_action)
+        self.gui.set_overlay_action(self.overlay_button_action)
+        self.gui.set_time_range_actions(self.apply_time_range_action, self.reset_time_range_action)
+        self.session = session.Session()
 
     def import_button_action(self):
         meter_mode = self.gui.get_meter_mode()
         datafilename = self.gui.get_datafilename()
         timefilename = self.gui.get_timefilename()
         try:
-            self.anl = analyzer.create(meter_mode, datafilename, timefilename)
+            self.session.add(meter_mode, datafilename, timefilename)
         except FileNotFoundError:
             mb.showerror("Erreur", "L'import du fichier a échoué. Le fichier n'existe pas.")
             return
@@ -206,16 +452,57 @@ class Interface:
         except NotImplementedError:
             mb.showinfo("Information", "L'import du fichier a échoué. La fonctionnalité n'est pas encore disponible.")
             return
+        self.update_session()
+
+    def remove_button_action(self):
+        index = self.gui.get_selected_capture()
+        if index is not None:
+            self.session.remove(self.session.keys[index])
+            self.update_session()
+
+    def overlay_button_action(self):
+        self.session.set_overlay(self.gui.get_overlay())
+        self.update_session()
+
+    def apply_time_range_action(self):
+        try:
+            t0, t1 = self.gui.get_time_range()
+        except ValueError:
+            mb.showerror("Erreur", "Les bornes de la plage de temps ne sont pas des nombres.")
+            return
+        self.session.set_window(t0, t1)
+        self.update_session()
+
+    def reset_time_range_action(self):
+        self.gui.clear_time_range()
+        self.session.set_window()
+        self.update_session()
 
-        fig_funs = {'index': self.anl.get_figure_index,
-                    'power': self.anl.get_figure_power,
-                    'avgpower': self.anl.get_figure_avgpower,
-                    'avgday': self.anl.get_figure_day,
-                    'avgweek': self.anl.get_figure_week,
-                    'histpowertime': self.anl.get_figure_hist_power_time,
-                    'histpowerenergy': self.anl.get_figure_hist_power_energy,}
+    def update_session(self):
+        self.gui.set_capture_names([c.name for c in self.session.get_captures()])
+        self.gui.set_statistics(self.session.get_statistics())
+        try:
+            view = self.session.get_view()
+            datastore = self.session.get_datastore()
+        except ValueError:
+            mb.showerror("Erreur", "La plage de temps ne contient pas assez de trames. Tout est affiché.")
+            self.gui.clear_time_range()
+            self.session.set_window()
+            view = self.session.get_view()
+            datastore = self.session.get_datastore()
+        if view is None:
+            fig_funs = {k: (lambda width, height, dpi: plt.Figure()) for k in self.gui.get_figure_keys()}
+        else:
+            fig_funs = {'index': view.get_figure_index,
+                        'power': view.get_figure_power,
+                        'avgpower': view.get_figure_avgpower,
+                        'avgday': view.get_figure_day,
+                        'avgweek': view.get_figure_week,
+                        'histpowertime': view.get_figure_hist_power_time,
+                        'histpowerenergy': view.get_figure_hist_power_energy}
         self.gui.set_figure_functions(fig_funs)
         self.gui.update_figures()
+        self.gui.set_datastore(datastore)
 
     def mainloop(self):
         self.gui.mainloop()
@@ -0,0 +1,165 @@
+import os
+import numpy as np
+import analyzer
+import tic_parser
+
+
+class Capture:
+    """Capture parsed from a data file and a time file, or from the index of a segmented capture.
+
+    Only the segments of a segmented capture overlapping a time range of its own timeline are parsed.
+    """
+    def __init__(self, meter_mode, data_filename, time_filename=None, window=None):
+        self.meter_mode = meter_mode
+        self.data_filename = data_filename
+        self.time_filename = time_filename
+        self.name = os.path.basename(data_filename)
+        self.segmented = tic_parser.is_index(data_filename)
+        self.selection = None  # Data files of the parsed segments, for a segmented capture
+        self.datastore = None
+        self.analyzer = None
+        if not self.set_window(window):
+            self.load()
+
+    def load(self, time_range=None):
+        """Parse the files, only the segments overlapping the time range (ms) if any."""
+        self.datastore = analyzer.create_datastore(self.meter_mode, self.data_filename, self.time_filename, time_range)
+        self.analyzer = analyzer.create_from_datastore(self.datastore)
+
+    def set_window(self, window):
+        """Parse the segments of a segmented capture overlapping a time range (s) of its timeline, all if it is None.
+
+        Return whether other segments were parsed. Nothing is parsed if no segment overlaps the time range.
+        """
+        if not self.segmented:
+            return False
+        time_range = (window[0] / analyzer.s_per_ms, window[1] / analyzer.s_per_ms) if window is not None else None
+        segments = tic_parser.select_segments(tic_parser.read_index(self.data_filename), time_range)
+        selection = [s.filename_data for s in segments]
+        if not selection or selection == self.selection:
+            return False
+        self.load(time_range)
+        self.selection = selection
+        return True
+
+
+class Session:
+    """Captures loaded at the same time, either merged into one timeline or compared side by side.
+
+    The time range of the session is in the timeline of each capture when they are compared or alone, and in the
+    merged timeline otherwise. As merge_datastores shifts each capture after the previous ones, the merged captures
+    are parsed in full and only the merged timeline is restricted to the time range.
+    """
+    def __init__(self):
+        self.cache = {}  # Every capture parsed so far, by key
+        self.keys = []  # Keys of the captures in the session, in import order
+        self.overlay = False
+        self.window = None  # Time range (s) the analyses are restricted to, None for the whole captures
+        self.merged = None  # Analyzer of the merged timeline, computed on demand
+        self.merged_window = None  # Same, restricted to the time range
+
+    @staticmethod
+    def get_key(meter_mode, data_filename, time_filename=None):
+        """Identify a capture by its files and their modification times."""
+        filenames = [f for f in (data_filename, time_filename) if f]
+        return (meter_mode,) + tuple((os.path.abspath(f), os.path.getmtime(f)) for f in filenames)
+
+    def add(self, meter_mode, data_filename, time_filename=None):
+        """Add a capture to the session. The files are parsed only if they are not in the cache."""
+        key = Session.get_key(meter_mode, data_filename, time_filename)
+        if key not in self.cache:
+            window = self.window if self.overlay or not self.keys or self.keys == [key] else None
+            self.cache[key] = Capture(meter_mode, data_filename, time_filename, window)
+        if key not in self.keys:
+            self.keys.append(key)
+            self.merged = None
+            self.merged_window = None
+        self.load_windows()
+        return key
+
+    def remove(self, key):
+        """Remove a capture from the session. It is kept in the cache."""
+        self.keys.remove(key)
+        self.merged = None
+        self.merged_window = None
+        self.load_windows()
+
+    def set_overlay(self, overlay):
+        self.overlay = overlay
+        self.load_windows()
+
+    def load_windows(self):
+        """Parse the segments of the captures needed for the time range, in their timelines if they are not merged."""
+        window = self.window if self.overlay or len(self.keys) == 1 else None
+        for c in self.get_captures():
+            if c.set_window(window):  # Other segments parsed
+                self.merged = None
+                self.merged_window = None
+
+    def set_window(self, t0=None, t1=None):
+        """Restrict the analyses to the time range [t0, t1] (s). A bound set to None is open."""
+        if t0 is None and t1 is None:
+            self.window = None
+        else:
+            self.window = (-np.inf if t0 is None else t0, np.inf if t1 is None else t1)
+        self.merged_window = None
+        self.load_windows()
+
+    def restrict(self, anl):
+        """Restrict an analyzer to the time range of the session."""
+        return anl.window(*self.window) if self.window is not None else anl
+
+    def get_captures(self):
+        return [self.cache[k] for k in self.keys]
+
+    def get_statistics(self):
+        """Return the scan statistics summed over the captures."""
+        statistics = tic_parser.ScanStatistics()
+        for c in self.get_captures():
+            statistics.add(c.datastore.statistics)
+        return statistics
+
+    def get_merged(self):
+        """Return the analyzer of the merged timeline of the captures, or None if the session is empty.
+
+        Raise ValueError if the time range of the session holds too few frames.
+        """
+        captures = self.get_captures()
+        if not captures:
+            return None
+        if self.merged is None:
+            if len(captures) == 1:
+                self.merged = captures[0].analyzer
+            else:
+                datastore = analyzer.merge_datastores([c.datastore for c in captures])
+                self.merged = analyzer.create_from_datastore(datastore)
+        if self.merged_window is None:
+            self.merged_window = self.restrict(self.merged)
+        return self.merged_window
+
+    def get_view(self):
+        """Return the analyzer (merged timeline) or the comparison (overlay) to display."""
+        captures = self.get_captures()
+        if self.overlay and captures:
+            analyzers, labels = [], []
+            for c in captures:
+                try:
+                    analyzers.append(self.restrict(c.analyzer))
+                except ValueError:  # Capture outside of the time range
+                    continue
+                labels.append(c.name)
+            if not analyzers:
+                raise ValueError(self.window)
+            return analyzer.Comparison(analyzers, labels)
+        return self.get_merged()
+
+    def get_datastore(self):
+        """Return the datastore of the displayed frames, or None if the session is empty.
+
+        The compared captures, each restricted to the time range in its timeline, are merged one after the other.
+        Raise ValueError if the time range of the session holds too few frames.
+        """
+        view = self.get_view()
+        if isinstance(view, analyzer.Comparison):
+            return analyzer.merge_datastores([a.datastore for a in view.analyzers])
+        return view.datastore if view is not None else None
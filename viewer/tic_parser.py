@@ -1,8 +1,47 @@
+import binascii
+import os
 import re
+import struct
 
+# Special symbols
+STX = b'\x02'
+ETX = b'\x03'
+EOT = b'\x04'
 
-def create(meter_mode, filename_data, filename_time=None):
+# Maximum length of the content of a frame (bytes), well above the length of a historic frame
+MAX_FRAME_LENGTH = 1024
+
+# Labels of the data groups in historic mode
+HISTORIC_LABELS = (b'ADCO', b'OPTARIF', b'ISOUSC', b'BASE', b'PTEC', b'IINST', b'IMAX', b'PAPP', b'HHPHC', b'MOTDETAT')
+
+# Labels of the minimum and maximum of the aggregated values, when the logger aggregates PAPP (see embsw/policy.py)
+AGGREGATE_LABELS = (b'PAPPMIN', b'PAPPMAX')
+
+# Binary format of the logger (see embsw/logger.py)
+BINARY_MAGIC = b'PYTICBIN'
+RECORD_MARKER = 0xA0
+RECORD_ABSOLUTE = 0x01
+RECORD_TRUNCATED = 0x02
+RECORD_DELTA = 0x04
+RECORD_HEADER = struct.Struct('<BH')  # Marker, length of the content
+RECORD_ABSOLUTE_TIME = struct.Struct('<I')
+RECORD_TIME_PERIOD = 2 ** 32  # Absolute times are stored modulo this period (ms), about 49.7 days
+RECORD_RELATIVE_TIME = struct.Struct('<H')
+RECORD_CRC = struct.Struct('<H')
+RECORD_MARKERS = re.compile(b'[\\x%02x-\\x%02x]' % (RECORD_MARKER, RECORD_MARKER | 0x07))  # Bytes starting a record
+
+# Index of the segments of the output files of the logger (see embsw/logger.py)
+INDEX_MAGIC = b'PYTICIDX'
+SEGMENT_NAME = re.compile(r'^(.*)_(\d{4,})(\.[^.]*)?$')  # Name of a file of a segment: prefix, number, extension
+SEGMENT_INTERVAL = 1000  # Interval assumed before a segment whose timestamps restart from zero, if unknown (ms)
+
+
+def create(meter_mode, filename_data, filename_time=None, time_range=None):
     if meter_mode == "historic":
+        if is_index(filename_data):
+            return SegmentedParser(meter_mode, filename_data, time_range)
+        if is_binary(filename_data):
+            return HistoricBinaryParser(filename_data)
         return HistoricParser(filename_data, filename_time)
     elif meter_mode == "standard":
         raise NotImplementedError
@@ -10,44 +49,80 @@ def create(meter_mode, filename_data, filename_time=None):
         raise ValueError(meter_mode)
 
 
+class ScanStatistics:
+    """Counters of the anomalies found while scanning a capture."""
+    def __init__(self):
+        self.frames = 0  # Frames written by the logger, usable or not
+        self.truncated_frames = 0  # Frames ended by EOT, or whose start or end was lost
+        self.oversize_frames = 0  # Frames longer than the maximum length
+        self.malformed_groups = 0
+        self.bad_checksums = 0
+        self.unknown_labels = 0
+        self.corrupt_records = 0  # Binary records corrupted, or undatable after a corruption
+
+    def add(self, other):
+        """Add the counters of other statistics to these ones."""
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
 class HistoricParser:
     def __init__(self, filename_data, filename_time):
         self.filename_data = filename_data
         self.filename_time = filename_time
+        self.statistics = ScanStatistics()
 
     def parse(self):
         frames = self.parse_frames()
         times = self.parse_times()
+        parsed_frames = []
         for (f, t) in zip(frames, times):
+            if f is None:  # Unusable frame, skipped with its timestamp
+                continue
             f[b'timestamp'] = t
-        return frames
+            parsed_frames.append(f)
+        return parsed_frames
 
     def parse_frames(self):
         with open(self.filename_data, "rb") as f:
             data = f.read()
-        pattern_frame = re.compile(b"\x02(?P<frame_content>.*?)(?P<terminator>[\x03\x04])", flags=re.DOTALL)
-        pattern_group = re.compile(b"\n(?P<payload>.*?) (?P<checksum>.)\r", flags=re.DOTALL)
-        match_frames = pattern_frame.finditer(data)
-        frames = []
-        for m_frame in match_frames:
-            frame_slice = data[slice(*m_frame.span('frame_content'))]
-            if frame_slice[-1] == 0x04:  # skip truncated frames
-                continue
-            match_groups = pattern_group.finditer(frame_slice)
-            frame = {b'ADCO': None, b'OPTARIF': None, b'ISOUSC': None, b'BASE': None, b'PTEC': None, b'IINST': None,
-                     b'IMAX': None, b'PAPP': None, b'HHPHC': None, b'MOTDETAT': None}
-            for match_group in match_groups:
-                group = match_group.group(0)
-                payload = group[1:-3]
-                if checksum(payload) != group[-2]:
-                    continue
-                split = payload.split(b' ')
-                label = split[0]
-                if label not in frame.keys():
-                    continue
-                frame[label] = split[1]
-            frames.append(frame)
-        return frames
+        self.statistics = ScanStatistics()
+        return [self.parse_groups(content) if content is not None else None
+                for content in scan_frames(data, self.statistics)]
+
+    def parse_groups(self, content):
+        """Decode the data groups of the content of a frame.
+
+        The frame is marked as corrupted if a group could not be read, a missing label being then unknown rather than
+        left out by the logging policy of the logger.
+        """
+        frame = dict.fromkeys(HISTORIC_LABELS + AGGREGATE_LABELS)
+        checksum_errors = []
+        groups = content.split(b'\r')  # Each group ends with CR, the checksum never is CR
+        malformed_groups = 1 if groups[-1] else 0  # Bytes after the last group
+        for group in groups[:-1]:
+            # LF, payload (label SP data), SP, checksum
+            if len(group) < 4 or group[0] != 0x0A or group[-2] != 0x20:
+                malformed_groups += 1
+                continue
+            payload = group[1:-2]
+            split = payload.split(b' ')
+            if checksum(payload) != group[-1]:
+                self.statistics.bad_checksums += 1
+                checksum_errors.append(split[0])
+                continue
+            label = split[0]
+            if label not in frame.keys():
+                self.statistics.unknown_labels += 1
+                continue
+            if len(split) < 2:
+                malformed_groups += 1
+                continue
+            frame[label] = split[1]
+        self.statistics.malformed_groups += malformed_groups
+        frame[b'checksum_errors'] = b' '.join(checksum_errors) if checksum_errors else None
+        frame[b'corrupted'] = malformed_groups > 0 or len(checksum_errors) > 0
+        return frame
 
     def parse_times(self):
         with open(self.filename_time, "r") as f:
@@ -55,6 +130,258 @@ class HistoricParser:
         return times
 
 
+class HistoricBinaryParser(HistoricParser):
+    def __init__(self, filename_data):
+        super().__init__(filename_data, None)
+
+    def parse(self):
+        with open(self.filename_data, "rb") as f:
+            data = f.read()
+        self.statistics = ScanStatistics()
+        parsed_frames = []
+        for content, is_complete, t in decode_records(scan_records(data, self.statistics), self.statistics):
+            self.statistics.frames += 1
+            if not is_complete:
+                self.statistics.truncated_frames += 1
+                continue
+            f = self.parse_groups(content)
+            f[b'timestamp'] = t
+            parsed_frames.append(f)
+        return parsed_frames
+
+
+class Segment:
+    """Segment of a capture listed in an index. The offset (ms) makes its timestamps follow those of the previous one.
+
+    The first and last timestamps of the segments written before a power cut, missing from the index, are unknown.
+    """
+    def __init__(self, filename_data, filename_time, first=None, last=None, frames=0):
+        self.filename_data = filename_data
+        self.filename_time = filename_time
+        self.first = first
+        self.last = last
+        self.frames = frames
+        self.offset = 0
+
+    def overlaps(self, t0, t1):
+        """Return whether the segment may have frames in the time range [t0, t1] (ms), after its offset."""
+        return self.first is None or (self.last + self.offset >= t0 and self.first + self.offset <= t1)
+
+
+class SegmentedParser:
+    """Parser of the segments of a capture listed in an index, only those overlapping a time range (ms) if any.
+
+    The timestamps restart from zero with the logger: the segments are shifted to follow the previous ones, so that
+    the time ranges are the same whichever segments are loaded. The timestamps of a segment in the binary format are
+    also brought back to those of the index, which are not stored modulo RECORD_TIME_PERIOD.
+    """
+    def __init__(self, meter_mode, filename_index, time_range=None):
+        self.meter_mode = meter_mode
+        self.segments = read_index(filename_index)
+        self.selection = select_segments(self.segments, time_range)
+        self.statistics = ScanStatistics()
+
+    def parse(self):
+        self.statistics = ScanStatistics()
+        listed = [s for s in self.segments if s.first is not None]
+        end = listed[-1].last + listed[-1].offset if listed else None  # End of the timeline
+        parsed_frames = []
+        for segment in self.selection:
+            parser = create(self.meter_mode, segment.filename_data, segment.filename_time)
+            frames = parser.parse()
+            self.statistics.add(parser.statistics)
+            offset = segment.offset
+            if segment.first is None and frames:  # Missing from the index, placed at the end of the timeline
+                first, last = frames[0][b'timestamp'], frames[-1][b'timestamp']
+                if end is not None and first < end:
+                    segment.offset = offset = end - first + SEGMENT_INTERVAL
+                end = last + segment.offset
+            elif frames:  # Whole periods between the index and the absolute times of the records
+                offset += round((segment.first - frames[0][b'timestamp']) / RECORD_TIME_PERIOD) * RECORD_TIME_PERIOD
+            for f in frames:
+                f[b'timestamp'] += offset
+            parsed_frames.extend(frames)
+        return parsed_frames
+
+
+def read_index(filename):
+    """Return the segments listed in an index, followed by those of its directory missing from it."""
+    directory = os.path.dirname(filename)
+    with open(filename, "r") as f:
+        lines = f.read().split("\n")[1:]
+    segments = []
+    for line in lines:
+        fields = line.split()
+        if len(fields) != 5:  # Empty line or line cut by a power cut
+            continue
+        data, time, first, last, frames = fields
+        segments.append(Segment(os.path.join(directory, data), os.path.join(directory, time) if time != '-' else None,
+                                int(first), int(last), int(frames)))
+    for previous, segment in zip(segments, segments[1:]):
+        segment.offset = previous.offset
+        if segment.first < previous.last:  # Logger restarted
+            interval = (previous.last - previous.first) / (previous.frames - 1) if previous.frames > 1 \
+                else SEGMENT_INTERVAL
+            segment.offset += previous.last - segment.first + interval
+    return segments + find_unlisted_segments(directory, segments)
+
+
+def find_unlisted_segments(directory, segments):
+    """Return the segments named as those of an index but missing from it, in the order of their numbers."""
+    if not segments:
+        return []
+    data_name = SEGMENT_NAME.match(os.path.basename(segments[0].filename_data))
+    time_name = SEGMENT_NAME.match(os.path.basename(segments[0].filename_time)) if segments[0].filename_time else None
+    if data_name is None:
+        return []
+    listed = {os.path.basename(s.filename_data) for s in segments}
+    numbers = []
+    for name in os.listdir(directory or '.'):
+        match = SEGMENT_NAME.match(name)
+        if match and match.group(1, 3) == data_name.group(1, 3) and name not in listed:
+            numbers.append(match.group(2))
+    unlisted = []
+    for number in sorted(numbers, key=int):
+        filename_data = os.path.join(directory, data_name.group(1) + '_' + number + (data_name.group(3) or ''))
+        filename_time = os.path.join(directory, time_name.group(1) + '_' + number + (time_name.group(3) or '')) \
+            if time_name else None
+        unlisted.append(Segment(filename_data, filename_time))
+    return unlisted
+
+
+def select_segments(segments, time_range=None):
+    """Return the segments overlapping a time range (ms), all of them if it is None."""
+    if time_range is None:
+        return list(segments)
+    return [s for s in segments if s.overlaps(*time_range)]
+
+
+def is_index(filename):
+    """Return whether a file is the index of a segmented capture."""
+    with open(filename, "rb") as f:
+        return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+
+
+def is_binary(filename):
+    """Return whether a capture is in the binary format of the logger."""
+    with open(filename, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
 def checksum(payload):
     """Compute the checksum for a data group."""
     return (sum(payload) & 0x3F) + 0x20
+
+
+def scan_frames(data, statistics, max_length=MAX_FRAME_LENGTH):
+    """Scan the frames of a capture in linear time.
+
+    The logger writes each frame from its STX to its ETX, or to EOT when the meter interrupts it, followed by one
+    timestamp. A record of the capture thus ends at each terminator and its frame starts at the last STX before,
+    looked for in at most `max_length` bytes: the bytes before it are the remains of a frame whose end was lost.
+    Yield the content of the frame of each record, or None for an unusable record, so that the frames stay
+    aligned with the timestamps.
+    """
+    start = 0
+    next_etx = data.find(ETX)
+    next_eot = data.find(EOT)
+    while next_etx != -1 or next_eot != -1:
+        if next_eot == -1 or next_etx != -1 and next_etx < next_eot:
+            end, is_complete = next_etx, True
+            next_etx = data.find(ETX, end + 1)
+        else:
+            end, is_complete = next_eot, False
+            next_eot = data.find(EOT, end + 1)
+        begin = data.rfind(STX, max(start, end - max_length - 1), end)
+        statistics.frames += 1
+        if begin == -1 and end - start > max_length + 1:
+            statistics.oversize_frames += 1
+            yield None
+        elif begin == -1 or not is_complete:
+            statistics.truncated_frames += 1
+            yield None
+        else:
+            if data.find(STX, max(start, end - max_length - 1), begin) != -1:  # Frame whose end was lost before it
+                statistics.truncated_frames += 1
+            yield data[begin + 1:end]
+        start = end + 1
+
+
+def scan_records(data, statistics):
+    """Scan the records of a capture in the binary format.
+
+    Yield the content of each valid record, its marker, and its timestamp. A corrupted
+    record is skipped up to the next byte starting a valid record, and the following records with a relative time are
+    skipped up to the next record with an absolute time. An absolute time falling back by more than half of
+    RECORD_TIME_PERIOD from the previous timestamp has wrapped around, the logger restarting from zero otherwise.
+    """
+    view = memoryview(data)
+    position = len(BINARY_MAGIC)
+    timestamp = None
+    previous = None  # Previous timestamp, kept after a corruption
+    wraps = 0  # Time of the wraparounds of the absolute times (ms)
+    while position + 5 <= len(data):
+        marker, length = RECORD_HEADER.unpack_from(data, position)
+        time_length = 4 if marker & RECORD_ABSOLUTE else 2
+        end = position + 3 + time_length + length
+        if marker & ~(RECORD_ABSOLUTE | RECORD_TRUNCATED | RECORD_DELTA) != RECORD_MARKER \
+                or length > MAX_FRAME_LENGTH or end + 2 > len(data) \
+                or binascii.crc_hqx(view[position:end], 0xFFFF) != RECORD_CRC.unpack_from(data, end)[0]:
+            statistics.corrupt_records += 1
+            timestamp = None
+            position = find_marker(data, position + 1)
+            continue
+        if time_length == 4:
+            timestamp = RECORD_ABSOLUTE_TIME.unpack_from(data, position + 3)[0] + wraps
+            if previous is not None and previous - timestamp > RECORD_TIME_PERIOD // 2:
+                wraps += RECORD_TIME_PERIOD
+                timestamp += RECORD_TIME_PERIOD
+        elif timestamp is not None:
+            timestamp += RECORD_RELATIVE_TIME.unpack_from(data, position + 3)[0]
+        if timestamp is None:
+            statistics.corrupt_records += 1
+        else:
+            previous = timestamp
+            yield data[end - length:end], marker, timestamp
+        position = end + 2
+
+
+def find_marker(data, start):
+    """Return the position of the next byte which may start a record, or the length of data if there is none.
+
+    The candidates are found in one forward scan and checked in place by scan_records, whose checks before the CRC
+    bound the work per candidate: resynchronizing over a corrupted capture stays linear.
+    """
+    match = RECORD_MARKERS.search(data, start)
+    return match.start() if match is not None else len(data)
+
+
+def decode_records(records, statistics):
+    """Rebuild the frames of the records with delta encoding.
+
+    Yield the content of the frame of each record, whether the frame is complete, and its timestamp. A record with
+    delta encoding holds the groups which changed since the previous complete frame, which has the same labels.
+    """
+    reference = None  # Groups of the previous complete frame, and their indices by label
+    for content, marker, timestamp in records:
+        if marker & RECORD_DELTA:
+            if reference is None:
+                statistics.corrupt_records += 1
+                continue
+            for group in content.split(b'\r')[:-1]:
+                index = reference[1].get(group[:group.find(b' ')])
+                if index is None:  # Label not in the previous frame
+                    statistics.corrupt_records += 1
+                    break
+                reference[0][index] = group
+            else:
+                yield b'\r'.join(reference[0]) + b'\r', True, timestamp
+                continue
+            reference = None
+        else:
+            is_complete = not marker & RECORD_TRUNCATED
+            if is_complete:
+                groups = content.split(b'\r')[:-1]
+                indices = {group[:group.find(b' ')]: index for index, group in enumerate(groups)}
+                reference = (groups, indices) if len(indices) == len(groups) else None  # Labels must be unique
+            yield content, is_complete, timestamp